@@ -0,0 +1,176 @@
+"""
+Load benchmarks for the feed, listing and approval paths.
+
+Each scenario issues requests through the Django test client (no server
+needed) against whatever data is in the database, typically generated
+with ``seed_scale``. For every scenario we record:
+
+* latency percentiles (p50/p95/p99) and mean over the timed iterations;
+* SQL queries per request (mean and max);
+* peak Python memory allocated while serving one request, measured in a
+  separate pass under ``tracemalloc`` so tracing does not skew latency.
+
+Results are plain dicts, saved as JSON by the ``bench_feeds`` command so
+that runs can be compared with :func:`compare`.
+"""
+import math
+import platform
+import time
+import tracemalloc
+from dataclasses import dataclass
+from itertools import count
+from typing import Callable
+
+import django
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from publications.models import Publisher
+from .models import Article
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+@dataclass
+class Scenario:
+    """
+    One benchmarked endpoint.
+
+    Attributes:
+        name (str): Key in the results.
+        request (callable): ``request(client)`` issues one request and returns the response.
+        login (callable): ``login(client)`` authenticates the client, if needed.
+        prepare (callable): Called before each request, outside the timing (e.g. to create a draft).
+    """
+    name: str
+    request: Callable
+    login: Callable = None
+    prepare: Callable = None
+
+
+def default_scenarios():
+    """The endpoints we track, with users picked from the current data."""
+    User = get_user_model()
+    # The most-followed reader is the worst case for the subscribed feed
+    reader = (
+        User.objects.filter(role=User.Roles.READER)
+        .annotate(n=Count('subscriptions_to_journalists', distinct=True) + Count('subscriptions_to_publishers', distinct=True))
+        .order_by('-n').first()
+    )
+    editor = User.objects.filter(role=User.Roles.EDITOR).first()
+    author = User.objects.filter(role=User.Roles.JOURNALIST).first()
+    publisher_id = Publisher.objects.values_list('pk', flat=True).first()
+    if not (reader and editor and author):
+        raise ValueError('Benchmarks need at least one reader, editor and journalist; run seed_scale first.')
+
+    pending, drafts = [], count()
+
+    def new_draft():
+        pending.append(Article.objects.create(
+            title=f'Benchmark draft {next(drafts)}', content='Benchmark body', author=author, publisher_id=publisher_id,
+        ))
+
+    def as_reader(client):
+        client.force_authenticate(reader)
+
+    return [
+        Scenario('api_articles', lambda c: c.get('/api/articles/')),
+        Scenario('api_subscribed', lambda c: c.get('/api/articles/subscribed/'), login=as_reader),
+        Scenario('api_publishers', lambda c: c.get('/api/publishers/')),
+        Scenario('html_home', lambda c: c.get('/articles/')),
+        Scenario('html_home_reader', lambda c: c.get('/articles/'), login=lambda c: c.force_login(reader)),
+        Scenario('html_independent', lambda c: c.get('/articles/independent/')),
+        Scenario('html_publishers', lambda c: c.get('/articles/publishers/')),
+        Scenario(
+            'api_approve', lambda c: c.post(f'/api/articles/{pending.pop().pk}/approve/'),
+            login=lambda c: c.force_authenticate(editor), prepare=new_draft,
+        ),
+    ]
+
+
+def run_scenario(scenario, iterations=50, warmup=5):
+    """Benchmark one scenario and return its result dict."""
+    client = APIClient()
+    if scenario.login:
+        scenario.login(client)
+
+    def one():
+        if scenario.prepare:
+            scenario.prepare()
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = scenario.request(client)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f'{scenario.name} returned {response.status_code}')
+        return elapsed, len(ctx.captured_queries)
+
+    for _ in range(warmup):
+        one()
+    latencies, queries = zip(*(one() for _ in range(iterations)))
+
+    tracemalloc.start()
+    try:
+        one()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    result = {f'p{p}_ms': round(percentile(latencies, p) * 1000, 3) for p in PERCENTILES}
+    result.update({
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+        'peak_memory_kib': round(peak / 1024, 1),
+        'iterations': iterations,
+    })
+    return result
+
+
+def run(iterations=50, warmup=5, only=None, progress=None):
+    """Run the default scenarios (or those named in ``only``) and return the results document."""
+    scenarios = default_scenarios()
+    if only:
+        scenarios = [s for s in scenarios if s.name in only]
+    User = get_user_model()
+    results = {
+        'meta': {
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'dataset': {
+                'users': User.objects.count(),
+                'publishers': Publisher.objects.count(),
+                'articles': Article.objects.count(),
+            },
+        },
+        'scenarios': {},
+    }
+    for scenario in scenarios:
+        results['scenarios'][scenario.name] = result = run_scenario(scenario, iterations, warmup)
+        if progress:
+            progress(scenario.name, result)
+    return results
+
+
+def compare(baseline, current, metrics=('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean', 'peak_memory_kib')):
+    """Yield ``(scenario, metric, before, after, change)`` for scenarios in both result documents."""
+    for name, after in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        for metric in metrics:
+            if metric in before and metric in after:
+                change = (after[metric] - before[metric]) / before[metric] if before[metric] else 0.0
+                yield name, metric, before[metric], after[metric], change
@@ -0,0 +1,121 @@
+"""
+HTTP conditional GET (ETag / Last-Modified) for article pages and the API.
+
+Validators are computed before any serialization or rendering, mostly
+without touching the database: they combine the generation counters from
+``articles.page_cache`` (bumped whenever the underlying content changes)
+with the caller's visibility scope and the request path. A client that
+sends ``If-None-Match`` / ``If-Modified-Since`` matching them gets a 304.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from . import page_cache
+
+
+def article_scope(user):
+    """
+    Generation keys and scope label for the article lists ``user`` can see.
+
+    Anonymous users and readers only see approved articles, so the public
+    feed counter is enough. Editors and journalists also see drafts, which
+    move the catch-all ``articles`` collection counter.
+    """
+    if user.is_authenticated and user.is_editor():
+        return [('collection', 'articles')], 'editor'
+    if user.is_authenticated and user.is_journalist():
+        return [('collection', 'articles')], f'journalist:{user.pk}'
+    return [('feed', 'home')], 'public'
+
+
+def compute_validators(request, keys, *scope, last_modified=None):
+    """Return ``(etag, last_modified)`` for a response built from ``keys`` as seen by ``scope``."""
+    parts = [request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), *page_cache.generations(*keys), *scope]
+    etag = quote_etag(hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest())
+    if last_modified is None:
+        last_modified = page_cache.last_modified(*keys)
+    return etag, last_modified
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers['ETag'] = etag
+        if last_modified:
+            response.headers['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin answering conditional GETs before the serializer runs.
+
+    Actions call ``not_modified(...)`` first and return its result if it is
+    not None; the validators are then attached to the final response.
+    """
+
+    def not_modified(self, request, keys, *scope, last_modified=None):
+        self._validators = compute_validators(request, keys, *scope, last_modified=last_modified)
+        return get_conditional_response(request, etag=self._validators[0], last_modified=self._validators[1])
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, '_validators', None)
+        if validators and request.method in ('GET', 'HEAD'):
+            set_validators(response, *validators)
+        return response
+
+
+def conditional_page(feed=None, article_kwarg=None):
+    """
+    Answer conditional GETs for an HTML feed or article page.
+
+    Article pages show the author's and publisher's names, so their
+    validators also cover those generations (see ``page_cache.article_keys``).
+    Logged-in users see per-user buttons (edit, subscribe), so their
+    validators also cover their role and, through the ``reader`` counter,
+    whom they follow. Requests with flash messages pending are always
+    rendered so the messages are shown. Works on sync and async views.
+    """
+    def page_validators(request, kwargs):
+        # None when the page is always rendered
+        if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+            return None
+        keys = [('feed', feed)] if feed else page_cache.article_keys(kwargs[article_kwarg])
+        user = request.user
+        if user.is_authenticated:
+            keys.append(('reader', user.pk))
+            scope = (user.pk, user.role)
+        else:
+            scope = ('anonymous',)
+        return compute_validators(request, keys, *scope)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # The session, user and messages are read synchronously
+                validators = await sync_to_async(page_validators)(request, kwargs)
+                if validators is None:
+                    return await view(request, *args, **kwargs)
+                response = get_conditional_response(request, etag=validators[0], last_modified=validators[1])
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return set_validators(response, *validators)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            validators = page_validators(request, kwargs)
+            if validators is None:
+                return view(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=validators[0], last_modified=validators[1])
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return set_validators(response, *validators)
+        return wrapper
+    return decorator
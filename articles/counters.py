@@ -0,0 +1,194 @@
+"""
+Denormalized counters on publishers and journalists.
+
+``Publisher`` and ``User`` carry:
+
+* ``subscriber_count``: readers following the publisher or journalist;
+* ``article_count``: their approved articles;
+* ``pending_count``: their articles waiting for review.
+
+Lists show these for every row, so they are stored columns rather than
+``COUNT`` queries. The receivers in ``articles.signals`` adjust them with
+``F()`` increments, in the same transaction as the change itself:
+
+* following and unfollowing, including the subscriptions chosen at
+  registration and those dropped when a user stops being a reader;
+* an article entering or leaving the approved or pending state, or moving
+  to another author or publisher;
+* deleting an article, or a user who followed someone.
+
+Bulk writes that send no signals (``import_articles``, ``seed_scale``)
+call :func:`reconcile` afterwards; an import recounts only the authors
+and publishers it touched. The ``reconcile_counters`` command runs
+it to repair any other drift, e.g. after raw SQL.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from publications.models import Publisher
+from users.subscriptions import EDGES, JOURNALISTS, PUBLISHERS
+
+from .models import Article
+
+# Article status -> the counter it adds to
+STATUS_COUNTERS = {Article.Status.APPROVED: 'article_count', Article.Status.PENDING: 'pending_count'}
+COUNTERS = ('subscriber_count', 'article_count', 'pending_count')
+RECONCILE_BATCH_SIZE = 500
+
+
+def _increment(model, pks, counter, n):
+    pks = [pk for pk in pks if pk is not None]
+    if pks and n:
+        model.objects.filter(pk__in=pks).update(**{counter: F(counter) + n})
+
+
+def _follows(kind):
+    return getattr(get_user_model(), EDGES[kind][0]).through.objects
+
+
+def _target(kind):
+    return Publisher if kind == PUBLISHERS else get_user_model()
+
+
+def _cooled(kind, pks, n):
+    # Sources that dropped to FEED_FANOUT_LIMIT followers or fewer when moved by n
+    limit = settings.FEED_FANOUT_LIMIT
+    if n >= 0 or not pks:
+        return []
+    return list(
+        _target(kind).objects.filter(pk__in=pks, subscriber_count__lte=limit, subscriber_count__gt=limit + n)
+        .values_list('pk', flat=True)
+    )
+
+
+def subscriptions_changed(kind, instance, action, reverse, pk_set):
+    """
+    Apply an M2M change to the ``kind`` subscriptions to ``subscriber_count``.
+
+    As in ``m2m_changed``, ``instance`` is the reader for a forward change
+    and the publisher or journalist for a reverse one. Removals count only
+    the edges that existed, so they are looked up before the delete.
+
+    Returns the publishers or journalists the change made cold, i.e. served
+    by fan-out on write again (see ``articles.feed``).
+    """
+    if action in ('pre_remove', 'pre_clear'):
+        _, reader_col, followed_col = EDGES[kind]
+        own, other = (followed_col, reader_col) if reverse else (reader_col, followed_col)
+        edges = _follows(kind).filter(**{own: instance.pk})
+        if action == 'pre_remove':
+            edges = edges.filter(**{f'{other}__in': pk_set})
+        instance._uncounted_subscription_pks = list(edges.values_list(other, flat=True))
+        return []
+    if action == 'post_add':
+        pks, n = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        pks, n = instance.__dict__.pop('_uncounted_subscription_pks', ()), -1
+    else:
+        return []
+    if not pks:
+        return []
+    if reverse:
+        _increment(_target(kind), [instance.pk], 'subscriber_count', n * len(pks))
+        return _cooled(kind, [instance.pk], n * len(pks))
+    _increment(_target(kind), pks, 'subscriber_count', n)
+    return _cooled(kind, pks, n)
+
+
+def follower_deleted(user):
+    """
+    Uncount the subscriptions ``user`` held; their rows are deleted without M2M signals.
+
+    Returns ``{kind: sources made cold}`` as :func:`subscriptions_changed` does.
+    """
+    cooled = {}
+    for kind in (PUBLISHERS, JOURNALISTS):
+        _, reader_col, followed_col = EDGES[kind]
+        followed = list(_follows(kind).filter(**{reader_col: user.pk}).values_list(followed_col, flat=True))
+        _increment(_target(kind), followed, 'subscriber_count', -1)
+        cooled[kind] = _cooled(kind, followed, -1)
+    return cooled
+
+
+def _share(status, author_id, publisher_id):
+    # What one article adds to the counters: (counter, author, publisher), or None
+    counter = STATUS_COUNTERS.get(status)
+    return (counter, author_id, publisher_id) if counter else None
+
+
+def _apply(share, n):
+    if share is not None:
+        counter, author_id, publisher_id = share
+        _increment(get_user_model(), [author_id], counter, n)
+        _increment(Publisher, [publisher_id], counter, n)
+
+
+def article_saved(article, created):
+    """Move ``article``'s share of the counters if its status, author or publisher changed."""
+    new = _share(article.status, article.author_id, article.publisher_id)
+    old = None if created else _share(*(
+        # Fields that were not loaded were not saved either
+        article.loaded_value(attname, getattr(article, attname))
+        for attname in ('status', 'author_id', 'publisher_id')
+    ))
+    if old != new:
+        _apply(old, -1)
+        _apply(new, 1)
+
+
+def article_deleted(article):
+    _apply(_share(article.status, article.author_id, article.publisher_id), -1)
+
+
+def _count(model, column, **filters):
+    rows = model.objects.filter(**{column: OuterRef('pk')}, **filters).order_by().values(column)
+    return Coalesce(Subquery(rows.annotate(n=Count('*')).values('n')), 0)
+
+
+def expected_counts():
+    """``{model: {counter: expression}}`` recounting every counter from the source tables."""
+    approved, pending = Article.Status.APPROVED, Article.Status.PENDING
+    return {
+        Publisher: {
+            'subscriber_count': _count(_follows(PUBLISHERS).model, EDGES[PUBLISHERS][2]),
+            'article_count': _count(Article, 'publisher', status=approved),
+            'pending_count': _count(Article, 'publisher', status=pending),
+        },
+        get_user_model(): {
+            'subscriber_count': _count(_follows(JOURNALISTS).model, EDGES[JOURNALISTS][2]),
+            'article_count': _count(Article, 'author', status=approved),
+            'pending_count': _count(Article, 'author', status=pending),
+        },
+    }
+
+
+def reconcile(user_ids=None, publisher_ids=None):
+    """
+    Recount the counters and fix the rows that had drifted.
+
+    ``user_ids`` and ``publisher_ids`` limit the recount to those rows,
+    e.g. the authors and publishers touched by an import; ``None``
+    recounts every row. Returns ``{model label: rows fixed}``.
+    """
+    scopes = {get_user_model(): user_ids, Publisher: publisher_ids}
+    fixed = {}
+    for model, counts in expected_counts().items():
+        drifted = Q()
+        for counter in COUNTERS:
+            drifted |= ~Q(**{counter: F(f'expected_{counter}')})
+        rows = model.objects.annotate(**{f'expected_{counter}': counts[counter] for counter in COUNTERS}).filter(drifted)
+        scope = scopes[model]
+        if scope is None:
+            pks = list(rows.values_list('pk', flat=True))
+        else:
+            scope = sorted(scope)
+            pks = [
+                pk for start in range(0, len(scope), RECONCILE_BATCH_SIZE)
+                for pk in rows.filter(pk__in=scope[start:start + RECONCILE_BATCH_SIZE]).values_list('pk', flat=True)
+            ]
+        for start in range(0, len(pks), RECONCILE_BATCH_SIZE):
+            model.objects.filter(pk__in=pks[start:start + RECONCILE_BATCH_SIZE]).update(**counts)
+        fixed[model._meta.label] = len(pks)
+    return fixed
@@ -0,0 +1,231 @@
+"""
+Materialized subscription feeds.
+
+Each reader's "subscribed" feed is stored as ``FeedEntry`` rows, written when
+an article is approved (fan-out on write) and when the reader follows a new
+source (backfill). Reading a feed is then one range scan over
+``(reader, created_at)`` instead of an OR over subscription subqueries.
+
+Publishers and journalists with more than ``settings.FEED_FANOUT_LIMIT``
+subscribers are not copied into every follower's feed; their articles are
+merged in at read time (fan-out on read), so approving one of their
+articles stays cheap. Hotness is read from the stored ``subscriber_count``
+(see ``articles.counters``), never counted per request. When a source
+drops back to the limit or below, :func:`backfill_followers` writes its
+recent articles into its followers' feeds, which no longer merge them in.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from publications.models import Publisher
+from users import subscriptions
+from .models import Article, FeedEntry
+from .pagination import DEFAULT_PAGE_SIZE, FeedPage, apaginate, encode_cursor, paginate
+
+INSERT_BATCH_SIZE = 1000
+
+
+def _journalist_follows():
+    return get_user_model().subscriptions_to_journalists.through.objects
+
+
+def _publisher_follows():
+    return get_user_model().subscriptions_to_publishers.through.objects
+
+
+def _hot(model, ids):
+    return set(model.objects.filter(pk__in=ids, subscriber_count__gt=settings.FEED_FANOUT_LIMIT).values_list('pk', flat=True))
+
+
+def hot_publisher_ids(publisher_ids):
+    """
+    Return the subset of ``publisher_ids`` that are served by fan-out on read.
+
+    ``publisher_ids`` may be a list or a subquery.
+    """
+    return _hot(Publisher, publisher_ids)
+
+
+def hot_journalist_ids(journalist_ids):
+    """Return the subset of ``journalist_ids`` that are served by fan-out on read."""
+    return _hot(get_user_model(), journalist_ids)
+
+
+def _insert(rows):
+    """Bulk insert ``(reader_id, article_id, created_at)`` tuples, skipping duplicates."""
+    batch = []
+    for reader_id, article_id, created_at in rows:
+        batch.append(FeedEntry(reader_id=reader_id, article_id=article_id, created_at=created_at))
+        if len(batch) >= INSERT_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_article(article):
+    """Copy a newly approved article into the feed of everyone following its sources."""
+    if not article.approved:
+        return
+    readers = set()
+    # Hotness comes from the stored counts, so a hot source's followers are never loaded
+    if not hot_journalist_ids([article.author_id]):
+        readers.update(subscriptions.followers(subscriptions.JOURNALISTS, article.author_id))
+    if article.publisher_id and not hot_publisher_ids([article.publisher_id]):
+        readers.update(subscriptions.followers(subscriptions.PUBLISHERS, article.publisher_id))
+    _insert((reader_id, article.pk, article.created_at) for reader_id in readers)
+
+
+def backfill_followers(kind, source_ids, exclude_reader=None):
+    """
+    Copy the recent approved articles of sources that just became cold into
+    the feeds of their followers (all but ``exclude_reader``).
+
+    ``kind`` is ``subscriptions.PUBLISHERS`` or ``subscriptions.JOURNALISTS``.
+    As in :func:`backfill`, at most ``settings.FEED_BACKFILL_LIMIT``
+    articles are copied per source.
+    """
+    accessor, reader_col, followed_col = subscriptions.EDGES[kind]
+    follows = getattr(get_user_model(), accessor).through.objects
+    column = 'publisher_id' if kind == subscriptions.PUBLISHERS else 'author_id'
+    for source_id in source_ids:
+        recent = list(
+            Article.objects.filter(status=Article.Status.APPROVED, **{column: source_id})
+            .order_by('-created_at', '-id')
+            .values_list('id', 'created_at')[:settings.FEED_BACKFILL_LIMIT]
+        )
+        readers = follows.filter(**{followed_col: source_id})
+        if exclude_reader is not None:
+            readers = readers.exclude(**{reader_col: exclude_reader})
+        _insert(
+            (reader_id, article_id, created_at)
+            for reader_id in readers.values_list(reader_col, flat=True).iterator()
+            for article_id, created_at in recent
+        )
+
+
+def withdraw_article(article):
+    """Remove an article from every feed, e.g. after it is declined."""
+    FeedEntry.objects.filter(article=article).delete()
+
+
+def backfill(reader_id, publisher_ids=(), journalist_ids=()):
+    """
+    Copy recent approved articles from newly followed sources into a reader's feed.
+
+    At most ``settings.FEED_BACKFILL_LIMIT`` articles are copied per source;
+    hot sources are skipped since they are merged in at read time anyway.
+    """
+    limit = settings.FEED_BACKFILL_LIMIT
+    hot = hot_journalist_ids(journalist_ids) if journalist_ids else set()
+    sources = [{'author_id': pk} for pk in journalist_ids if pk not in hot]
+    hot = hot_publisher_ids(publisher_ids) if publisher_ids else set()
+    sources += [{'publisher_id': pk} for pk in publisher_ids if pk not in hot]
+    for source in sources:
+        recent = (
+            Article.objects.filter(status=Article.Status.APPROVED, **source)
+            .order_by('-created_at', '-id')
+            .values_list('id', 'created_at')[:limit]
+        )
+        _insert((reader_id, article_id, created_at) for article_id, created_at in recent)
+
+
+def remove_sources(reader_id, publisher_ids=(), journalist_ids=()):
+    """
+    Drop feed rows that came from sources the reader no longer follows.
+
+    Must run after the subscription rows are deleted: articles still reachable
+    through another followed source (e.g. the author is unfollowed but the
+    publisher is not) are kept.
+    """
+    if not publisher_ids and not journalist_ids:
+        return
+    stale = FeedEntry.objects.filter(reader_id=reader_id)
+    stale = stale.filter(article__author_id__in=journalist_ids) | stale.filter(article__publisher_id__in=publisher_ids)
+    stale = stale.exclude(
+        article__author_id__in=_journalist_follows().filter(from_user_id=reader_id).values('to_user_id')
+    ).exclude(
+        article__publisher_id__in=_publisher_follows().filter(user_id=reader_id).values('publisher_id')
+    )
+    FeedEntry.objects.filter(pk__in=list(stale.values_list('pk', flat=True))).delete()
+
+
+def rebuild_reader(reader_id):
+    """Recompute one reader's feed from scratch."""
+    FeedEntry.objects.filter(reader_id=reader_id).delete()
+    backfill(
+        reader_id,
+        publisher_ids=list(_publisher_follows().filter(user_id=reader_id).values_list('publisher_id', flat=True)),
+        journalist_ids=list(_journalist_follows().filter(from_user_id=reader_id).values_list('to_user_id', flat=True)),
+    )
+
+
+def reader_feed(reader, cursor=None, page_size=DEFAULT_PAGE_SIZE, queryset=None):
+    """
+    Return one page of ``reader``'s subscribed feed as a :class:`FeedPage` of articles.
+
+    The articles are loaded from ``queryset`` (by default with every
+    relation the full serializer needs).
+
+    The materialized rows and, for followed hot sources, their approved
+    articles are each paginated with the same keyset cursor and merged.
+    """
+    streams = [paginate(_entries(reader), cursor, page_size, keys=('created_at', 'article_id'))]
+    hot = _hot_followed(reader)
+    if any(hot):
+        streams.append(_as_entries(paginate(_hot_articles(hot), cursor, page_size)))
+    merged, next_cursor = _merge(streams, page_size)
+    if queryset is None:
+        queryset = Article.objects.with_related()
+    articles = queryset.in_bulk([article_id for _, article_id in merged])
+    return FeedPage([articles[article_id] for _, article_id in merged if article_id in articles], next_cursor)
+
+
+async def areader_feed(reader, cursor=None, page_size=DEFAULT_PAGE_SIZE, queryset=None):
+    """:func:`reader_feed` for async views, reading through the async ORM."""
+    streams = [await apaginate(_entries(reader), cursor, page_size, keys=('created_at', 'article_id'))]
+    # Cache lookups, falling back to the database on a miss
+    hot = await sync_to_async(_hot_followed)(reader)
+    if any(hot):
+        streams.append(_as_entries(await apaginate(_hot_articles(hot), cursor, page_size)))
+    merged, next_cursor = _merge(streams, page_size)
+    if queryset is None:
+        queryset = Article.objects.with_related()
+    articles = await queryset.ain_bulk([article_id for _, article_id in merged])
+    return FeedPage([articles[article_id] for _, article_id in merged if article_id in articles], next_cursor)
+
+
+def _entries(reader):
+    return FeedEntry.objects.filter(reader=reader).values('article_id', 'created_at')
+
+
+def _hot_followed(reader):
+    """``(journalist_ids, publisher_ids)`` of the hot sources ``reader`` follows."""
+    journalist_ids, publisher_ids = subscriptions.followed_ids(reader.pk)
+    return (
+        hot_journalist_ids(list(journalist_ids)) if journalist_ids else set(),
+        hot_publisher_ids(list(publisher_ids)) if publisher_ids else set(),
+    )
+
+
+def _hot_articles(hot):
+    journalist_ids, publisher_ids = hot
+    return Article.objects.filter(
+        Q(author_id__in=journalist_ids) | Q(publisher_id__in=publisher_ids), status=Article.Status.APPROVED,
+    ).values('id', 'created_at')
+
+
+def _as_entries(page):
+    page.items = [{'article_id': row['id'], 'created_at': row['created_at']} for row in page.items]
+    return page
+
+
+def _merge(streams, page_size):
+    """Merge keyset pages into the newest ``(created_at, article_id)`` keys and the next cursor."""
+    keys = {(row['created_at'], row['article_id']) for stream in streams for row in stream.items}
+    merged = sorted(keys, reverse=True)
+    has_more = len(merged) > page_size or any(stream.next_cursor for stream in streams)
+    merged = merged[:page_size]
+    return merged, encode_cursor(*merged[-1]) if has_more and merged else None
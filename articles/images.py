@@ -0,0 +1,125 @@
+"""
+Image derivatives for article pictures.
+
+Uploads are kept as the original, but pages and the API serve resized WebP
+variants made off the request path by the outbox worker (topic
+``image.derivatives``, queued when an article's image changes):
+
+* ``card``: cropped to 400x225 for feed cards;
+* ``detail``: fitted within 1200x1200 for the article page.
+
+Files are stored under the SHA-256 of the original's bytes, so the same
+picture uploaded twice is processed once and stored once: the original
+moves to ``images/originals/<hash>.<ext>`` and variants live at
+``images/<variant>/<hash>.webp``. What was produced is recorded in
+``Article.image_variants``.
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from . import page_cache
+from .models import Article
+
+VARIANTS = {
+    # name: (width, height, crop)
+    'card': (400, 225, True),
+    'detail': (1200, 1200, False),
+}
+FORMAT, EXTENSION, QUALITY = 'WEBP', 'webp', 80
+HASH_CHUNK_SIZE = 1 << 16
+
+
+def content_hash(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def render_variant(image, width, height, crop):
+    """Return ``(bytes, width, height)`` of ``image`` resized to the variant's box."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    if crop:
+        image = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    else:
+        image = image.copy()
+        image.thumbnail((width, height), Image.Resampling.LANCZOS)
+    out = BytesIO()
+    image.save(out, FORMAT, quality=QUALITY, method=4)
+    return out.getvalue(), image.width, image.height
+
+
+def _save_once(storage, name, content):
+    """Save ``content`` at exactly ``name`` unless a file is already there."""
+    if not storage.exists(name):
+        saved = storage.save(name, ContentFile(content))
+        if saved != name:
+            # Lost a race with another worker saving the same content
+            storage.delete(saved)
+    return name
+
+
+def build_variants(article):
+    """
+    Produce the variants of ``article.image`` and record them on the article.
+
+    Returns the new ``image_variants`` dict, or None if the article has no
+    image or it was replaced while processing. Does nothing if the current
+    image has already been processed.
+    """
+    if not article.image:
+        return None
+    if article.image_variants.get('source') == article.image.name:
+        return article.image_variants
+    storage = article.image.storage
+    with article.image.open('rb') as f:
+        digest = content_hash(f)
+        source = Image.open(f)
+        source.load()
+        original_format = (source.format or 'bin').lower()
+
+    variants = {}
+    for name, (width, height, crop) in VARIANTS.items():
+        path = f'images/{name}/{digest}.{EXTENSION}'
+        if storage.exists(path):
+            with Image.open(storage.open(path)) as existing:
+                size = existing.size
+        else:
+            content, *size = render_variant(source, width, height, crop)
+            _save_once(storage, path, content)
+        variants[name] = {'name': path, 'width': size[0], 'height': size[1]}
+
+    # Move the original to its content-addressed name; duplicates share one file
+    uploaded = article.image.name
+    ext = os.path.splitext(uploaded)[1].lower() or f'.{original_format}'
+    original = f'images/originals/{digest}{ext}'
+    variants['source'] = original
+    if uploaded != original and not storage.exists(original):
+        with storage.open(uploaded, 'rb') as f:
+            _save_once(storage, original, f.read())
+
+    # update() rather than save(): the picture itself did not change, so the
+    # save signals must not queue it again. Matching on the old name skips
+    # the write if the image was replaced meanwhile (a newer job is queued).
+    if not Article.objects.filter(pk=article.pk, image=uploaded).update(image=original, image_variants=variants):
+        return None
+    if uploaded != original:
+        storage.delete(uploaded)
+    article.image.name, article.image_variants = original, variants
+    page_cache.invalidate_article(article)
+    return variants
+
+
+def process_article_image(payload):
+    """Outbox handler for ``image.derivatives``."""
+    article = Article.objects.filter(pk=payload['article_id']).first()
+    if article:
+        build_variants(article)
@@ -0,0 +1,238 @@
+"""
+Bulk article import from JSONL or CSV archives.
+
+Rows are streamed from the input, so memory use does not grow with its
+size. Each row needs ``title``, ``content`` and ``author`` (a username);
+``publisher`` (a publisher title), ``approved`` and ``created_at`` (ISO
+8601) are optional. Authors and publishers are resolved through
+in-memory maps loaded once, and articles are written with ``bulk_create``
+one chunk per transaction together with the run's ``ImportCheckpoint``,
+so an interrupted import resumes after the last committed chunk.
+
+``bulk_create`` sends no signals, so the per-row work the signals normally
+do (search indexing, feed fan-out, counters, page cache invalidation) is
+done once for the whole import by :func:`refresh_derived_data`. Each chunk
+marks its rows as waiting for it on the checkpoint, so a refresh that did
+not finish is picked up by the next run even if that run imports nothing.
+"""
+import csv
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from publications.models import Publisher
+from . import counters, feed, page_cache, search
+from .models import Article, ImportCheckpoint
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+MAX_REPORTED_ERRORS = 20
+REFRESH_BATCH_SIZE = 500
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+@dataclass
+class ImportReport:
+    """
+    Outcome of one ``import_articles`` run.
+
+    Attributes:
+        imported (int): Articles inserted by this run.
+        rejected (int): Rows skipped as invalid by this run.
+        resumed_from (int): Rows already processed by earlier runs.
+        elapsed (float): Wall-clock seconds spent importing.
+        errors (list): ``(row number, message)`` for the first rejected rows.
+    """
+    imported: int = 0
+    rejected: int = 0
+    resumed_from: int = 0
+    elapsed: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rate(self):
+        """Rows processed per second."""
+        return (self.imported + self.rejected) / self.elapsed if self.elapsed else 0.0
+
+
+def read_rows(stream, fmt):
+    """Yield one dict per input row from a text ``stream`` in ``'jsonl'`` or ``'csv'`` format."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield InvalidRow(f'invalid JSON: {e}')
+
+
+class Resolver:
+    """In-memory username and publisher-title lookups, loaded once per import."""
+
+    def __init__(self):
+        User = get_user_model()
+        self.authors = dict(User.objects.values_list('username', 'pk').iterator())
+        self.publishers = dict(Publisher.objects.values_list('title', 'pk').iterator())
+
+    def article(self, row):
+        """Build an unsaved ``Article`` from ``row`` or raise :class:`InvalidRow`."""
+        if isinstance(row, InvalidRow):
+            raise row
+        if not isinstance(row, dict):
+            raise InvalidRow('expected an object')
+        title, content, author = (str(row.get(key) or '').strip() for key in ('title', 'content', 'author'))
+        if not title or not content:
+            raise InvalidRow('title and content are required')
+        if len(title) > Article._meta.get_field('title').max_length:
+            raise InvalidRow('title is too long')
+        if author not in self.authors:
+            raise InvalidRow(f'unknown author {author!r}')
+        publisher = str(row.get('publisher') or '').strip()
+        if publisher and publisher not in self.publishers:
+            raise InvalidRow(f'unknown publisher {publisher!r}')
+        created_at = timezone.now()
+        if row.get('created_at'):
+            created_at = parse_datetime(str(row['created_at']))
+            if created_at is None:
+                raise InvalidRow(f'invalid created_at {row["created_at"]!r}')
+            if timezone.is_naive(created_at):
+                created_at = timezone.make_aware(created_at)
+        approved = row.get('approved')
+        return Article(
+            title=title, content=content,
+            author_id=self.authors[author],
+            publisher_id=self.publishers.get(publisher),
+            approved=approved if isinstance(approved, bool) else str(approved or '').strip().lower() in TRUE_VALUES,
+            created_at=created_at, updated_at=created_at,
+        )
+
+
+@contextmanager
+def preserve_timestamps():
+    """Let ``bulk_create`` keep the archive's ``created_at``/``updated_at`` instead of stamping now."""
+    fields = [Article._meta.get_field(name) for name in ('created_at', 'updated_at')]
+    saved = [(f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, (auto_now, auto_now_add) in zip(fields, saved):
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def import_rows(rows, source, chunk_size=1000, resume=True, progress=None):
+    """
+    Import ``rows`` (as yielded by :func:`read_rows`) and return an :class:`ImportReport`.
+
+    ``source`` names the checkpoint; with ``resume`` the rows it has already
+    processed are skipped. ``progress(report)`` is called after each chunk.
+    """
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=source)
+    if not resume:
+        checkpoint.position = 0
+    report = ImportReport(resumed_from=checkpoint.position)
+    resolver = Resolver()
+    started = time.perf_counter()
+    position, chunk = 0, []
+
+    def flush():
+        with transaction.atomic():
+            if chunk:
+                last_id = Article.objects.aggregate(last=Max('pk'))['last'] or 0
+                Article.objects.bulk_create(chunk, batch_size=chunk_size)
+                if not checkpoint.refresh_pending:
+                    checkpoint.refresh_pending, checkpoint.refresh_after_id = True, last_id
+                checkpoint.refresh_through_id = Article.objects.aggregate(last=Max('pk'))['last']
+                checkpoint.author_ids = sorted({*checkpoint.author_ids, *(a.author_id for a in chunk)})
+                checkpoint.publisher_ids = sorted(
+                    {*checkpoint.publisher_ids, *(a.publisher_id for a in chunk if a.publisher_id)}
+                )
+            checkpoint.position = position
+            checkpoint.save()
+        report.imported += len(chunk)
+        chunk.clear()
+        report.elapsed = time.perf_counter() - started
+        if progress:
+            progress(report)
+
+    with preserve_timestamps():
+        for position, row in enumerate(rows, start=1):
+            try:
+                article = resolver.article(row)
+            except InvalidRow as e:
+                if position > report.resumed_from:
+                    report.rejected += 1
+                    if len(report.errors) < MAX_REPORTED_ERRORS:
+                        report.errors.append((position, str(e)))
+                continue
+            if position <= report.resumed_from:
+                continue
+            chunk.append(article)
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def refresh_derived_data(source, batch_size=REFRESH_BATCH_SIZE):
+    """
+    Bring search, feeds, counters and the page cache up to date after an import.
+
+    Only the work the ``source`` checkpoint records as pending is done: the
+    imported articles are indexed ``batch_size`` at a time, the counters of
+    their authors and publishers are recounted, the feeds of readers
+    following any of them are rebuilt, and each cache generation is bumped
+    once. The checkpoint is cleared afterwards, unless another chunk was
+    imported meanwhile.
+
+    Returns the number of feeds rebuilt, or ``None`` if nothing was pending.
+    """
+    checkpoint = ImportCheckpoint.objects.get(source=source)
+    if not checkpoint.refresh_pending:
+        return None
+
+    articles = (
+        Article.objects.filter(pk__lte=checkpoint.refresh_through_id)
+        .only('title', 'content', 'author_id', 'approved').order_by('pk')
+    )
+    last_id = checkpoint.refresh_after_id
+    while batch := list(articles.filter(pk__gt=last_id)[:batch_size]):
+        with transaction.atomic():
+            search.index_articles(batch)
+        last_id = batch[-1].pk
+    counters.reconcile(user_ids=checkpoint.author_ids, publisher_ids=checkpoint.publisher_ids)
+
+    User = get_user_model()
+    readers = set(
+        User.subscriptions_to_journalists.through.objects
+        .filter(to_user_id__in=checkpoint.author_ids).values_list('from_user_id', flat=True)
+    ) | set(
+        User.subscriptions_to_publishers.through.objects
+        .filter(publisher_id__in=checkpoint.publisher_ids).values_list('user_id', flat=True)
+    )
+    for reader_id in readers:
+        with transaction.atomic():
+            feed.rebuild_reader(reader_id)
+        page_cache.bump('reader', reader_id)
+
+    page_cache.bump('collection', 'articles')
+    for name in ('home', 'publishers', 'independent'):
+        page_cache.bump('feed', name)
+    ImportCheckpoint.objects.filter(pk=checkpoint.pk, updated_at=checkpoint.updated_at).update(
+        refresh_pending=False, refresh_after_id=0, refresh_through_id=0, author_ids=[], publisher_ids=[],
+    )
+    return len(readers)
@@ -0,0 +1,96 @@
+"""
+Bulk email delivery.
+
+Recipients are streamed from the database and each gets an individual
+message (no shared To: list leaking addresses). Messages are handed to a
+single reused backend connection in chunks, and every chunk is logged with
+its throughput and failures.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DeliveryReport:
+    """
+    Outcome of one bulk send.
+
+    Attributes:
+        sent (int): Messages accepted by the backend.
+        failed (int): Messages in chunks the backend rejected.
+        chunks (int): Number of chunks handed to the backend.
+        elapsed (float): Wall-clock seconds spent sending.
+        errors (list): One ``str`` per failed chunk.
+    """
+    sent: int = 0
+    failed: int = 0
+    chunks: int = 0
+    elapsed: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rate(self):
+        """Messages sent per second."""
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def send_individually(recipients, subject, body, from_email=None, chunk_size=None, connection=None, on_chunk=None):
+    """
+    Send ``subject``/``body`` to each address in ``recipients`` as its own message.
+
+    ``recipients`` may be any iterable, typically a ``values_list(...).iterator()``
+    so addresses are never all held in memory. A chunk that raises is counted
+    as failed and the remaining chunks are still attempted; it is up to the
+    caller to decide whether a partial failure is worth retrying.
+
+    ``on_chunk(addresses, sent, error)`` is called after each chunk, with
+    ``error`` set if the backend raised; it may raise to stop the send.
+    """
+    chunk_size = chunk_size or settings.EMAIL_CHUNK_SIZE
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    connection = connection or get_connection()
+    report = DeliveryReport()
+    started = time.perf_counter()
+
+    with connection:
+        for addresses in chunked(recipients, chunk_size):
+            report.chunks += 1
+            messages = [
+                EmailMessage(subject, body, from_email, [address], connection=connection)
+                for address in addresses
+            ]
+            chunk_started = time.perf_counter()
+            try:
+                sent = connection.send_messages(messages) or 0
+            except Exception as e:
+                report.failed += len(messages)
+                report.errors.append(f'{type(e).__name__}: {e}')
+                logger.warning('Chunk %s: %s messages failed: %s', report.chunks, len(messages), e)
+                if on_chunk:
+                    on_chunk(addresses, 0, report.errors[-1])
+                continue
+            report.sent += sent
+            report.failed += len(messages) - sent
+            chunk_elapsed = time.perf_counter() - chunk_started
+            logger.info(
+                'Chunk %s: sent %s/%s in %.3fs (%.0f msg/s)',
+                report.chunks, sent, len(messages), chunk_elapsed, sent / chunk_elapsed if chunk_elapsed else 0,
+            )
+            if on_chunk:
+                on_chunk(addresses, sent, None)
+
+    report.elapsed = time.perf_counter() - started
+    return report
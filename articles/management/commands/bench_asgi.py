@@ -0,0 +1,128 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from articles.benchmarks import PERCENTILES, percentile
+
+SERVERS = ('wsgi', 'asgi')
+DEFAULT_PATHS = ('/articles/', '/api/articles/subscribed/')
+
+class Command(BaseCommand):
+    help = "Compare the async feed views served over WSGI (a thread pool) and ASGI (one event loop) under many open connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=500, help='Clients issuing requests at the same time')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per path and server')
+        parser.add_argument('--threads', type=int, default=32, help='WSGI worker threads')
+        parser.add_argument('--path', action='append', dest='paths', help=f"Path to request (default: {', '.join(DEFAULT_PATHS)})")
+        parser.add_argument('--server', choices=SERVERS, nargs='*', default=list(SERVERS))
+
+    def handle(self, *args, **options):
+        if min(options['connections'], options['requests'], options['threads']) < 1:
+            raise CommandError('--connections, --requests and --threads must be positive.')
+        User = get_user_model()
+        # The most-followed reader is the worst case for the subscribed feed
+        reader = (
+            User.objects.filter(role=User.Roles.READER)
+            .annotate(n=Count('subscriptions_to_journalists', distinct=True) + Count('subscriptions_to_publishers', distinct=True))
+            .order_by('-n').first()
+        )
+        if reader is None:
+            raise CommandError('bench_asgi needs a reader; run seed_scale first.')
+        client = Client()
+        client.force_login(reader)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        try:
+            for path in options['paths'] or DEFAULT_PATHS:
+                for server in options['server']:
+                    r = asyncio.run(self.measure(server, path, cookie, options))
+                    self.stdout.write(
+                        f"{server:<5} {path:<28} {r['requests'] / r['seconds']:8.1f} req/s  "
+                        + '  '.join(f"p{p} {r[f'p{p}_ms']:8.1f}ms" for p in PERCENTILES)
+                        + f"  {r['errors']} errors"
+                    )
+        finally:
+            client.logout()
+            connections.close_all()
+
+    async def measure(self, server, path, cookie, options):
+        path, _, query = path.partition('?')
+        if server == 'wsgi':
+            handler, pool = WSGIHandler(), ThreadPoolExecutor(options['threads'])
+            loop = asyncio.get_running_loop()
+
+            def call_wsgi():
+                environ = {
+                    'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+                    'HTTP_COOKIE': cookie, 'wsgi.input': BytesIO(),
+                }
+                setup_testing_defaults(environ)
+                statuses = []
+                response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+                try:
+                    b''.join(response)
+                finally:
+                    response.close()
+                return int(statuses[0].split()[0])
+
+            async def call():
+                return await loop.run_in_executor(pool, call_wsgi)
+        else:
+            handler, pool = ASGIHandler(), None
+
+            async def call():
+                scope = {
+                    'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                    'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+                    'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+                    'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+                }
+                received, disconnected = [], asyncio.Event()
+
+                async def receive():
+                    if not received:
+                        received.append(True)
+                        return {'type': 'http.request', 'body': b'', 'more_body': False}
+                    # The client stays connected until the response is sent
+                    await disconnected.wait()
+                    return {'type': 'http.disconnect'}
+
+                statuses = []
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        statuses.append(message['status'])
+
+                await handler(scope, receive, send)
+                disconnected.set()
+                return statuses[0]
+
+        await call()  # warm up caches and connections
+        remaining = iter(range(options['requests']))
+        latencies, errors = [], []
+
+        async def connection():
+            for _ in remaining:
+                started = time.perf_counter()
+                status = await call()
+                latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    errors.append(status)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connection() for _ in range(options['connections'])))
+        seconds = time.perf_counter() - started
+        if pool:
+            pool.shutdown()
+        result = {f'p{p}_ms': percentile(latencies, p) * 1000 for p in PERCENTILES}
+        result.update({'requests': len(latencies), 'errors': len(errors), 'seconds': seconds})
+        return result
@@ -0,0 +1,64 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+from articles import benchmarks
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = "Benchmark feed, listing and approval endpoints (latency percentiles, queries, memory) and save JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', nargs='*', help='Scenario names to run (default: all)')
+        parser.add_argument('--output', default='bench-results.json', help="Where to save results ('-' for stdout)")
+        parser.add_argument('--compare', metavar='BASELINE', help='Earlier results file to compare against')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be positive.')
+
+        def progress(name, result):
+            self.stdout.write(
+                f"{name:<18} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+                f"p99 {result['p99_ms']:8.2f}ms  {result['queries_mean']:5.1f} queries  "
+                f"{result['peak_memory_kib']:8.1f} KiB"
+            )
+
+        # The test client needs the test environment (ALLOWED_HOSTS, locmem email)
+        try:
+            setup_test_environment()
+            owns_environment = True
+        except RuntimeError:
+            # Already set up, e.g. when run from the test suite
+            owns_environment = False
+        try:
+            with transaction.atomic():
+                try:
+                    results = benchmarks.run(
+                        iterations=options['iterations'], warmup=options['warmup'],
+                        only=options['only'], progress=progress,
+                    )
+                except ValueError as e:
+                    raise CommandError(str(e))
+                # Drafts approved by the approve scenario are not kept
+                transaction.set_rollback(True)
+        finally:
+            if owns_environment:
+                teardown_test_environment()
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Saved results to {options['output']}"))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            for name, metric, before, after, change in benchmarks.compare(baseline, results):
+                self.stdout.write(f"{name:<18} {metric:<16} {before:>10} -> {after:<10} ({change:+.1%})")
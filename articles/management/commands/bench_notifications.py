@@ -0,0 +1,89 @@
+import tempfile
+import tracemalloc
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test.utils import override_settings
+from articles.models import Article, Newsletter
+from articles.newsletters import dispatch
+from articles.services import email_subscribers
+from publications.models import Publisher
+
+BACKENDS = {
+    'locmem': 'django.core.mail.backends.locmem.EmailBackend',
+    'file': 'django.core.mail.backends.filebased.EmailBackend',
+}
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = "Measure subscriber email and newsletter throughput against a local mail backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=100_000)
+        parser.add_argument('--chunk-size', type=int, default=None, help='Defaults to EMAIL_CHUNK_SIZE')
+        parser.add_argument('--backend', choices=BACKENDS, default='file')
+        parser.add_argument('--newsletter', action='store_true',
+                            help='Dispatch a newsletter of the article (with checkpoints) instead of the approval email')
+        parser.add_argument('--trace-memory', action='store_true', help='Report peak Python memory (slows sending down)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                # Never keep the generated subscribers
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        User = get_user_model()
+        n = options['subscribers']
+        journalist = User.objects.create(username='bench-journalist', role=User.Roles.JOURNALIST)
+        publisher = Publisher.objects.create(title='Bench Publisher')
+        article = Article.objects.create(
+            title='Bench article', content='Body', author=journalist, publisher=publisher, approved=True,
+        )
+
+        self.stdout.write(f"Creating {n} subscribers...")
+        readers = User.objects.bulk_create(
+            (User(username=f'bench-reader-{i}', email=f'reader{i}@example.com', role=User.Roles.READER)
+             for i in range(n)),
+            batch_size=5000,
+        )
+        if not readers[0].pk:
+            readers = User.objects.filter(username__startswith='bench-reader-')
+        # Half follow the publisher, half the journalist, every tenth both: exercises DISTINCT.
+        PublisherFollow = User.subscriptions_to_publishers.through
+        JournalistFollow = User.subscriptions_to_journalists.through
+        PublisherFollow.objects.bulk_create(
+            (PublisherFollow(user_id=r.pk, publisher_id=publisher.pk) for i, r in enumerate(readers) if i % 2 == 0 or i % 10 == 1),
+            batch_size=5000,
+        )
+        JournalistFollow.objects.bulk_create(
+            (JournalistFollow(from_user_id=r.pk, to_user_id=journalist.pk) for i, r in enumerate(readers) if i % 2 == 1),
+            batch_size=5000,
+        )
+
+        with tempfile.TemporaryDirectory() as outdir, override_settings(
+            EMAIL_BACKEND=BACKENDS[options['backend']], EMAIL_FILE_PATH=outdir,
+            **({'EMAIL_CHUNK_SIZE': options['chunk_size']} if options['chunk_size'] else {}),
+        ):
+            if options['trace_memory']:
+                tracemalloc.start()
+            if options['newsletter']:
+                newsletter = Newsletter.objects.create(title='Bench newsletter', author=journalist)
+                newsletter.articles.add(article)
+                report = dispatch(newsletter)
+            else:
+                report = email_subscribers(article)
+            memory = ''
+            if options['trace_memory']:
+                memory = f", peak memory {tracemalloc.get_traced_memory()[1] / 1_048_576:.1f} MiB"
+                tracemalloc.stop()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {report.sent} messages ({report.failed} failed) in {report.chunks} chunks, "
+            f"{report.elapsed:.2f}s, {report.rate:.0f} msg/s{memory}"
+        ))
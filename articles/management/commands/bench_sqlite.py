@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+from articles.models import Article, OutboxMessage
+from news_app.db import write_transaction
+
+PROFILES = ('default', 'concurrent')
+
+class Command(BaseCommand):
+    help = "Measure concurrent SQLite write/read throughput with SQLite's defaults and with the concurrent profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--articles', type=int, default=500, help='Approved articles to start with')
+        parser.add_argument('--profile', choices=PROFILES, nargs='*', default=list(PROFILES))
+
+    def handle(self, *args, **options):
+        if not settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):
+            raise CommandError('bench_sqlite needs the sqlite3 database backend.')
+        if options['writers'] < 1 or options['seconds'] <= 0:
+            raise CommandError('--writers and --seconds must be positive.')
+
+        results = {}
+        for profile in options['profile']:
+            # A scratch database file per profile: WAL mode sticks to the file
+            directory = tempfile.mkdtemp(prefix='bench-sqlite-')
+            try:
+                results[profile] = self.run(profile, os.path.join(directory, 'bench.sqlite3'), options)
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            r = results[profile]
+            self.stdout.write(
+                f"{profile:<11} {r['writes'] / r['seconds']:8.1f} writes/s  {r['reads'] / r['seconds']:8.1f} reads/s  "
+                f"{r['failed_writes']} failed writes  {r['failed_reads']} failed reads"
+            )
+        if len(results) == 2:
+            before, after = results['default'], results['concurrent']
+            self.stdout.write(self.style.SUCCESS(
+                f"concurrent vs default: writes x{_ratio(after['writes'], before['writes'])}, "
+                f"reads x{_ratio(after['reads'], before['reads'])}"
+            ))
+
+    def run(self, profile, path, options):
+        alias = f'bench_{profile}'
+        concurrent = profile == 'concurrent'
+        database = {
+            **settings.DATABASES['default'], 'NAME': path, 'TEST': {},
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'} if concurrent else {},
+        }
+        connections.settings[alias] = connections.configure_settings({'default': database})['default']
+        # The default profile neither tunes connections nor retries
+        profile_settings = {'SQLITE_PROFILE': profile}
+        if not concurrent:
+            profile_settings['SQLITE_WRITE_RETRIES'] = 0
+        try:
+            with override_settings(**profile_settings):
+                call_command('migrate', database=alias, verbosity=0, interactive=False)
+                return self.measure(alias, options)
+        finally:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+
+    def measure(self, alias, options):
+        User = get_user_model()
+        # bulk_create throughout: save signals would update search and caches on the default database
+        journalist, editor = User.objects.using(alias).bulk_create([
+            User(username='bench-journalist', role=User.Roles.JOURNALIST),
+            User(username='bench-editor', role=User.Roles.EDITOR),
+        ])
+        Article.objects.using(alias).bulk_create(
+            Article(title=f'Seed {i}', content='Body', author=journalist, approved=True)
+            for i in range(options['articles'])
+        )
+
+        @write_transaction(using=alias)
+        def submit_and_approve(n):
+            # As on the editor dashboard: read the queue, then write
+            oldest = Article.objects.using(alias).filter(status=Article.Status.PENDING).order_by('created_at', 'id').first()
+            Article.objects.using(alias).bulk_create([Article(title=f'Draft {n}', content='Body', author=journalist)])
+            if oldest:
+                Article.objects.using(alias).filter(pk=oldest.pk).update(
+                    status=Article.Status.APPROVED, approved=True, approved_by=editor, updated_at=timezone.now(),
+                )
+                OutboxMessage.objects.using(alias).create(topic='approval.email', payload={'article_id': oldest.pk})
+
+        def read_feed():
+            list(Article.objects.using(alias).filter(status=Article.Status.APPROVED).order_by('-created_at', '-id')[:20])
+
+        counts = {'writes': 0, 'failed_writes': 0, 'reads': 0, 'failed_reads': 0}
+        lock = threading.Lock()
+        start = threading.Barrier(options['writers'] + options['readers'] + 1)
+        deadline = []
+
+        def worker(operation, done, failed):
+            ok = errors = 0
+            start.wait()
+            try:
+                while time.perf_counter() < deadline[0]:
+                    try:
+                        operation(ok + errors)
+                        ok += 1
+                    except OperationalError:
+                        errors += 1
+            finally:
+                connections[alias].close()
+                with lock:
+                    counts[done] += ok
+                    counts[failed] += errors
+
+        threads = [
+            threading.Thread(target=worker, args=(submit_and_approve, 'writes', 'failed_writes'))
+            for _ in range(options['writers'])
+        ] + [
+            threading.Thread(target=worker, args=(lambda n: read_feed(), 'reads', 'failed_reads'))
+            for _ in range(options['readers'])
+        ]
+        for thread in threads:
+            thread.start()
+        started = time.perf_counter()
+        deadline.append(started + options['seconds'])
+        start.wait()
+        for thread in threads:
+            thread.join()
+        return {**counts, 'seconds': time.perf_counter() - started}
+
+def _ratio(after, before):
+    return f'{after / before:.1f}' if before else 'inf'
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from articles import images, outbox
+from articles.models import Article
+
+class Command(BaseCommand):
+    help = "Make missing card/detail image variants (e.g. for articles uploaded before variants existed)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='store_true', help='Queue the work for process_outbox instead of doing it now')
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        for article in Article.objects.exclude(image='').exclude(image__isnull=True).iterator():
+            if article.image_variants.get('source') == article.image.name:
+                continue
+            if options['queue']:
+                outbox.enqueue('image.derivatives', article_id=article.pk)
+                built += 1
+                continue
+            try:
+                images.build_variants(article)
+                built += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Article {article.pk}: {type(e).__name__}: {e}")
+        verb = 'Queued' if options['queue'] else 'Built'
+        self.stdout.write(self.style.SUCCESS(f"{verb} variants for {built} article(s), {failed} failed"))
@@ -0,0 +1,56 @@
+import os
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from articles import importer
+
+class Command(BaseCommand):
+    help = "Stream articles from a JSONL or CSV file into the database, resumably"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for standard input")
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per transaction')
+        parser.add_argument('--checkpoint', help='Checkpoint name (defaults to the absolute input path)')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the first row')
+        parser.add_argument('--skip-refresh', action='store_true',
+                            help='Leave the search, feed and cache refresh pending for a later run')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        source = options['checkpoint'] or (None if path == '-' else os.path.abspath(path))
+        if source is None:
+            raise CommandError('Reading from standard input needs --checkpoint to name the import.')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+
+        def progress(report):
+            self.stdout.write(
+                f"{report.resumed_from + report.imported + report.rejected} rows "
+                f"({report.imported} imported, {report.rejected} rejected), {report.rate:.0f} rows/s"
+            )
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            report = importer.import_rows(
+                importer.read_rows(stream, fmt), source,
+                chunk_size=options['chunk_size'], resume=not options['restart'], progress=progress,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for row_number, error in report.errors:
+            self.stderr.write(f"Row {row_number}: {error}")
+        if report.resumed_from:
+            self.stdout.write(f"Resumed after row {report.resumed_from}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.imported} articles ({report.rejected} rejected) "
+            f"in {report.elapsed:.2f}s, {report.rate:.0f} rows/s"
+        ))
+
+        if not options['skip_refresh']:
+            # Also finishes the refresh of an earlier run that stopped before it was done
+            readers = importer.refresh_derived_data(source)
+            if readers is not None:
+                self.stdout.write(self.style.SUCCESS(f"Refreshed search index and {readers} feed(s)"))
@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from articles import outbox
+from articles.models import OutboxMessage
+
+class Command(BaseCommand):
+    help = "Deliver queued notifications from the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Messages claimed per batch')
+        parser.add_argument('--once', action='store_true', help='Drain the due messages and exit instead of polling')
+        parser.add_argument('--idle-sleep', type=float, default=2.0, help='Seconds to wait when nothing is due')
+        parser.add_argument('--requeue-dead', action='store_true', help='Move dead-lettered messages back to pending and exit')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            count = OutboxMessage.objects.filter(status=OutboxMessage.Status.DEAD).update(
+                status=OutboxMessage.Status.PENDING, attempts=0, processed_at=None,
+            )
+            self.stdout.write(self.style.SUCCESS(f"Requeued {count} dead message(s)"))
+            return
+
+        try:
+            while True:
+                delivered, failed = outbox.process_batch(options['batch_size'])
+                if delivered or failed:
+                    self.stdout.write(f"Delivered {delivered}, failed {failed}")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['idle_sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS("Outbox worker stopped"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from articles import feed
+
+class Command(BaseCommand):
+    help = "Rebuild materialized subscription feeds from the subscription tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Only rebuild these readers (default: all readers)')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        readers = User.objects.filter(role=User.Roles.READER)
+        if options['usernames']:
+            readers = readers.filter(username__in=options['usernames'])
+
+        rebuilt = 0
+        for reader_id in readers.values_list('pk', flat=True).iterator():
+            with transaction.atomic():
+                feed.rebuild_reader(reader_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} feed(s)"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from articles import counters
+
+class Command(BaseCommand):
+    help = "Recount publisher and journalist counters (subscribers, articles, pending) and repair drift"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = counters.reconcile()
+        for label, rows in fixed.items():
+            self.stdout.write(f"{label}: {rows} row(s) repaired")
+        self.stdout.write(self.style.SUCCESS("Counters reconciled"))
@@ -0,0 +1,24 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from articles import popularity
+
+class Command(BaseCommand):
+    help = "Recompute the trending article ranking from recent view counts, every TRENDING_REFRESH_SECONDS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Refresh once and exit instead of repeating')
+        parser.add_argument('--interval', type=float, help='Seconds between refreshes (default: TRENDING_REFRESH_SECONDS)')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or settings.TRENDING_REFRESH_SECONDS
+        try:
+            while True:
+                ranked = popularity.refresh_trending()
+                self.stdout.write(f"Ranked {ranked} trending article(s)")
+                if options['once']:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS("Trending refresh stopped"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from articles import seeding
+
+class Command(BaseCommand):
+    help = "Generate publishers, journalists, readers, articles and power-law skewed subscriptions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--publishers', type=int, default=20)
+        parser.add_argument('--journalists', type=int, default=100)
+        parser.add_argument('--readers', type=int, default=1000)
+        parser.add_argument('--articles', type=int, default=5000)
+        parser.add_argument('--follows-per-reader', type=int, default=8, help='Mean sources followed per reader')
+        parser.add_argument('--alpha', type=float, default=1.1, help='Power-law exponent for popularity')
+        parser.add_argument('--approved-share', type=float, default=0.9)
+        parser.add_argument('--days', type=int, default=365, help='Spread article dates over this many days')
+        parser.add_argument('--prefix', default='scale', help='Prefix for generated names')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible datasets')
+
+    def handle(self, *args, **options):
+        if get_user_model().objects.filter(username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Users prefixed '{options['prefix']}-' already exist; pass another --prefix.")
+        if options['journalists'] < 1:
+            raise CommandError('--journalists must be at least 1.')
+
+        with transaction.atomic():
+            report = seeding.seed_scale(
+                publishers=options['publishers'], journalists=options['journalists'],
+                readers=options['readers'], articles=options['articles'],
+                follows_per_reader=options['follows_per_reader'], alpha=options['alpha'],
+                approved_share=options['approved_share'], days=options['days'],
+                prefix=options['prefix'], seed=options['seed'], progress=self.stdout.write,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {report.publishers} publishers, {report.journalists} journalists, {report.readers} readers, "
+            f"{report.articles} articles, {report.follows} follows and {report.feed_entries} feed entries "
+            f"in {report.elapsed:.1f}s"
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from articles import newsletters
+from articles.models import Newsletter
+
+class Command(BaseCommand):
+    help = "Email a newsletter to its subscribers now, resuming an interrupted dispatch"
+
+    def add_arguments(self, parser):
+        parser.add_argument('newsletter_id', type=int)
+        parser.add_argument('--chunk-size', type=int, default=None, help='Defaults to EMAIL_CHUNK_SIZE')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and send to everyone again')
+
+    def handle(self, *args, **options):
+        newsletter = Newsletter.objects.filter(pk=options['newsletter_id']).first()
+        if newsletter is None:
+            raise CommandError(f"Newsletter {options['newsletter_id']} does not exist.")
+        try:
+            report = newsletters.dispatch(newsletter, chunk_size=options['chunk_size'], restart=options['restart'])
+        except newsletters.DispatchInterrupted as e:
+            raise CommandError(f"{e}. Run the command again to resume.")
+        except newsletters.DispatchInProgress as e:
+            raise CommandError(f"{e}.")
+        if report is None:
+            self.stdout.write("Already sent; use --restart to send it again.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {report.sent} messages ({report.failed} failed) in {report.chunks} chunks, "
+            f"{report.elapsed:.2f}s, {report.rate:.0f} msg/s"
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0003_article_declined_at_article_declined_by_and_more'),
+        ('publications', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['approved', '-created_at', '-id'], name='article_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['approved', 'publisher', '-created_at', '-id'], name='article_pub_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['approved', 'author', '-created_at', '-id'], name='article_author_feed_idx'),
+        ),
+    ]
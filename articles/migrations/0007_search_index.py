@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    # The FTS5 index only exists on SQLite; other databases use the
+    # SearchDocument/SearchPosting tables created below.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS articles_article_fts USING fts5("
+        "title, content, author_id UNINDEXED, approved UNINDEXED, tokenize='porter unicode61')"
+    )
+    schema_editor.execute(
+        "INSERT INTO articles_article_fts (rowid, title, content, author_id, approved) "
+        "SELECT id, title, content, author_id, approved FROM articles_article"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS articles_article_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0006_outboxmessage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='articles.article')),
+                ('length', models.PositiveIntegerField()),
+                ('approved', models.BooleanField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='articles.searchdocument')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('term', 'document'), name='searchposting_term_document_uniq')],
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_status(apps, schema_editor):
+    # Until now the status was implied by ``approved`` and ``declined_at``
+    articles = apps.get_model('articles', 'Article').objects.using(schema_editor.connection.alias)
+    articles.filter(approved=True).update(status='APPROVED')
+    articles.filter(approved=False, declined_at__isnull=False).update(status='DECLINED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0011_article_review_claims'),
+        ('publications', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='article',
+            name='article_feed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='article',
+            name='article_pub_feed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='article',
+            name='article_author_feed_idx',
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='status',
+            field=models.CharField(choices=[('DRAFT', 'Draft'), ('PENDING', 'Pending'), ('APPROVED', 'Approved'), ('DECLINED', 'Declined'), ('ARCHIVED', 'Archived')], default='PENDING', editable=False, max_length=10),
+        ),
+        migrations.RunPython(backfill_status, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('status', 'APPROVED')), fields=['-created_at', '-id'], name='article_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('status', 'APPROVED')), fields=['publisher', '-created_at', '-id'], name='article_pub_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('status', 'APPROVED')), fields=['author', '-created_at', '-id'], name='article_author_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['created_at', 'id'], name='article_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['publisher', 'created_at', 'id'], name='article_pub_queue_idx'),
+        ),
+    ]
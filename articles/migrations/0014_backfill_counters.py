@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Article = apps.get_model('articles', 'Article')
+    Publisher = apps.get_model('publications', 'Publisher')
+    User = apps.get_model('users', 'User')
+
+    def count(model, column, **filters):
+        rows = model.objects.using(alias).filter(**{column: OuterRef('pk')}, **filters).order_by().values(column)
+        return Coalesce(Subquery(rows.annotate(n=Count('*')).values('n')), 0)
+
+    Publisher.objects.using(alias).update(
+        subscriber_count=count(User.subscriptions_to_publishers.through, 'publisher'),
+        article_count=count(Article, 'publisher', status='APPROVED'),
+        pending_count=count(Article, 'publisher', status='PENDING'),
+    )
+    User.objects.using(alias).update(
+        subscriber_count=count(User.subscriptions_to_journalists.through, 'to_user'),
+        article_count=count(Article, 'author', status='APPROVED'),
+        pending_count=count(Article, 'author', status='PENDING'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0013_article_views_trending'),
+        ('publications', '0003_counters'),
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0015_article_status_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='author_ids',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='publisher_ids',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='refresh_after_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='refresh_pending',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='importcheckpoint',
+            name='refresh_through_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -1,8 +1,38 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from publications.models import Publisher
+from users.models import LoadedValuesMixin
 
-class Article(models.Model):
+
+class ArticleQuerySet(models.QuerySet):
+    def with_related(self):
+        """
+        Load everything ArticleSerializer nests in a fixed number of queries:
+        one joined query for author and publisher, plus one each for the
+        publishers' editors and journalists.
+        """
+        return self.select_related('author', 'publisher').prefetch_related(
+            'publisher__editors', 'publisher__journalists',
+        )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create() skips save(), so keep status and approved in step here
+        objs = list(objs)
+        for obj in objs:
+            obj.sync_status()
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class InvalidTransition(ValueError):
+    """An article cannot move from its current status to the one requested."""
+
+
+class ClaimedByOther(Exception):
+    """Another editor holds a live review claim on the article."""
+
+
+class Article(LoadedValuesMixin, models.Model):
     """
     Represents a news article created by a journalist.
     
@@ -12,13 +42,33 @@ class Article(models.Model):
         image (ImageField): Optional image for the article.
         author (User): The journalist who wrote the article.
         publisher (Publisher): The publisher associated with the article.
-        approved (bool): Status of approval by an editor.
+        status (str): Where the article is in its lifecycle; see ``TRANSITIONS``.
+        approved (bool): Status of approval by an editor; kept equal to ``status == APPROVED``.
+        claimed_by (User): Editor reviewing the article, while ``claimed_until`` is in the future.
+        claimed_until (datetime): When the review claim lapses and other editors may take it.
     """
+    class Status(models.TextChoices):
+        DRAFT = 'DRAFT', 'Draft'
+        PENDING = 'PENDING', 'Pending'
+        APPROVED = 'APPROVED', 'Approved'
+        DECLINED = 'DECLINED', 'Declined'
+        ARCHIVED = 'ARCHIVED', 'Archived'
+
+    # The statuses each status may move to
+    TRANSITIONS = {
+        Status.DRAFT: {Status.PENDING, Status.ARCHIVED},
+        Status.PENDING: {Status.APPROVED, Status.DECLINED, Status.DRAFT, Status.ARCHIVED},
+        Status.APPROVED: {Status.DECLINED, Status.ARCHIVED},
+        Status.DECLINED: {Status.PENDING, Status.APPROVED, Status.ARCHIVED},
+        Status.ARCHIVED: {Status.DRAFT},
+    }
+
     title = models.CharField(max_length=200)
     content = models.TextField()
     image = models.ImageField(upload_to='articles/', blank=True, null=True)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='authored_articles')
     publisher = models.ForeignKey(Publisher, on_delete=models.SET_NULL, null=True, blank=True, related_name='articles')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, editable=False)
     approved = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -26,10 +76,124 @@ class Article(models.Model):
     declined_reason = models.TextField(blank=True)
     declined_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='declined_articles')
     declined_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='claimed_articles')
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    # Resized copies of ``image`` made by articles.images, e.g. {"source":
+    # "images/originals/<hash>.jpg", "card": {"name": ..., "width": 400, "height": 225}}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    objects = ArticleQuerySet.as_manager()
+
+    class Meta:
+        # Feeds are read newest first and the review queue oldest first, both
+        # with keyset pagination on (created_at, id). The partial indexes
+        # cover only the approved or pending rows, so each page is a short
+        # range scan. MySQL/MariaDB do not support partial indexes and Django
+        # skips them there, so the composite indexes leading with ``status``
+        # serve the same queries on every backend.
+        indexes = [
+            models.Index(fields=['status', 'created_at', 'id'], name='article_status_idx'),
+            models.Index(fields=['status', 'publisher', 'created_at', 'id'], name='article_status_pub_idx'),
+            models.Index(fields=['status', 'author', 'created_at', 'id'], name='article_status_author_idx'),
+            models.Index(
+                fields=['-created_at', '-id'], name='article_feed_idx',
+                condition=models.Q(status='APPROVED'),
+            ),
+            models.Index(
+                fields=['publisher', '-created_at', '-id'], name='article_pub_feed_idx',
+                condition=models.Q(status='APPROVED'),
+            ),
+            models.Index(
+                fields=['author', '-created_at', '-id'], name='article_author_feed_idx',
+                condition=models.Q(status='APPROVED'),
+            ),
+            models.Index(
+                fields=['created_at', 'id'], name='article_queue_idx',
+                condition=models.Q(status='PENDING'),
+            ),
+            models.Index(
+                fields=['publisher', 'created_at', 'id'], name='article_pub_queue_idx',
+                condition=models.Q(status='PENDING'),
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.sync_status()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'status', 'approved'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'status', 'approved'}
+        super().save(*args, **kwargs)
+
+    def sync_status(self):
+        """
+        Make ``approved`` agree with ``status``.
+
+        ``status`` wins if it was changed since the article was loaded;
+        otherwise code that only set ``approved`` moves the status to
+        approved or back to pending.
+        """
+        old_status = self.loaded_value('status', self.Status.PENDING)
+        if self.status == old_status and self.approved != self.loaded_value('approved', False):
+            self.status = self.Status.APPROVED if self.approved else self.Status.PENDING
+        self.approved = self.status == self.Status.APPROVED
+
+    def can_transition(self, status):
+        return status in self.TRANSITIONS[self.status]
+
+    def transition(self, status):
+        """Move to ``status``, raising :class:`InvalidTransition` if that is not allowed."""
+        if not self.can_transition(status):
+            raise InvalidTransition(
+                f'Article {self.pk} cannot go from {self.get_status_display().lower()} '
+                f'to {self.Status(status).label.lower()}.'
+            )
+        self.status = status
+        self.approved = status == self.Status.APPROVED
+
+    def is_claimed_by_other(self, user, now=None):
+        """True if another editor holds a live review claim on this article."""
+        return bool(
+            self.claimed_by_id and self.claimed_by_id != user.pk
+            and self.claimed_until and self.claimed_until > (now or timezone.now())
+        )
+
+    def image_variant(self, name):
+        """
+        ``{'url', 'width', 'height'}`` of the ``name`` image variant.
+
+        Falls back to the original upload (without dimensions) until the
+        variants have been made, and returns None if there is no image.
+        """
+        if not self.image:
+            return None
+        variant = self.image_variants.get(name)
+        # Variants of a previous image are ignored until the new one is processed
+        if variant and self.image_variants.get('source') == self.image.name:
+            return {
+                'url': self.image.storage.url(variant['name']),
+                'width': variant['width'], 'height': variant['height'],
+            }
+        return {'url': self.image.url, 'width': None, 'height': None}
+
+    @property
+    def card_image(self):
+        return self.image_variant('card')
+
+    @property
+    def detail_image(self):
+        return self.image_variant('detail')
+
+class NewsletterQuerySet(models.QuerySet):
+    def with_related(self):
+        """Load the author and every nested article in a fixed number of queries."""
+        return self.select_related('author').prefetch_related(
+            models.Prefetch('articles', queryset=Article.objects.with_related()),
+        )
+
+
 class Newsletter(models.Model):
     """
     Represents a newsletter aggregating multiple articles.
@@ -46,5 +210,232 @@ class Newsletter(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='newsletters')
     articles = models.ManyToManyField(Article, related_name='newsletters')
 
+    objects = NewsletterQuerySet.as_manager()
+
     def __str__(self):
         return self.title
+
+class FeedEntry(models.Model):
+    """
+    One row of a reader's materialized subscription feed.
+
+    Rows are written when an article is approved (fan-out on write) and when
+    a reader follows a new source, so reading the feed is a single range scan
+    over the (reader, created_at) index. ``created_at`` is copied from the
+    article so that scan never has to join back to the article table.
+
+    Attributes:
+        reader (User): The reader whose feed this row belongs to.
+        article (Article): The approved article shown in the feed.
+        created_at (datetime): Copy of ``article.created_at`` used for ordering.
+    """
+    reader = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='feed_entries')
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='feed_entries')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['reader', 'article'], name='feedentry_reader_article_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['reader', '-created_at', '-article'], name='feedentry_reader_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.reader_id} <- {self.article_id}'
+
+class OutboxMessage(models.Model):
+    """
+    A side effect (email, social post, ...) waiting to be performed by the worker.
+
+    Messages are written in the same transaction as the change that caused
+    them, so they exist if and only if that change committed. The
+    ``process_outbox`` command delivers them with retries and backoff.
+
+    Attributes:
+        topic (str): Which handler delivers the message.
+        payload (dict): Handler arguments, e.g. ``{"article_id": 1}``.
+        status (str): Pending, done, or dead (gave up after too many failures).
+        attempts (int): Delivery attempts so far.
+        available_at (datetime): Earliest time the message may be (re)tried.
+        last_error (str): The most recent delivery error, if any.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        DONE = 'DONE', 'Done'
+        DEAD = 'DEAD', 'Dead'
+
+    topic = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} #{self.pk} ({self.status})'
+
+class SearchDocument(models.Model):
+    """
+    Per-article statistics for the portable inverted-index search backend.
+
+    ``approved`` and ``author`` are copied from the article so searches can
+    apply role visibility without joining the article table. Not used when
+    SQLite's FTS5 backend is active (see ``articles.search``).
+
+    Attributes:
+        article (Article): The indexed article.
+        length (int): Weighted number of tokens, for BM25 length normalisation.
+        approved (bool): Copy of ``article.approved``.
+        author (User): Copy of ``article.author``.
+    """
+    article = models.OneToOneField(Article, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    length = models.PositiveIntegerField()
+    approved = models.BooleanField()
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+
+    def __str__(self):
+        return f'Search document for article {self.article_id}'
+
+class SearchPosting(models.Model):
+    """
+    One term of the inverted index: how often ``term`` occurs in a document.
+
+    Attributes:
+        term (str): Lower-cased token.
+        document (SearchDocument): The document containing the term.
+        frequency (int): Weighted occurrence count (title hits count extra).
+    """
+    term = models.CharField(max_length=64)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+    frequency = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'document'], name='searchposting_term_document_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.term} in {self.document_id}'
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of a resumable ``import_articles`` run.
+
+    Updated in the same transaction as each imported chunk, so after a crash
+    the import resumes exactly after the last committed row.
+
+    The rows a chunk imports still need indexing, feed fan-out and counter
+    updates, so the chunk also records them as pending refresh; the flag is
+    cleared only once the refresh has finished, and a run that crashed in
+    between finishes it on the next run.
+
+    Attributes:
+        source (str): Identifies the input, by default its absolute path.
+        position (int): Input rows already processed (imported or rejected).
+        refresh_pending (bool): Imported rows are waiting for the refresh.
+        refresh_after_id (int): Articles with a larger ID may need the refresh...
+        refresh_through_id (int): ...up to and including this one.
+        author_ids (list): Authors of the articles waiting for the refresh.
+        publisher_ids (list): Publishers of the articles waiting for the refresh.
+        updated_at (datetime): When the last chunk was committed.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    position = models.PositiveBigIntegerField(default=0)
+    refresh_pending = models.BooleanField(default=False)
+    refresh_after_id = models.PositiveBigIntegerField(default=0)
+    refresh_through_id = models.PositiveBigIntegerField(default=0)
+    author_ids = models.JSONField(default=list)
+    publisher_ids = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.source} @ {self.position}'
+
+class NewsletterDispatch(models.Model):
+    """
+    Progress of sending a newsletter to its recipients.
+
+    Recipients are sent to in email order, and ``cursor`` (the last address
+    handed to the mail backend) is saved after every chunk, so an
+    interrupted dispatch resumes with the next address instead of starting over.
+
+    Attributes:
+        newsletter (Newsletter): The newsletter being sent.
+        status (str): Queued, sending, or sent.
+        cursor (str): Last email address sent to; empty before the first chunk.
+        sent (int): Messages accepted by the mail backend so far.
+        failed (int): Messages the backend did not accept.
+        completed_at (datetime): When the last recipient was sent to.
+    """
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', 'Queued'
+        SENDING = 'SENDING', 'Sending'
+        SENT = 'SENT', 'Sent'
+
+    newsletter = models.OneToOneField(Newsletter, on_delete=models.CASCADE, related_name='dispatch')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    cursor = models.CharField(max_length=254, blank=True)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.newsletter_id} ({self.status}, {self.sent} sent)'
+
+class ArticleViewCount(models.Model):
+    """
+    Page views of an article in one clock hour.
+
+    Views are buffered in each process and added here in batches (see
+    ``articles.popularity``), never written per request.
+
+    Attributes:
+        article (Article): The article viewed.
+        hour (datetime): Start of the hour the views fall in.
+        views (int): Views counted so far.
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='view_counts')
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'hour'], name='articleviewcount_article_hour_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='articleviewcount_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.article_id} @ {self.hour:%Y-%m-%d %H}:00: {self.views}'
+
+class TrendingArticle(models.Model):
+    """
+    One entry of the precomputed trending ranking.
+
+    The table is replaced as a whole by ``refresh_trending``; trending
+    pages read it instead of scoring articles per request.
+
+    Attributes:
+        article (Article): The ranked article.
+        rank (int): Position in the ranking, from 1.
+        score (float): Time-decayed view count the ranking is ordered by.
+        refreshed_at (datetime): When the ranking was computed.
+    """
+    article = models.OneToOneField(Article, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    rank = models.PositiveIntegerField(unique=True)
+    score = models.FloatField()
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'#{self.rank} {self.article_id} ({self.score:.1f})'
@@ -0,0 +1,165 @@
+"""
+Newsletter delivery.
+
+``queue_dispatch`` records a ``NewsletterDispatch`` and queues a
+``newsletter.dispatch`` outbox message in one transaction; the outbox
+worker then calls :func:`dispatch`, which:
+
+* renders the newsletter once (every recipient gets the same message);
+* resolves recipients with one set-based query per page: the distinct
+  addresses of everyone following the author or publisher of an approved
+  article in the newsletter;
+* sends one message per address through a single mail connection, in
+  ``EMAIL_CHUNK_SIZE`` chunks, saving the last address sent to after
+  every chunk.
+
+Recipients are paged in email order from that checkpoint, so a worker that
+crashes resumes with the next address. At most the chunk that was in
+flight when it died can be delivered twice.
+
+Each checkpoint also renews the outbox lease, so a long dispatch is not
+handed to a second worker halfway through. A dispatch that is ``SENDING``
+and has checkpointed within ``OUTBOX_LEASE_SECONDS`` is taken to be alive:
+another run (the worker or ``send_newsletter``) refuses to start. A run
+that fails puts the dispatch back to ``QUEUED`` so a retry can resume.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import outbox
+from .mailing import send_individually
+from .models import Article, NewsletterDispatch
+
+logger = logging.getLogger(__name__)
+
+
+class DispatchInterrupted(RuntimeError):
+    """A chunk failed; the dispatch stops at its checkpoint so a retry resumes there."""
+
+
+class DispatchInProgress(RuntimeError):
+    """Another run is sending the newsletter; try again once it has finished or stalled."""
+
+
+def newsletter_articles(newsletter):
+    return Article.objects.filter(newsletters=newsletter, status=Article.Status.APPROVED).select_related('author', 'publisher')
+
+
+def render(newsletter, articles):
+    """Return ``(subject, body)`` for ``newsletter``."""
+    body = render_to_string('articles/email/newsletter.txt', {'newsletter': newsletter, 'articles': articles})
+    return f'Newsletter: {newsletter.title}', body
+
+
+def recipients(newsletter):
+    """
+    Distinct, ordered email addresses of everyone following an author or
+    publisher of the newsletter's approved articles.
+
+    Followers are matched with ``pk IN (subquery)`` over the article set, as
+    ``subscriber_emails`` does for one article, so the query cost does not
+    depend on how many articles or follows there are.
+    """
+    User = get_user_model()
+    articles = newsletter_articles(newsletter).order_by()
+    followers = Q(pk__in=User.subscriptions_to_journalists.through.objects.filter(
+        to_user_id__in=articles.values('author_id')).values('from_user_id'))
+    followers |= Q(pk__in=User.subscriptions_to_publishers.through.objects.filter(
+        publisher_id__in=articles.exclude(publisher=None).values('publisher_id')).values('user_id'))
+    return User.objects.filter(followers).exclude(email='').order_by('email').values_list('email', flat=True).distinct()
+
+
+def _pages(queryset, after, page_size):
+    """Yield the addresses of ``queryset`` after ``after``, one keyset page at a time."""
+    while True:
+        page = list(queryset.filter(email__gt=after)[:page_size])
+        yield from page
+        if len(page) < page_size:
+            return
+        after = page[-1]
+
+
+def queue_dispatch(newsletter):
+    """
+    Queue ``newsletter`` for sending. Returns its dispatch, or None if it
+    has already been queued or sent.
+    """
+    with transaction.atomic():
+        dispatch, created = NewsletterDispatch.objects.get_or_create(newsletter=newsletter)
+        if not created:
+            return None
+        outbox.enqueue('newsletter.dispatch', newsletter_id=newsletter.pk)
+    return dispatch
+
+
+def dispatch(newsletter, chunk_size=None, connection=None, restart=False):
+    """
+    Send ``newsletter`` to every recipient not yet sent to and return the
+    ``DeliveryReport`` of this run.
+
+    Raises :class:`DispatchInterrupted` when a chunk fails, leaving the
+    checkpoint before it, and :class:`DispatchInProgress` if another run is
+    sending it.
+    """
+    chunk_size = chunk_size or settings.EMAIL_CHUNK_SIZE
+    state, _ = NewsletterDispatch.objects.get_or_create(newsletter=newsletter)
+    if state.status == NewsletterDispatch.Status.SENT and not restart:
+        logger.info('Newsletter %s was already sent', newsletter.pk)
+        return None
+    now = timezone.now()
+    changes = {'status': NewsletterDispatch.Status.SENDING, 'updated_at': now}
+    if restart:
+        changes.update(cursor='', sent=0, failed=0, completed_at=None)
+    # Claimed with one UPDATE so two runs cannot both see the other as stalled
+    alive = Q(status=NewsletterDispatch.Status.SENDING, updated_at__gt=now - timedelta(seconds=settings.OUTBOX_LEASE_SECONDS))
+    if not NewsletterDispatch.objects.filter(pk=state.pk).exclude(alive).update(**changes):
+        raise DispatchInProgress(f'Newsletter {newsletter.pk} is being sent by another worker')
+    state.refresh_from_db()
+
+    subject, body = render(newsletter, list(newsletter_articles(newsletter).order_by('-created_at', '-id')))
+
+    def checkpoint(addresses, sent, error):
+        if error:
+            raise DispatchInterrupted(f'Newsletter {newsletter.pk} stopped after {state.cursor!r}: {error}')
+        state.cursor = addresses[-1]
+        NewsletterDispatch.objects.filter(pk=state.pk).update(
+            cursor=state.cursor, sent=F('sent') + sent, failed=F('failed') + len(addresses) - sent,
+            updated_at=timezone.now(),
+        )
+        outbox.renew_lease()
+
+    try:
+        report = send_individually(
+            _pages(recipients(newsletter), state.cursor, chunk_size), subject, body,
+            chunk_size=chunk_size, connection=connection, on_chunk=checkpoint,
+        )
+    except Exception:
+        # Not sending any more, so a retry may resume at once
+        NewsletterDispatch.objects.filter(pk=state.pk).update(
+            status=NewsletterDispatch.Status.QUEUED, updated_at=timezone.now(),
+        )
+        raise
+    NewsletterDispatch.objects.filter(pk=state.pk).update(
+        status=NewsletterDispatch.Status.SENT, completed_at=timezone.now(), updated_at=timezone.now(),
+    )
+    logger.info(
+        'Newsletter %s: emailed %s recipients in %s chunks (%.0f msg/s), %s failed',
+        newsletter.pk, report.sent, report.chunks, report.rate, report.failed,
+    )
+    return report
+
+
+def deliver_newsletter(payload):
+    """Outbox handler for ``newsletter.dispatch``."""
+    state = NewsletterDispatch.objects.select_related('newsletter').filter(
+        newsletter_id=payload['newsletter_id'],
+    ).first()
+    if state:
+        dispatch(state.newsletter)
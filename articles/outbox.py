@@ -0,0 +1,121 @@
+"""
+Transactional outbox for side effects of editorial actions.
+
+Callers ``enqueue`` a message inside the transaction that makes the change
+(e.g. approving an article), so no notification is lost if the request
+dies after committing and none is sent for a change that rolled back. The
+``process_outbox`` command drains due messages in batches:
+
+* a claimed message becomes invisible for ``OUTBOX_LEASE_SECONDS`` so that
+  a crashed worker's messages are picked up again later. Handlers that run
+  longer than that call :func:`renew_lease` as they make progress;
+* a failed delivery is retried after an exponential backoff;
+* after ``OUTBOX_MAX_ATTEMPTS`` failures the message is dead-lettered and
+  kept with its last error for inspection.
+"""
+import logging
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+# The message whose handler is running
+_delivering = ContextVar('outbox_delivering', default=None)
+
+# Topic -> dotted path of a callable taking the message payload.
+HANDLERS = {
+    'approval.email': 'articles.services.deliver_approval_email',
+    'approval.social': 'articles.services.deliver_approval_post',
+    'approval.batch': 'articles.services.deliver_approval_batch',
+    'image.derivatives': 'articles.images.process_article_image',
+    'newsletter.dispatch': 'articles.newsletters.deliver_newsletter',
+}
+
+
+def enqueue(topic, **payload):
+    if topic not in HANDLERS:
+        raise ValueError(f'Unknown outbox topic: {topic}')
+    return OutboxMessage.objects.create(topic=topic, payload=payload)
+
+
+def backoff_delay(attempts):
+    """Seconds to wait before retry number ``attempts`` (1-based)."""
+    return min(settings.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), settings.OUTBOX_BACKOFF_MAX)
+
+
+def claim_batch(batch_size):
+    """
+    Lease up to ``batch_size`` due messages to this worker.
+
+    Rows are locked with SKIP LOCKED where the database supports it, so
+    several workers can drain the outbox without claiming the same message.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxMessage.Status.PENDING, available_at__lte=now)
+            .order_by('available_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        OutboxMessage.objects.filter(pk__in=ids).update(
+            attempts=F('attempts') + 1,
+            available_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS),
+        )
+    return list(OutboxMessage.objects.filter(pk__in=ids).order_by('available_at', 'id'))
+
+
+def renew_lease():
+    """
+    Extend the lease on the message being delivered by ``OUTBOX_LEASE_SECONDS``
+    from now, so no other worker claims it while its handler is still making
+    progress. Does nothing outside a delivery.
+    """
+    message = _delivering.get()
+    if message is not None:
+        OutboxMessage.objects.filter(pk=message.pk, status=OutboxMessage.Status.PENDING).update(
+            available_at=timezone.now() + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS),
+        )
+
+
+def deliver(message):
+    """Run one claimed message's handler and record the outcome. Returns True on success."""
+    token = _delivering.set(message)
+    try:
+        import_string(HANDLERS[message.topic])(message.payload)
+    except Exception as e:
+        logger.exception('Outbox message %s failed (attempt %s)', message.pk, message.attempts)
+        message.last_error = f'{type(e).__name__}: {e}'
+        if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            message.status = OutboxMessage.Status.DEAD
+            message.processed_at = timezone.now()
+        else:
+            message.available_at = timezone.now() + timedelta(seconds=backoff_delay(message.attempts))
+        message.save(update_fields=['status', 'available_at', 'last_error', 'processed_at'])
+        return False
+    finally:
+        _delivering.reset(token)
+
+    message.status = OutboxMessage.Status.DONE
+    message.processed_at = timezone.now()
+    message.save(update_fields=['status', 'processed_at'])
+    return True
+
+
+def process_batch(batch_size=100):
+    """Claim and deliver one batch. Returns ``(delivered, failed)`` counts."""
+    delivered = failed = 0
+    for message in claim_batch(batch_size):
+        if deliver(message):
+            delivered += 1
+        else:
+            failed += 1
+    return delivered, failed
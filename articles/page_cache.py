@@ -0,0 +1,335 @@
+"""
+Cache for the public HTML feeds and article pages.
+
+Rendered pages for anonymous visitors (with their headers), and the article
+cards inside them, are stored in the Django cache under keys that embed a
+*generation counter*:
+
+* one counter per feed (``home``, ``independent``, ``publishers``,
+  ``trending``), bumped when an article that is or was visible in that feed
+  changes, and for ``trending`` also when the ranking is recomputed;
+* one counter per article, bumped whenever the article is saved or deleted;
+* one counter per publisher and per author, bumped when the publisher's
+  title or the author's username changes, since cards and article pages
+  show both;
+* collection counters (all articles, newsletters) and per-reader counters
+  used by the HTTP validators in ``articles.conditional``.
+
+Invalidation is therefore a single ``incr`` rather than a wildcard delete;
+entries from older generations are simply never read again and expire.
+Counters move only once the change that caused the bump has committed:
+a request that read the new generation before the commit would otherwise
+cache the old content under it.
+Concurrent misses on the same key are collapsed with a lock (single flight)
+so that only one request renders while the others wait for its result.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from .models import Article
+
+KEY_PREFIX = 'pagecache'
+FEEDS = ('home', 'independent', 'publishers', 'trending')
+LOCK_POLL_INTERVAL = 0.05
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event, n=1):
+    with _stats_lock:
+        _stats[event] += n
+
+
+def stats():
+    """Hit/miss/invalidation counters for this process, plus the hit ratio."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    lookups = snapshot.get('hits', 0) + snapshot.get('misses', 0)
+    snapshot['hit_ratio'] = snapshot.get('hits', 0) / lookups if lookups else 0.0
+    return snapshot
+
+
+def _generation_key(kind, name):
+    return f'{KEY_PREFIX}:gen:{kind}:{name}'
+
+
+def _mtime_key(kind, name):
+    return f'{KEY_PREFIX}:mtime:{kind}:{name}'
+
+
+def _read_seeded(cache_keys, seed):
+    """
+    ``get_many`` that initialises missing keys to ``seed``.
+
+    Counters start from the current time rather than 0 so that a cold or
+    flushed cache never reproduces a generation (and so an ETag) that was
+    handed out before.
+    """
+    values = cache.get_many(cache_keys)
+    missing = [key for key in cache_keys if key not in values]
+    for key in missing:
+        cache.add(key, seed, timeout=None)
+    if missing:
+        values.update(cache.get_many(missing))
+    return [values.get(key, seed) for key in cache_keys]
+
+
+def generations(*keys):
+    """Current generation of each ``(kind, name)`` pair, as a tuple."""
+    return tuple(_read_seeded([_generation_key(kind, name) for kind, name in keys], time.time_ns()))
+
+
+def last_modified(*keys):
+    """Unix time of the most recent bump of any of ``keys``."""
+    return max(_read_seeded([_mtime_key(kind, name) for kind, name in keys], int(time.time())))
+
+
+def bump(kind, name):
+    """Move ``(kind, name)`` to a new generation when the current transaction commits."""
+    transaction.on_commit(lambda: _bump(kind, name))
+
+
+def _bump(kind, name):
+    key = _generation_key(kind, name)
+    # add() is a no-op if the counter exists; incr() then bumps it atomically
+    cache.add(key, time.time_ns(), timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, time.time_ns(), timeout=None)
+    cache.set(_mtime_key(kind, name), int(time.time()), timeout=None)
+    _count('invalidations')
+
+
+def invalidate_article(article, was_approved=False, old_publisher_id=None):
+    """
+    Invalidate cached output that shows ``article``.
+
+    The article's own generation and the ``articles`` collection (everything
+    editors can list) always move. Feed generations only move if the article
+    is, or was until this change, visible in that feed, so saving a draft
+    does not flush the public feeds.
+    """
+    bump('article', article.pk)
+    bump('collection', 'articles')
+    if not (article.approved or was_approved):
+        return
+    bump('feed', 'home')
+    bump('feed', 'trending')
+    for publisher_id in {article.publisher_id, old_publisher_id}:
+        bump('feed', 'publishers' if publisher_id else 'independent')
+
+
+def invalidate_source(kind, pk):
+    """
+    Invalidate cards, article pages and listings showing a publisher's title
+    or an author's name, after ``kind`` (``'publisher'`` or ``'author'``)
+    ``pk`` changed.
+    """
+    bump(kind, pk)
+    bump('collection', 'articles')
+    for name in FEEDS:
+        bump('feed', name)
+
+
+def source_keys(author_id, publisher_id):
+    """Generation keys of the author and publisher an article is shown with."""
+    return [('author', author_id)] + ([('publisher', publisher_id)] if publisher_id else [])
+
+
+def article_keys(article_id):
+    """
+    Generation keys of the page showing article ``article_id``: its own and
+    its author's and publisher's, looked up with one indexed query.
+    """
+    sources = Article.objects.filter(pk=article_id).values_list('author_id', 'publisher_id').first()
+    return [('article', article_id)] + (source_keys(*sources) if sources else [])
+
+
+def get_or_render(key, render):
+    """
+    Return cached content for ``key`` or produce it with ``render()``.
+
+    ``render`` returns ``(content, cacheable)``. While one caller renders a
+    missing key, others wait up to ``PAGE_CACHE_LOCK_WAIT`` seconds for the
+    result before falling back to rendering it themselves.
+    """
+    content = cache.get(key)
+    if content is not None:
+        _count('hits')
+        return content
+    _count('misses')
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, timeout=settings.PAGE_CACHE_LOCK_TIMEOUT):
+        deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            content = cache.get(key)
+            if content is not None:
+                _count('coalesced')
+                return content
+        _count('lock_timeouts')
+        return render()[0]
+
+    try:
+        content, cacheable = render()
+        if cacheable:
+            cache.set(key, content, timeout=settings.PAGE_CACHE_TIMEOUT)
+        return content
+    finally:
+        cache.delete(lock_key)
+
+
+async def aget_or_render(key, render):
+    """
+    :func:`get_or_render` for async views: ``render`` is a coroutine function,
+    and waiting for another request's render does not hold a thread.
+    """
+    content = await cache.aget(key)
+    if content is not None:
+        _count('hits')
+        return content
+    _count('misses')
+
+    lock_key = f'{key}:lock'
+    if not await cache.aadd(lock_key, 1, timeout=settings.PAGE_CACHE_LOCK_TIMEOUT):
+        deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            content = await cache.aget(key)
+            if content is not None:
+                _count('coalesced')
+                return content
+        _count('lock_timeouts')
+        return (await render())[0]
+
+    try:
+        content, cacheable = await render()
+        if cacheable:
+            await cache.aset(key, content, timeout=settings.PAGE_CACHE_TIMEOUT)
+        return content
+    finally:
+        await cache.adelete(lock_key)
+
+
+def _cacheable_request(request):
+    # Pages are shared between visitors, so only cache what is the same for
+    # everyone: anonymous GETs with no flash messages waiting to be shown.
+    return (
+        request.method == 'GET'
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def _cache_entry(response):
+    # What is stored for a page, and whether it may be: the status, headers
+    # and body of a 200 that sets no cookies (those are per visitor)
+    entry = (response.status_code, list(response.items()), response.content)
+    return entry, response.status_code == 200 and not response.cookies
+
+
+def _replay(entry):
+    status, headers, content = entry
+    response = HttpResponse(content, status=status)
+    for name, value in headers:
+        response.headers[name] = value
+    return response
+
+
+def cached_page(feed=None, article_kwarg=None):
+    """
+    Cache a view's rendered response for anonymous visitors.
+
+    The cache key combines the full request path with the generation of
+    ``feed``, or those of the article named by the URL kwarg
+    ``article_kwarg`` (see :func:`article_keys`). Only 200 responses that
+    set no cookies are cached, together with their headers (Content-Type,
+    Vary, Cache-Control, ...). Works on sync and async views.
+    """
+    def page_key(request, view, kwargs):
+        # None when the page must not be shared
+        if not _cacheable_request(request):
+            return None
+        scopes = [('feed', feed)] if feed else article_keys(kwargs[article_kwarg])
+        path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f'{KEY_PREFIX}:response:{view.__name__}:{":".join(map(str, generations(*scopes)))}:{path_hash}'
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # The session, user and messages are read synchronously
+                key = await sync_to_async(page_key)(request, view, kwargs)
+                if key is None:
+                    return await view(request, *args, **kwargs)
+                rendered = []
+
+                async def render():
+                    rendered.append(await view(request, *args, **kwargs))
+                    return _cache_entry(rendered[0])
+
+                entry = await aget_or_render(key, render)
+                # This request rendered the page itself: return it as it is
+                return rendered[0] if rendered else _replay(entry)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = page_key(request, view, kwargs)
+            if key is None:
+                return view(request, *args, **kwargs)
+            rendered = []
+
+            def render():
+                rendered.append(view(request, *args, **kwargs))
+                return _cache_entry(rendered[0])
+
+            entry = get_or_render(key, render)
+            return rendered[0] if rendered else _replay(entry)
+        return wrapper
+    return decorator
+
+
+def attach_cached_cards(request, articles, template='articles/_card.html'):
+    """
+    Pre-render feed cards for anonymous visitors, reusing cached fragments.
+
+    Sets ``article.cached_card`` on each article; the feed template outputs
+    it instead of rendering the card include. Logged-in users see per-user
+    buttons on cards, so they are left to render normally.
+    """
+    if request.user.is_authenticated or not articles:
+        return
+    scopes = [[('article', article.pk), *source_keys(article.author_id, article.publisher_id)] for article in articles]
+    unique = list(dict.fromkeys(scope for card in scopes for scope in card))
+    gens = dict(zip(unique, generations(*unique)))
+    keys = [
+        f'{KEY_PREFIX}:card:{article.pk}:' + ':'.join(str(gens[scope]) for scope in card)
+        for article, card in zip(articles, scopes)
+    ]
+    found = cache.get_many(keys)
+    _count('hits', len(found))
+    _count('misses', len(keys) - len(found))
+    missing = {}
+    for article, key in zip(articles, keys):
+        if key not in found:
+            found[key] = missing[key] = render_to_string(template, {'article': article}, request=request)
+        article.cached_card = found[key]
+    if missing:
+        cache.set_many(missing, timeout=settings.PAGE_CACHE_TIMEOUT)
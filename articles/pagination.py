@@ -0,0 +1,195 @@
+"""
+Keyset (cursor) pagination for article feeds.
+
+Feeds are ordered newest first on ``(created_at, id)``. Instead of an
+offset, each page carries an opaque cursor holding the key of its last row,
+and the next page is fetched with a ``WHERE (created_at, id) < cursor``
+range condition. Together with the composite indexes on ``Article`` this
+means page 500 costs the same index range scan as page 1.
+"""
+import base64
+import binascii
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor string cannot be decoded."""
+
+
+@dataclass
+class FeedPage:
+    """
+    One page of a keyset-paginated feed.
+
+    Attributes:
+        items (list): The rows on this page, newest first.
+        next_cursor (str): Cursor for the following page, or None on the last page.
+    """
+    items: list
+    next_cursor: str | None
+
+
+def encode_cursor(created_at, pk):
+    raw = f'{created_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def paginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, keys=('created_at', 'id'), newest_first=True):
+    """
+    Return one page of ``queryset`` ordered newest first on ``keys``.
+
+    ``keys`` names the timestamp and tie-breaker columns; they default to the
+    article's own ``(created_at, id)`` but may point at denormalized copies on
+    another table. ``newest_first=False`` pages oldest first instead (the
+    same indexes serve both directions). One extra row is fetched to tell
+    whether a next page exists.
+    """
+    return _page(list(_keyset(queryset, cursor, page_size, keys, newest_first)), page_size, keys)
+
+
+async def apaginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, keys=('created_at', 'id'), newest_first=True):
+    """:func:`paginate` for async views, reading the page with the async ORM."""
+    rows = [row async for row in _keyset(queryset, cursor, page_size, keys, newest_first).aiterator()]
+    return _page(rows, page_size, keys)
+
+
+def _keyset(queryset, cursor, page_size, keys, newest_first):
+    """The slice of ``queryset`` holding the page after ``cursor``, plus one row."""
+    ts_field, id_field = keys
+    op, direction = ('lt', '-') if newest_first else ('gt', '')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{ts_field}__{op}': created_at}) | Q(**{ts_field: created_at, f'{id_field}__{op}': pk})
+        )
+    return queryset.order_by(f'{direction}{ts_field}', f'{direction}{id_field}')[:page_size + 1]
+
+
+def _page(rows, page_size, keys):
+    ts_field, id_field = keys
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(_resolve(last, ts_field), _resolve(last, id_field))
+    return FeedPage(rows, next_cursor)
+
+
+def _resolve(obj, field):
+    return obj[field] if isinstance(obj, dict) else getattr(obj, field)
+
+
+class ArticleCursorPagination(BasePagination):
+    """
+    DRF pagination class wrapping :func:`paginate`.
+
+    Responses look like ``{"next": <url or null>, "results": [...]}``. Clients
+    follow ``next`` until it is null; ``?page_size=`` is honoured up to
+    ``MAX_PAGE_SIZE``.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_page(
+            lambda cursor, page_size: paginate(queryset, cursor, page_size), request,
+        )
+
+    def paginate_page(self, fetch, request):
+        """
+        Paginate with a custom ``fetch(cursor, page_size)`` returning a :class:`FeedPage`.
+
+        Used by feeds that are not a single queryset, such as the merged
+        materialized subscription feed.
+        """
+        self.request = request
+        try:
+            self.page = fetch(
+                request.query_params.get(self.cursor_query_param),
+                parse_page_size(request.query_params.get(self.page_size_query_param)),
+            )
+        except InvalidCursor:
+            raise NotFound('Invalid cursor.')
+        return self.page.items
+
+    def get_next_link(self):
+        if self.page.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.page.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+async def afeed_page_context(request, queryset):
+    """
+    Paginate ``queryset`` for an HTML feed, through the async ORM, and build
+    the template context as :func:`page_context` does.
+    """
+    page_size = parse_page_size(request.GET.get('page_size'))
+    try:
+        page = await apaginate(queryset, request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        page = await apaginate(queryset, None, page_size)
+    return _context(request, page)
+
+
+def page_context(request, fetch):
+    """
+    Build HTML template context from ``fetch(cursor, page_size)``.
+
+    An unreadable cursor falls back to the first page rather than erroring,
+    since it usually comes from a hand-edited or stale link.
+    """
+    page_size = parse_page_size(request.GET.get('page_size'))
+    try:
+        page = fetch(request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        page = fetch(None, page_size)
+    return _context(request, page)
+
+
+def _context(request, page):
+    next_url = None
+    if page.next_cursor:
+        next_url = replace_query_param(request.get_full_path(), 'cursor', page.next_cursor)
+    first_url = remove_query_param(request.get_full_path(), 'cursor') if request.GET.get('cursor') else None
+    return {'articles': page.items, 'next_page_url': next_url, 'first_page_url': first_url}
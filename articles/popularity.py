@@ -0,0 +1,241 @@
+"""
+Article view counts and the trending ranking.
+
+Counting a view must not write to the database: every reader of a hot
+article would queue up on an ``UPDATE`` of the same row. Instead
+:func:`record_view` adds to an in-process buffer of ``(article, hour) ->
+views`` and :func:`flush` writes the buffer out as ``ArticleViewCount``
+rows, one per article and hour. Missing rows are created with
+``bulk_create(ignore_conflicts=True)`` and then incremented with
+``F('views') + n``, one ``UPDATE`` per distinct increment, so flushes from
+several processes add up rather than overwrite each other.
+
+Requests only add to the buffer. The WSGI and ASGI entry points call
+:func:`start_background_flush`: each server process then flushes from a
+background thread every ``VIEW_FLUSH_SECONDS``, or as soon as the buffer
+holds ``VIEW_BUFFER_SIZE`` keys, and once more when it exits. A process
+with no flusher (management commands, other entry points) flushes the
+full buffer in the request that filled it instead, so the buffer stays
+bounded either way. Views still buffered when a process is killed are
+lost, which a popularity signal can afford.
+
+:func:`refresh_trending`, run periodically by the ``refresh_trending``
+command, scores approved articles by their views over the last
+``TRENDING_WINDOW_HOURS``, each hour's views weighted by
+``0.5 ** (age / TRENDING_HALF_LIFE_HOURS)``, and stores the top
+``TRENDING_SIZE`` in ``TrendingArticle``. Trending pages only read that
+table.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.models import F
+from django.utils import timezone
+
+from news_app.db import write_transaction
+
+from . import page_cache
+from .models import Article, ArticleViewCount, TrendingArticle
+from .pagination import FeedPage
+
+logger = logging.getLogger(__name__)
+
+_buffer = Counter()
+_lock = threading.Lock()
+# Set when the buffer is full, to wake the flusher early
+_full = threading.Event()
+_background = False
+_flusher = None
+
+
+def record_view(article_id, now=None):
+    """
+    Count one view of ``article_id`` in this process's buffer.
+
+    Without a background flusher, a full buffer is flushed right away.
+    """
+    if _buffer_view(article_id, now):
+        flush()
+
+
+def _buffer_view(article_id, now=None):
+    # True if the buffer is full and it is up to the caller to flush it
+    hour = (now or timezone.now()).replace(minute=0, second=0, microsecond=0)
+    with _lock:
+        _buffer[article_id, hour] += 1
+        full = len(_buffer) >= settings.VIEW_BUFFER_SIZE
+    if not _background:
+        return full
+    if full:
+        _full.set()
+    _ensure_flusher()
+    return False
+
+
+def start_background_flush():
+    """
+    Flush this process's views from a background thread, and at exit.
+
+    The thread starts with the first view counted, so each worker a server
+    forks after loading the application gets its own.
+    """
+    global _background
+    if not _background:
+        _background = True
+        atexit.register(flush)
+
+
+def _ensure_flusher():
+    global _flusher
+    # Threads do not survive a fork, so a forked worker starts its own
+    if _flusher is None or not _flusher.is_alive():
+        with _lock:
+            if _flusher is None or not _flusher.is_alive():
+                _flusher = threading.Thread(target=_flush_forever, name='view-count-flusher', daemon=True)
+                _flusher.start()
+
+
+def _flush_forever():
+    while True:
+        try:
+            flush_when_due()
+        except Exception:
+            logger.exception('Flushing article view counts failed')
+        finally:
+            connections.close_all()
+
+
+def flush_when_due(timeout=None):
+    """
+    Wait until the buffer is full or ``timeout`` (default ``VIEW_FLUSH_SECONDS``)
+    has passed, then flush it. Returns how many views were written.
+    """
+    _full.wait(settings.VIEW_FLUSH_SECONDS if timeout is None else timeout)
+    _full.clear()
+    return flush()
+
+
+def flush():
+    """Write this process's buffered views to the database. Returns how many were written."""
+    with _lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+    if not pending:
+        return 0
+    try:
+        _write(pending)
+    except DatabaseError:
+        # Kept for the next flush
+        logger.exception('Flushing %s article view counts failed', len(pending))
+        with _lock:
+            _buffer.update(pending)
+        return 0
+    return sum(pending.values())
+
+
+# The explicit alias matters when a full buffer is flushed inside a request
+# (no background flusher): the router would otherwise count this as the
+# request's own write and pin the viewer to the primary database
+@write_transaction
+def _write(pending):
+    counts = ArticleViewCount.objects.using(DEFAULT_DB_ALIAS)
+    # Articles deleted since they were viewed
+    existing = set(
+        Article.objects.using(DEFAULT_DB_ALIAS)
+        .filter(pk__in={article_id for article_id, _ in pending}).values_list('pk', flat=True)
+    )
+    pending = {key: n for key, n in pending.items() if key[0] in existing}
+    counts.bulk_create(
+        [ArticleViewCount(article_id=article_id, hour=hour) for article_id, hour in pending],
+        ignore_conflicts=True,
+    )
+    by_increment = defaultdict(list)
+    for (article_id, hour), n in pending.items():
+        by_increment[hour, n].append(article_id)
+    for (hour, n), article_ids in by_increment.items():
+        counts.filter(hour=hour, article_id__in=article_ids).update(views=F('views') + n)
+
+
+def counts_views(article_kwarg):
+    """
+    Count a view of the article named by the ``article_kwarg`` URL argument
+    each time the page is served, including from the page cache or as a 304.
+    Goes outside the caching decorators. Only adds to the buffer, unless
+    no background flusher runs and the buffer is full (see :func:`record_view`).
+    """
+    def counted(request, response):
+        return request.method == 'GET' and response.status_code in (200, 304)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                response = await view(request, *args, **kwargs)
+                if counted(request, response) and _buffer_view(kwargs[article_kwarg]):
+                    await sync_to_async(flush)()
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if counted(request, response):
+                record_view(kwargs[article_kwarg])
+            return response
+        return wrapper
+    return decorator
+
+
+def decayed_scores(now=None):
+    """Time-decayed view score of each approved article viewed within ``TRENDING_WINDOW_HOURS``."""
+    now = now or timezone.now()
+    scores = Counter()
+    rows = ArticleViewCount.objects.filter(
+        hour__gt=now - timedelta(hours=settings.TRENDING_WINDOW_HOURS), article__status=Article.Status.APPROVED,
+    ).values_list('article_id', 'hour', 'views')
+    for article_id, hour, views in rows.iterator():
+        age = max((now - hour).total_seconds() / 3600, 0)
+        scores[article_id] += views * 0.5 ** (age / settings.TRENDING_HALF_LIFE_HOURS)
+    return scores
+
+
+def refresh_trending(now=None):
+    """Recompute the trending ranking. Returns the number of ranked articles."""
+    now = now or timezone.now()
+    top = decayed_scores(now).most_common(settings.TRENDING_SIZE)
+    _store_ranking(top, now)
+    page_cache.bump('feed', 'trending')
+    return len(top)
+
+
+@write_transaction
+def _store_ranking(top, now):
+    TrendingArticle.objects.all().delete()
+    TrendingArticle.objects.bulk_create(
+        TrendingArticle(article_id=article_id, rank=rank, score=score, refreshed_at=now)
+        for rank, (article_id, score) in enumerate(top, 1)
+    )
+
+
+def _ranked(queryset, page_size):
+    return queryset.filter(status=Article.Status.APPROVED, trending__isnull=False).order_by('trending__rank')[:page_size]
+
+
+def trending_page(queryset, page_size):
+    """
+    The top ``page_size`` articles of ``queryset`` in the current ranking,
+    as a single :class:`FeedPage`.
+    """
+    return FeedPage(list(_ranked(queryset, page_size)), None)
+
+
+async def atrending_page(queryset, page_size):
+    """:func:`trending_page` for async views."""
+    return FeedPage([article async for article in _ranked(queryset, page_size)], None)
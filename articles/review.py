@@ -0,0 +1,167 @@
+"""
+The editors' review queue.
+
+Pending articles are reviewed oldest first, optionally for one publisher.
+So that two editors do not review the same article, an editor *claims* a
+batch: :func:`claim_batch` picks the next unclaimed rows with
+``SELECT ... FOR UPDATE SKIP LOCKED`` where the database supports it, so
+concurrent claims never return the same article, and marks them
+``claimed_by``/``claimed_until``. A claim lapses after
+``REVIEW_CLAIM_SECONDS`` and the articles go back to the queue.
+
+Bulk approve and decline lock the requested rows and act on them in one
+transaction. Articles whose status does not allow the change (see
+``Article.TRANSITIONS``), or that another editor has a live claim on, are
+skipped and reported. A bulk approval queues one
+``approval.batch`` outbox message for the whole batch.
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from news_app.db import write_transaction
+
+from .models import Article
+from .services import decline_articles, publish_articles
+
+INDEPENDENT = 'independent'
+
+
+@dataclass
+class BulkResult:
+    """
+    Outcome of a bulk review action.
+
+    Attributes:
+        done (list): IDs of the articles approved or declined.
+        skipped (dict): ID -> reason, for requested articles left alone.
+    """
+    done: list = field(default_factory=list)
+    skipped: dict = field(default_factory=dict)
+
+
+def parse_ids(values):
+    """Validate a list of article IDs from a request; raises ``ValueError``."""
+    try:
+        ids = list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError):
+        raise ValueError('Article IDs must be integers.')
+    if not ids:
+        raise ValueError('No articles selected.')
+    if len(ids) > settings.REVIEW_BATCH_LIMIT:
+        raise ValueError(f'At most {settings.REVIEW_BATCH_LIMIT} articles can be reviewed at once.')
+    return ids
+
+
+def parse_publisher(value):
+    """Validate a publisher filter from a request: a publisher ID, ``'independent'``, or empty for all."""
+    if value in (None, ''):
+        return None
+    if value == INDEPENDENT:
+        return INDEPENDENT
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'publisher must be a publisher ID or "{INDEPENDENT}".')
+
+
+def queue(publisher=None, queryset=None):
+    """
+    Pending articles, for ``paginate(..., newest_first=False)``.
+
+    ``publisher`` is a publisher ID, ``'independent'`` for articles without
+    one, or None for all (see :func:`parse_publisher`).
+    """
+    queryset = (Article.objects.select_related('author', 'publisher', 'claimed_by') if queryset is None else queryset)
+    queryset = queryset.filter(status=Article.Status.PENDING)
+    if publisher == INDEPENDENT:
+        return queryset.filter(publisher__isnull=True)
+    if publisher:
+        return queryset.filter(publisher_id=publisher)
+    return queryset
+
+
+def _claimable(editor, now):
+    return Q(claimed_until__isnull=True) | Q(claimed_until__lte=now) | Q(claimed_by=editor)
+
+
+@write_transaction
+def claim_batch(editor, size=None, publisher=None):
+    """
+    Claim up to ``size`` of the oldest pending articles for ``editor``.
+
+    Articles the editor already holds count towards the batch and have
+    their claim renewed. Returns the claimed articles, oldest first.
+    """
+    size = max(1, min(size or settings.REVIEW_CLAIM_BATCH, settings.REVIEW_BATCH_LIMIT))
+    now = timezone.now()
+    until = now + timedelta(seconds=settings.REVIEW_CLAIM_SECONDS)
+    with transaction.atomic():
+        ids = list(
+            queue(publisher, Article.objects.all()).filter(_claimable(editor, now))
+            .select_for_update(skip_locked=True)
+            .order_by('created_at', 'id').values_list('id', flat=True)[:size]
+        )
+        # Re-checked in the UPDATE for databases without row locks
+        Article.objects.filter(_claimable(editor, now), pk__in=ids, status=Article.Status.PENDING).update(
+            claimed_by=editor, claimed_until=until,
+        )
+    return list(
+        Article.objects.select_related('author', 'publisher')
+        .filter(pk__in=ids, claimed_by=editor, claimed_until=until).order_by('created_at', 'id')
+    )
+
+
+def release(editor, ids=None):
+    """Give back ``editor``'s claims (on ``ids``, or all of them). Returns how many."""
+    claims = Article.objects.filter(claimed_by=editor)
+    if ids is not None:
+        claims = claims.filter(pk__in=ids)
+    return claims.update(claimed_by=None, claimed_until=None)
+
+
+def _lock_reviewable(editor, ids, status):
+    """
+    Lock the articles in ``ids``; return those ``editor`` may move to
+    ``status`` and why the rest are skipped.
+    """
+    now = timezone.now()
+    found = {a.pk: a for a in Article.objects.select_for_update().filter(pk__in=ids)}
+    result, articles = BulkResult(), []
+    for pk in ids:
+        article = found.get(pk)
+        if article is None:
+            result.skipped[pk] = 'not found'
+        elif article.status == status:
+            result.skipped[pk] = f'already {article.get_status_display().lower()}'
+        elif not article.can_transition(status):
+            result.skipped[pk] = f'cannot be reviewed while {article.get_status_display().lower()}'
+        elif article.is_claimed_by_other(editor, now):
+            result.skipped[pk] = 'claimed by another editor'
+        else:
+            articles.append(article)
+    return articles, result
+
+
+@write_transaction
+def approve(editor, ids):
+    """Approve the reviewable articles among ``ids`` in one transaction. Returns a :class:`BulkResult`."""
+    with transaction.atomic():
+        articles, result = _lock_reviewable(editor, ids, Article.Status.APPROVED)
+        publish_articles(articles, editor)
+    result.done = [article.pk for article in articles]
+    return result
+
+
+@write_transaction
+def decline(editor, ids, reason):
+    """Decline the reviewable articles among ``ids`` in one transaction. Returns a :class:`BulkResult`."""
+    with transaction.atomic():
+        articles, result = _lock_reviewable(editor, ids, Article.Status.DECLINED)
+        decline_articles(articles, editor, reason)
+    result.done = [article.pk for article in articles]
+    return result
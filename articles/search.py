@@ -0,0 +1,317 @@
+"""
+Full-text article search.
+
+Two interchangeable backends share one interface:
+
+* ``FTS5Backend`` keeps an SQLite FTS5 virtual table (``articles_article_fts``)
+  and lets SQLite do matching, BM25 ranking and snippet extraction.
+* ``InvertedIndexBackend`` stores postings in ordinary tables
+  (``SearchDocument``/``SearchPosting``) for databases without a built-in
+  full-text engine we rely on. The database sums each document's BM25 score
+  over the postings of the query terms and returns one page, best first.
+
+``settings.SEARCH_BACKEND`` picks one: ``'auto'`` (FTS5 on SQLite, the
+inverted index elsewhere) or a dotted path to a backend class. The index is
+kept in sync from Article save/delete signals. Results are paginated with a
+keyset cursor on ``(score, id)`` and filtered with the same role visibility
+as ``ArticleViewSet.get_queryset``.
+"""
+import base64
+import binascii
+import math
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Avg, Case, Count, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+
+from .models import Article, SearchDocument, SearchPosting
+from .pagination import DEFAULT_PAGE_SIZE, FeedPage, InvalidCursor
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+TITLE_WEIGHT = 10
+SNIPPET_WORDS = 24
+# Control characters cannot appear in the tokenized text, so they are safe
+# placeholders for <mark> until the text has been HTML-escaped.
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+def tokenize(text):
+    return [token.lower()[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text)]
+
+
+def query_terms(query):
+    """Unique search terms in ``query``, in order, capped at ``MAX_QUERY_TERMS``."""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+@dataclass
+class Visibility:
+    """
+    Which articles a searcher may see, mirroring ``ArticleViewSet.get_queryset``.
+
+    Attributes:
+        everything (bool): Editors see every article.
+        author_id (int): Journalists also see their own unapproved articles.
+    """
+    everything: bool = False
+    author_id: int | None = None
+
+    @classmethod
+    def for_user(cls, user):
+        if user.is_authenticated:
+            if user.is_editor():
+                return cls(everything=True)
+            if user.is_journalist():
+                return cls(author_id=user.pk)
+        return cls()
+
+
+@dataclass
+class SearchHit:
+    article_id: int
+    score: float
+    title: str
+    snippet: str
+
+
+def encode_cursor(score, pk):
+    return base64.urlsafe_b64encode(f'{score!r}|{pk}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        score, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        return float(score), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def render_marks(text):
+    """HTML-escape ``text`` and turn match placeholders into ``<mark>`` tags."""
+    return escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def mark_terms(text, terms, window=None):
+    """
+    Wrap occurrences of ``terms`` in ``text`` with match placeholders.
+
+    With ``window``, only about that many words around the first match are
+    kept, mimicking FTS5's ``snippet()``.
+    """
+    words = text.split()
+    if window and len(words) > window:
+        first = next((i for i, word in enumerate(words) if any(t in terms for t in tokenize(word))), 0)
+        start = max(0, min(first - window // 4, len(words) - window))
+        words = (['…'] if start else []) + words[start:start + window] + (['…'] if start + window < len(words) else [])
+        text = ' '.join(words)
+    return TOKEN_RE.sub(
+        lambda m: f'{MARK_START}{m.group(0)}{MARK_END}' if m.group(0).lower() in terms else m.group(0), text,
+    )
+
+
+class FTS5Backend:
+    """Search backed by an SQLite FTS5 virtual table."""
+    table = 'articles_article_fts'
+
+    def index(self, articles):
+        rows = [(a.pk, a.title, a.content, a.author_id, a.approved) for a in articles]
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, content, author_id, approved) VALUES (%s, %s, %s, %s, %s)',
+                rows,
+            )
+
+    def remove(self, article_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in article_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, content, author_id, approved) '
+                f'SELECT id, title, content, author_id, approved FROM {Article._meta.db_table}'
+            )
+
+    def search(self, query, visibility, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+        terms = query_terms(query)
+        if not terms:
+            return [], None
+        score = f'bm25({self.table}, {TITLE_WEIGHT}.0, 1.0)'
+        where, params = [f'{self.table} MATCH %s'], [' '.join(f'"{term}"' for term in terms)]
+        if not visibility.everything:
+            if visibility.author_id:
+                where.append('(approved = 1 OR author_id = %s)')
+                params.append(visibility.author_id)
+            else:
+                where.append('approved = 1')
+        if cursor:
+            last_score, last_pk = decode_cursor(cursor)
+            # bm25() is negative and smaller is better, so pages ascend
+            where.append(f'({score} > %s OR ({score} = %s AND rowid > %s))')
+            params += [last_score, last_score, last_pk]
+        sql = (
+            f"SELECT rowid, {score}, highlight({self.table}, 0, char(2), char(3)), "
+            f"snippet({self.table}, 1, char(2), char(3), '…', {SNIPPET_WORDS}) "
+            f"FROM {self.table} WHERE {' AND '.join(where)} ORDER BY {score}, rowid LIMIT %s"
+        )
+        with connection.cursor() as db:
+            db.execute(sql, params + [page_size + 1])
+            rows = db.fetchall()
+        return _page([SearchHit(*row) for row in rows], page_size)
+
+
+class InvertedIndexBackend:
+    """Portable search backed by the SearchDocument/SearchPosting tables."""
+    k1 = 1.2
+    b = 0.75
+
+    def index(self, articles):
+        articles = list(articles)
+        SearchDocument.objects.filter(article_id__in=[a.pk for a in articles]).delete()
+        documents, postings = [], []
+        for article in articles:
+            frequencies = defaultdict(int)
+            for term in tokenize(article.title):
+                frequencies[term] += TITLE_WEIGHT
+            for term in tokenize(article.content):
+                frequencies[term] += 1
+            documents.append(SearchDocument(
+                article_id=article.pk, length=sum(frequencies.values()),
+                approved=article.approved, author_id=article.author_id,
+            ))
+            postings += [
+                SearchPosting(term=term, document_id=article.pk, frequency=n) for term, n in frequencies.items()
+            ]
+        SearchDocument.objects.bulk_create(documents)
+        SearchPosting.objects.bulk_create(postings, batch_size=1000)
+
+    def remove(self, article_ids):
+        SearchDocument.objects.filter(article_id__in=article_ids).delete()
+
+    def rebuild(self, batch_size=500):
+        SearchDocument.objects.all().delete()
+        batch = []
+        for article in Article.objects.only('title', 'content', 'author_id', 'approved').iterator(chunk_size=batch_size):
+            batch.append(article)
+            if len(batch) >= batch_size:
+                self.index(batch)
+                batch = []
+        if batch:
+            self.index(batch)
+
+    def search(self, query, visibility, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+        terms = query_terms(query)
+        if not terms:
+            return [], None
+        stats = SearchDocument.objects.aggregate(n=Count('pk'), avg_length=Avg('length'))
+        doc_freq = dict(
+            SearchPosting.objects.filter(term__in=terms).values('term').annotate(n=Count('pk')).values_list('term', 'n')
+        )
+        if len(doc_freq) < len(terms):
+            return [], None
+
+        avg_length = stats['avg_length'] or 1
+        # Negated so that, like FTS5's bm25(), smaller is better
+        idf = Case(*[
+            When(term=term, then=Value(-math.log(1 + (stats['n'] - n + 0.5) / (n + 0.5))))
+            for term, n in doc_freq.items()
+        ], output_field=FloatField())
+        tf = Cast('frequency', FloatField())
+        norm = tf + self.k1 * (1 - self.b) + self.k1 * self.b * Cast('document__length', FloatField()) / avg_length
+        postings = SearchPosting.objects.filter(term__in=terms)
+        if not visibility.everything:
+            visible = Q(document__approved=True)
+            if visibility.author_id:
+                visible |= Q(document__author_id=visibility.author_id)
+            postings = postings.filter(visible)
+        documents = (
+            postings.values('document_id')
+            .annotate(matched=Count('term'), score=Sum(idf * tf * (self.k1 + 1) / norm))
+            .filter(matched=len(terms))
+        )
+        if cursor:
+            last_score, last_pk = decode_cursor(cursor)
+            documents = documents.filter(Q(score__gt=last_score) | Q(score=last_score, document_id__gt=last_pk))
+        ranked = [
+            (score, doc_id) for doc_id, score in
+            documents.order_by('score', 'document_id').values_list('document_id', 'score')[:page_size + 1]
+        ]
+
+        texts = Article.objects.in_bulk([doc_id for _, doc_id in ranked])
+        term_set = set(terms)
+        hits = [
+            SearchHit(
+                doc_id, score,
+                mark_terms(texts[doc_id].title, term_set),
+                mark_terms(texts[doc_id].content, term_set, window=SNIPPET_WORDS),
+            )
+            for score, doc_id in ranked if doc_id in texts
+        ]
+        return _page(hits, page_size)
+
+
+def _page(hits, page_size):
+    next_cursor = None
+    if len(hits) > page_size:
+        hits = hits[:page_size]
+        next_cursor = encode_cursor(hits[-1].score, hits[-1].article_id)
+    return hits, next_cursor
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path, vendor):
+    if path == 'auto':
+        return FTS5Backend() if vendor == 'sqlite' else InvertedIndexBackend()
+    return import_string(path)()
+
+
+def get_backend():
+    return _load_backend(settings.SEARCH_BACKEND, connection.vendor)
+
+
+def index_articles(articles):
+    get_backend().index(articles)
+
+
+def remove_articles(article_ids):
+    get_backend().remove(article_ids)
+
+
+def rebuild_index():
+    get_backend().rebuild()
+
+
+def search_articles(query, user, cursor=None, page_size=DEFAULT_PAGE_SIZE, queryset=None):
+    """
+    Search articles visible to ``user``, loading them from ``queryset``.
+
+    Returns a :class:`FeedPage` of articles ranked best first, each carrying
+    ``search_score`` plus HTML-safe ``search_title`` and ``search_snippet``
+    with matches wrapped in ``<mark>``.
+    """
+    hits, next_cursor = get_backend().search(query, Visibility.for_user(user), cursor, page_size)
+    if queryset is None:
+        queryset = Article.objects.with_related()
+    articles = queryset.in_bulk([hit.article_id for hit in hits])
+    results = []
+    for hit in hits:
+        article = articles.get(hit.article_id)
+        if article is None:
+            continue
+        article.search_score = hit.score
+        article.search_title = render_marks(hit.title)
+        article.search_snippet = render_marks(hit.snippet)
+        results.append(article)
+    return FeedPage(results, next_cursor)
@@ -0,0 +1,216 @@
+"""
+Synthetic data at scale, for benchmarks and capacity testing.
+
+Popularity follows a power law, as it does on real news sites: a source's
+weight is ``1 / rank ** alpha``, so a few journalists write most articles
+and a few publishers and journalists have most of the followers, while the
+long tail has almost none. How many sources each reader follows is drawn
+from a Pareto distribution around the requested mean.
+
+Everything is written with ``bulk_create``, and the materialized feeds,
+search index and counters are built in bulk afterwards, as
+``import_articles`` does.
+"""
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from publications.models import Publisher
+from . import counters, page_cache, search
+from .importer import preserve_timestamps
+from .models import Article, FeedEntry
+
+BATCH_SIZE = 5000
+# Share of follows that go to a publisher rather than a journalist
+PUBLISHER_FOLLOW_SHARE = 0.3
+INDEPENDENT_SHARE = 0.2
+PARETO_SHAPE = 1.5
+WORDS = (
+    'council budget election storm match festival review market school transit '
+    'hospital river museum court housing energy harbour science startup police'
+).split()
+
+
+@dataclass
+class SeedReport:
+    publishers: int = 0
+    journalists: int = 0
+    readers: int = 0
+    articles: int = 0
+    follows: int = 0
+    feed_entries: int = 0
+    elapsed: float = 0.0
+
+
+class PowerLaw:
+    """Sample items with weight ``1 / rank ** alpha`` (the first item is the most popular)."""
+
+    def __init__(self, items, alpha, rng):
+        self.items = list(items)
+        self.cum_weights = list(accumulate(1 / rank ** alpha for rank in range(1, len(self.items) + 1)))
+        self.rng = rng
+
+    def one(self):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+    def distinct(self, k):
+        """Up to ``k`` distinct items, popular ones more likely."""
+        k = min(k, len(self.items))
+        chosen = set()
+        for _ in range(10):
+            chosen.update(self.rng.choices(self.items, cum_weights=self.cum_weights, k=k - len(chosen)))
+            if len(chosen) >= k:
+                break
+        return chosen
+
+
+def _bulk_create(model, objs, **refetch):
+    """``bulk_create`` that also works on backends which do not return primary keys."""
+    created = model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    if created and created[0].pk is None:
+        created = list(model.objects.filter(**refetch).order_by('pk'))
+    return created
+
+
+def _sentence(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+
+def seed_scale(publishers=20, journalists=100, readers=1000, articles=5000, follows_per_reader=8,
+               alpha=1.1, approved_share=0.9, days=365, prefix='scale', seed=0, progress=None):
+    """Create the requested population and return a :class:`SeedReport`."""
+    rng = random.Random(seed)
+    report = SeedReport()
+    started = time.perf_counter()
+    say = progress or (lambda message: None)
+    User = get_user_model()
+    password = make_password(None)
+
+    say(f'Creating {publishers} publishers, {journalists} journalists and {readers} readers...')
+    pubs = _bulk_create(
+        Publisher, [Publisher(title=f'{prefix} publisher {i}', description=_sentence(rng, 8)) for i in range(publishers)],
+        title__startswith=f'{prefix} publisher ',
+    )
+
+    def users(role, n):
+        label = role.lower()
+        return _bulk_create(User, [
+            User(username=f'{prefix}-{label}-{i}', email=f'{prefix}-{label}-{i}@example.com', role=role, password=password)
+            for i in range(n)
+        ], username__startswith=f'{prefix}-{label}-')
+
+    writers = users(User.Roles.JOURNALIST, journalists)
+    editors = users(User.Roles.EDITOR, max(1, publishers))
+    audience = users(User.Roles.READER, readers)
+    report.publishers, report.journalists, report.readers = len(pubs), len(writers), len(audience)
+
+    # Staff: one editor per publisher; journalists join a publisher by popularity
+    publisher_law = PowerLaw(pubs, alpha, rng) if pubs else None
+    home = {
+        journalist.pk: (publisher_law.one().pk if publisher_law and rng.random() > INDEPENDENT_SHARE else None)
+        for journalist in writers
+    }
+    Publisher.editors.through.objects.bulk_create(
+        [Publisher.editors.through(publisher_id=p.pk, user_id=e.pk) for p, e in zip(pubs, editors)],
+        batch_size=BATCH_SIZE,
+    )
+    Publisher.journalists.through.objects.bulk_create(
+        [Publisher.journalists.through(publisher_id=p, user_id=j) for j, p in home.items() if p],
+        batch_size=BATCH_SIZE,
+    )
+
+    say(f'Creating {articles} articles...')
+    writer_law = PowerLaw(writers, alpha, rng)
+    now = timezone.now()
+    drafts = []
+    for i in range(articles):
+        author = writer_law.one()
+        created_at = now - timedelta(seconds=rng.randrange(days * 86400))
+        drafts.append(Article(
+            title=f'{_sentence(rng, 6)} ({prefix} {i})', content=_sentence(rng, 120),
+            author_id=author.pk, publisher_id=home[author.pk],
+            approved=rng.random() < approved_share, created_at=created_at, updated_at=created_at,
+        ))
+    # auto_now_add would stamp every article with the same time
+    with preserve_timestamps():
+        Article.objects.bulk_create(drafts, batch_size=BATCH_SIZE)
+    report.articles = len(drafts)
+
+    say('Creating subscriptions...')
+    by_reader = {}
+    for reader in audience:
+        n = max(1, round(rng.paretovariate(PARETO_SHAPE) * follows_per_reader / 3))
+        n_publishers = sum(rng.random() < PUBLISHER_FOLLOW_SHARE for _ in range(n)) if pubs else 0
+        by_reader[reader.pk] = (
+            [p.pk for p in publisher_law.distinct(n_publishers)] if n_publishers else [],
+            [j.pk for j in writer_law.distinct(n - n_publishers)],
+        )
+    PublisherFollow = User.subscriptions_to_publishers.through
+    JournalistFollow = User.subscriptions_to_journalists.through
+    PublisherFollow.objects.bulk_create(
+        (PublisherFollow(user_id=r, publisher_id=p) for r, (ps, _) in by_reader.items() for p in ps),
+        batch_size=BATCH_SIZE,
+    )
+    JournalistFollow.objects.bulk_create(
+        (JournalistFollow(from_user_id=r, to_user_id=j) for r, (_, js) in by_reader.items() for j in js),
+        batch_size=BATCH_SIZE,
+    )
+    report.follows = sum(len(ps) + len(js) for ps, js in by_reader.values())
+
+    say('Building feeds and search index...')
+    report.feed_entries = _build_feeds(by_reader, settings.FEED_FANOUT_LIMIT, settings.FEED_BACKFILL_LIMIT)
+    search.rebuild_index()
+    counters.reconcile()
+    page_cache.bump('collection', 'articles')
+    for name in ('home', 'publishers', 'independent'):
+        page_cache.bump('feed', name)
+
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def _build_feeds(by_reader, fanout_limit, backfill_limit):
+    """Write FeedEntry rows the way fan-out and backfill would have, without a query per reader."""
+    recent = defaultdict(list)
+    for pk, author_id, publisher_id, created_at in (
+        Article.objects.filter(status=Article.Status.APPROVED).order_by('-created_at', '-id')
+        .values_list('pk', 'author_id', 'publisher_id', 'created_at').iterator()
+    ):
+        for source in (('journalist', author_id), ('publisher', publisher_id)):
+            if source[1] and len(recent[source]) < backfill_limit:
+                recent[source].append((pk, created_at))
+
+    followers = defaultdict(int)
+    for publisher_ids, _ in by_reader.values():
+        for pk in publisher_ids:
+            followers[pk] += 1
+
+    def rows():
+        for reader_id, (publisher_ids, journalist_ids) in by_reader.items():
+            sources = [('journalist', pk) for pk in journalist_ids]
+            # Hot publishers are merged in at read time, not materialized
+            sources += [('publisher', pk) for pk in publisher_ids if followers[pk] <= fanout_limit]
+            seen = set()
+            for source in sources:
+                for article_id, created_at in recent[source]:
+                    if article_id not in seen:
+                        seen.add(article_id)
+                        yield FeedEntry(reader_id=reader_id, article_id=article_id, created_at=created_at)
+
+    count, batch = 0, []
+    for entry in rows():
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+            batch = []
+    FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+    return count + len(batch)
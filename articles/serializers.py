@@ -2,23 +2,65 @@ from rest_framework import serializers
 from .models import Article, Newsletter
 from users.serializers import UserSerializer
 from publications.serializers import PublisherSerializer
+from news_app.fieldsets import SparseFieldsetMixin
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for the Article model.
-    Includes nested serialization for author and publisher details.
+    Includes nested serialization for author and publisher details; list
+    summaries leave out ``content`` and give the author as an ID unless
+    expanded (see ``news_app.fieldsets``).
     """
     author = UserSerializer(read_only=True)
     publisher_detail = PublisherSerializer(source='publisher', read_only=True)
+    image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Article
-        fields = ['id', 'title', 'content', 'image', 'created_at', 'updated_at', 'approved', 'author', 'publisher', 'publisher_detail', 'approved_by']
-        read_only_fields = ['author', 'approved_by', 'approved', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'content', 'image', 'image_variants', 'created_at', 'updated_at', 'status', 'approved', 'author', 'publisher', 'publisher_detail', 'approved_by']
+        read_only_fields = ['author', 'approved_by', 'status', 'approved', 'created_at', 'updated_at']
+        summary_fields = ['id', 'title', 'image_variants', 'created_at', 'updated_at', 'status', 'approved', 'author', 'publisher']
+        expandable = {'author': UserSerializer, 'publisher_detail': PublisherSerializer}
+        field_sources = {'image_variants': ['image', 'image_variants']}
 
-class NewsletterSerializer(serializers.ModelSerializer):
+    def get_image_variants(self, obj):
+        """Card and detail renditions, as ``{name: {url, width, height}}``; the original until they are made."""
+        if not obj.image:
+            return None
+        request = self.context.get('request')
+        variants = {}
+        for name in ('card', 'detail'):
+            variant = obj.image_variant(name)
+            url = request.build_absolute_uri(variant['url']) if request else variant['url']
+            variants[name] = {**variant, 'url': url}
+        return variants
+
+class ArticleSearchResultSerializer(ArticleSerializer):
+    """
+    Serializer for search hits: an article plus its rank and highlighted text.
+    ``highlighted_title`` and ``snippet`` are HTML-escaped with matches in ``<mark>``.
+    """
+    score = serializers.FloatField(source='search_score', read_only=True)
+    highlighted_title = serializers.CharField(source='search_title', read_only=True)
+    snippet = serializers.CharField(source='search_snippet', read_only=True)
+
+    class Meta(ArticleSerializer.Meta):
+        fields = ArticleSerializer.Meta.fields + ['score', 'highlighted_title', 'snippet']
+        summary_fields = ArticleSerializer.Meta.summary_fields + ['score', 'highlighted_title', 'snippet']
+
+class ReviewQueueSerializer(ArticleSerializer):
+    """
+    Serializer for the editors' review queue: an article plus who has claimed it.
+    """
+    class Meta(ArticleSerializer.Meta):
+        fields = ArticleSerializer.Meta.fields + ['claimed_by', 'claimed_until', 'declined_reason']
+        read_only_fields = ArticleSerializer.Meta.read_only_fields + ['claimed_by', 'claimed_until', 'declined_reason']
+        summary_fields = ArticleSerializer.Meta.summary_fields + ['claimed_by', 'claimed_until']
+
+class NewsletterSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for the Newsletter model.
+    List summaries give the author and articles as IDs unless expanded.
     """
     author = UserSerializer(read_only=True)
     articles = ArticleSerializer(many=True, read_only=True)
@@ -27,3 +69,5 @@ class NewsletterSerializer(serializers.ModelSerializer):
         model = Newsletter
         fields = ['id', 'title', 'description', 'created_at', 'author', 'articles']
         read_only_fields = ['author', 'created_at']
+        summary_fields = fields
+        expandable = {'author': UserSerializer, 'articles': ArticleSerializer}
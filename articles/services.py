@@ -1,38 +1,163 @@
-from django.core.mail import send_mail
+import logging
 from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 
-def send_approval_notifications(article):
+from news_app.db import write_transaction
+from . import feed, outbox
+from .mailing import send_individually
+from .models import Article, ClaimedByOther
+
+logger = logging.getLogger(__name__)
+
+def _lock(article, editor):
+    # Re-read the row under a lock, so the claim and status checks see what
+    # another editor may have just committed, and a retried attempt starts
+    # from the stored state rather than the failed attempt's changes
+    article.refresh_from_db(from_queryset=Article.objects.select_for_update())
+    if article.is_claimed_by_other(editor):
+        raise ClaimedByOther(f'Article "{article.title}" is being reviewed by another editor.')
+
+def _approve(article, editor):
+    article.transition(Article.Status.APPROVED)
+    article.approved_by = editor
+    article.claimed_by = article.claimed_until = None
+    article.save()
+    feed.fan_out_article(article)
+
+def _decline(article, editor, reason):
+    article.transition(Article.Status.DECLINED)
+    article.approved_by = None
+    article.declined_reason = reason
+    article.declined_by = editor
+    article.declined_at = timezone.now()
+    article.claimed_by = article.claimed_until = None
+    article.save()
+    feed.withdraw_article(article)
+
+@write_transaction
+def publish_article(article, editor):
     """
-    Sends email notifications to subscribers and posts to Twitter.
+    Approve an article and copy it into subscribers' feeds.
+
+    The row is locked and re-read first; raises ``ClaimedByOther`` or
+    ``InvalidTransition`` if it cannot be approved by ``editor``.
+
+    Shared by the API ``approve`` action and the editor dashboard so both
+    paths have the same side effects. Subscriber emails and the Twitter post
+    are queued in the outbox in the same transaction rather than sent here.
     """
-    # 1. Email Subscribers
-    subscribers = set()
-    
-    # Publisher subscribers
-    if article.publisher:
-        pub_subs = article.publisher.subscribers.all()
-        for user in pub_subs:
-            if user.email:
-                subscribers.add(user.email)
-            
-    # Journalist subscribers
-    author_subs = article.author.journalist_subscribers.all()
-    for user in author_subs:
-        if user.email:
-            subscribers.add(user.email)
-        
-    if subscribers:
-        print(f"Sending emails to: {subscribers}") # Debug
-        send_mail(
-            subject=f"New Article: {article.title}",
-            message=f"Read the new article by {article.author.username}.\n\n{article.content[:200]}...",
-            from_email='news@example.com',
-            recipient_list=list(subscribers),
-            fail_silently=True
-        )
-
-    # 2. Post to Twitter
-    post_to_twitter(article)
+    with transaction.atomic():
+        _lock(article, editor)
+        _approve(article, editor)
+        outbox.enqueue('approval.email', article_id=article.pk)
+        outbox.enqueue('approval.social', article_id=article.pk)
+
+def publish_articles(articles, editor):
+    """
+    Approve several articles in one transaction.
+
+    The notifications for all of them are queued as a single
+    ``approval.batch`` outbox message rather than two per article.
+    """
+    with transaction.atomic():
+        for article in articles:
+            _approve(article, editor)
+        if articles:
+            outbox.enqueue('approval.batch', article_ids=[article.pk for article in articles])
+
+@write_transaction
+def record_decline(article, editor, reason):
+    """
+    Decline an article and withdraw it from any feed it had reached.
+
+    Raises like :func:`publish_article`.
+    """
+    with transaction.atomic():
+        _lock(article, editor)
+        _decline(article, editor, reason)
+
+def decline_articles(articles, editor, reason):
+    """Decline several articles in one transaction."""
+    with transaction.atomic():
+        for article in articles:
+            _decline(article, editor, reason)
+
+def subscriber_emails(article):
+    """
+    DISTINCT email addresses of everyone following the article's publisher or author.
+
+    The follower sets are matched with ``pk IN (subquery)`` rather than joins,
+    so a reader following many sources does not multiply rows before DISTINCT.
+    """
+    User = get_user_model()
+    followers = Q(pk__in=User.subscriptions_to_journalists.through.objects.filter(
+        to_user_id=article.author_id).values('from_user_id'))
+    if article.publisher_id:
+        followers |= Q(pk__in=User.subscriptions_to_publishers.through.objects.filter(
+            publisher_id=article.publisher_id).values('user_id'))
+    return User.objects.filter(followers).exclude(email='').order_by().values_list('email', flat=True).distinct()
+
+def email_subscribers(article):
+    """
+    Emails everyone subscribed to the article's publisher or author.
+
+    Each subscriber gets their own message; addresses are streamed in chunks
+    over one backend connection. Raises if nothing could be sent so the
+    outbox retries; partial failures are logged and reported instead, since a
+    retry would re-send to the recipients that did get the message.
+    """
+    report = send_individually(
+        subscriber_emails(article).iterator(chunk_size=settings.EMAIL_CHUNK_SIZE),
+        subject=f"New Article: {article.title}",
+        body=f"Read the new article by {article.author.username}.\n\n{article.content[:200]}...",
+    )
+    logger.info(
+        'Article %s: emailed %s subscribers in %s chunks (%.0f msg/s), %s failed',
+        article.pk, report.sent, report.chunks, report.rate, report.failed,
+    )
+    if report.failed and not report.sent:
+        raise RuntimeError(f'Could not email subscribers of article {article.pk}: {report.errors[-1]}')
+    return report
+
+def _approved_article(payload):
+    # The article may have been declined or deleted since the message was queued.
+    return Article.objects.select_related('author', 'publisher').filter(
+        pk=payload['article_id'], status=Article.Status.APPROVED,
+    ).first()
+
+def deliver_approval_email(payload):
+    """Outbox handler for ``approval.email``."""
+    article = _approved_article(payload)
+    if article:
+        email_subscribers(article)
+
+def deliver_approval_post(payload):
+    """Outbox handler for ``approval.social``."""
+    article = _approved_article(payload)
+    if article:
+        post_to_twitter(article)
+
+def deliver_approval_batch(payload):
+    """
+    Outbox handler for ``approval.batch``: announce every article of a bulk approval.
+
+    An article whose email or post fails is queued again on its own
+    (``approval.email`` / ``approval.social``), so a retry never repeats the
+    announcements that did go out.
+    """
+    articles = Article.objects.select_related('author', 'publisher').filter(
+        pk__in=payload['article_ids'], status=Article.Status.APPROVED,
+    ).order_by('pk')
+    for article in articles:
+        for topic, announce in (('approval.email', email_subscribers), ('approval.social', post_to_twitter)):
+            try:
+                announce(article)
+            except Exception:
+                logger.exception('Batch announcement of article %s failed; retrying it alone', article.pk)
+                outbox.enqueue(topic, article_id=article.pk)
 
 def post_to_twitter(article):
     """
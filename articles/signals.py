@@ -0,0 +1,119 @@
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+
+from users.subscriptions import JOURNALISTS, PUBLISHERS
+
+from . import counters, feed, outbox, page_cache, search
+from publications.models import Publisher
+
+from .models import Article, Newsletter
+
+User = get_user_model()
+_UNKNOWN = object()
+
+
+def _sync_feed(instance, action, reverse, pk_set, source):
+    """
+    Keep materialized feeds in step with a subscription M2M change.
+
+    ``source`` is ``'publisher_ids'`` or ``'journalist_ids'``. For a forward
+    change ``instance`` is the reader and ``pk_set`` the sources; for a reverse
+    change (e.g. ``publisher.subscribers.add(user)``) it is the other way round.
+    """
+    if action == 'pre_clear':
+        # pk_set is not provided for clears, so remember who is affected now.
+        accessor = {
+            ('publisher_ids', False): 'subscriptions_to_publishers',
+            ('publisher_ids', True): 'subscribers',
+            ('journalist_ids', False): 'subscriptions_to_journalists',
+            ('journalist_ids', True): 'journalist_subscribers',
+        }[source, reverse]
+        instance._cleared_subscription_pks = set(getattr(instance, accessor).values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        action, pk_set = 'post_remove', getattr(instance, '_cleared_subscription_pks', set())
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    update = feed.backfill if action == 'post_add' else feed.remove_sources
+    reader_ids = pk_set if reverse else [instance.pk]
+    for reader_id in reader_ids:
+        update(reader_id, **{source: [instance.pk] if reverse else list(pk_set)})
+        page_cache.bump('reader', reader_id)
+
+
+@receiver(m2m_changed, sender=User.subscriptions_to_publishers.through)
+def publisher_subscriptions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _sync_feed(instance, action, reverse, pk_set, 'publisher_ids')
+    cooled = counters.subscriptions_changed(PUBLISHERS, instance, action, reverse, pk_set)
+    feed.backfill_followers(PUBLISHERS, cooled)
+
+
+@receiver(m2m_changed, sender=User.subscriptions_to_journalists.through)
+def journalist_subscriptions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _sync_feed(instance, action, reverse, pk_set, 'journalist_ids')
+    cooled = counters.subscriptions_changed(JOURNALISTS, instance, action, reverse, pk_set)
+    feed.backfill_followers(JOURNALISTS, cooled)
+
+
+@receiver(pre_delete, sender=User)
+def follower_deleted(sender, instance, **kwargs):
+    for kind, cooled in counters.follower_deleted(instance).items():
+        # The user's own feed is about to be deleted with them
+        feed.backfill_followers(kind, cooled, exclude_reader=instance.pk)
+
+
+@receiver(post_save, sender=Article)
+def article_saved(sender, instance, created, raw=False, **kwargs):
+    """Keep the search index, page cache and counters in step with edits, approvals and declines."""
+    if raw:
+        return
+    counters.article_saved(instance, created)
+    search.index_articles([instance])
+    page_cache.invalidate_article(
+        instance,
+        was_approved=instance.loaded_value('approved', False),
+        old_publisher_id=instance.loaded_value('publisher_id'),
+    )
+    if instance.image and instance.image.name != instance.loaded_value('image'):
+        # Resizing is slow, so the worker makes the variants
+        outbox.enqueue('image.derivatives', article_id=instance.pk)
+    instance.mark_loaded('status', 'approved', 'author_id', 'publisher_id', 'image')
+
+
+@receiver(post_delete, sender=Article)
+def article_deleted(sender, instance, **kwargs):
+    counters.article_deleted(instance)
+    search.remove_articles([instance.pk])
+    page_cache.invalidate_article(instance, was_approved=instance.loaded_value('approved', False))
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Cards show the author's username; logins and other edits leave them alone."""
+    if raw or created or (update_fields is not None and 'username' not in update_fields):
+        return
+    if instance.loaded_value('username', _UNKNOWN) != instance.username:
+        page_cache.invalidate_source('author', instance.pk)
+    instance.mark_loaded('username')
+
+
+@receiver(post_save, sender=Publisher)
+@receiver(post_delete, sender=Publisher)
+def publisher_changed(sender, instance, created=False, raw=False, **kwargs):
+    # Deleting a publisher moves its articles to Independent without saving them
+    if not (raw or created):
+        page_cache.invalidate_source('publisher', instance.pk)
+
+
+@receiver(post_save, sender=Newsletter)
+@receiver(post_delete, sender=Newsletter)
+def newsletter_changed(sender, **kwargs):
+    page_cache.bump('collection', 'newsletters')
+
+
+@receiver(m2m_changed, sender=Newsletter.articles.through)
+def newsletter_articles_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        page_cache.bump('collection', 'newsletters')
@@ -1,15 +1,55 @@
-from django.test import TestCase
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Article, Newsletter
+from rest_framework.throttling import UserRateThrottle
+from .models import (
+    Article, ArticleViewCount, ClaimedByOther, InvalidTransition, Newsletter, NewsletterDispatch, FeedEntry, ImportCheckpoint,
+    OutboxMessage, TrendingArticle,
+)
+from . import counters, newsletters, outbox, popularity, review, search
+from .services import email_subscribers, publish_article, record_decline
+from .views import SubscribedFeedPolicy
+from .pagination import apaginate, paginate
+from . import page_cache
 from publications.models import Publisher
+from users import subscriptions
+from news_app import db, metrics
+from news_app.testing import QueryBudgetMixin
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
+from django.db.models.signals import post_save
+from django.test import override_settings, tag
+from django.core import mail
+from django.core.cache import cache
+from django.db import OperationalError, connection, router, transaction
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from types import SimpleNamespace
+from asgiref.sync import async_to_sync, sync_to_async
+from unittest import skipUnless
 from unittest.mock import patch
+from importlib import import_module
+from django.apps import apps as django_apps
+from itertools import count
+from io import BytesIO, StringIO
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from datetime import timedelta
+from django.utils import timezone
+import base64
+import json
+import os
+import tempfile
 
 User = get_user_model()
 
 class ArticleAPITests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         
         # Create Users
@@ -38,7 +78,7 @@ class ArticleAPITests(TestCase):
         self.client.force_authenticate(user=self.reader)
         response = self.client.get('/api/articles/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)  # Should see approved articles
+        self.assertEqual(len(response.data['results']), 2)  # Should see approved articles
         
     def test_get_subscribed_articles(self):
         """Test retrieving only subscribed articles."""
@@ -48,13 +88,13 @@ class ArticleAPITests(TestCase):
         self.client.force_authenticate(user=self.reader)
         response = self.client.get('/api/articles/subscribed/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['id'], self.article1.id)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.article1.id)
         
         # Reader subscribes to Other Journalist (Article 2)
         self.reader.subscriptions_to_journalists.add(self.other_journalist)
         response = self.client.get('/api/articles/subscribed/')
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_journalist_create_article(self):
         """Test journalist creating an article."""
@@ -76,14 +116,17 @@ class ArticleAPITests(TestCase):
         """Test editor approving an article."""
         self.client.force_authenticate(user=self.editor)
         
-        # Patch where it is USED, not where it is defined
-        with patch('articles.views.send_approval_notifications') as mock_notify:
+        # Notifications are queued in the outbox, not sent during the request
+        with patch('articles.services.email_subscribers') as mock_email:
             response = self.client.post(f'/api/articles/{self.unapproved_article.id}/approve/')
             self.assertEqual(response.status_code, status.HTTP_200_OK)
             self.unapproved_article.refresh_from_db()
             self.assertTrue(self.unapproved_article.approved)
             self.assertEqual(self.unapproved_article.approved_by, self.editor)
-            mock_notify.assert_called_once()
+            mock_email.assert_not_called()
+        self.assertEqual(
+            set(OutboxMessage.objects.values_list('topic', flat=True)), {'approval.email', 'approval.social'}
+        )
 
     def test_journalist_cannot_approve(self):
         """Test journalist cannot approve articles."""
@@ -108,8 +151,885 @@ class ArticleAPITests(TestCase):
         response = self.client.delete(f'/api/articles/{new_article.id}/')
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+class SubscriptionFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.reader = User.objects.create(username='reader', role='READER')
+        self.editor = User.objects.create(username='editor', role='EDITOR')
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.publisher = Publisher.objects.create(title='Tech News')
+        self.client.force_authenticate(user=self.reader)
+
+    def feed_ids(self):
+        response = self.client.get('/api/articles/subscribed/')
+        return [item['id'] for item in response.data['results']]
+
+    def test_approval_fans_out_to_followers(self):
+        self.reader.subscriptions_to_journalists.add(self.journalist)
+        article = Article.objects.create(title='T', content='C', author=self.journalist)
+        self.client.force_authenticate(user=self.editor)
+        self.client.post(f'/api/articles/{article.id}/approve/')
+        self.assertTrue(FeedEntry.objects.filter(reader=self.reader, article=article).exists())
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        by_author = Article.objects.create(title='A', content='C', author=self.journalist, approved=True)
+        by_both = Article.objects.create(
+            title='B', content='C', author=self.journalist, publisher=self.publisher, approved=True,
+        )
+        self.reader.subscriptions_to_journalists.add(self.journalist)
+        self.reader.subscriptions_to_publishers.add(self.publisher)
+        self.assertEqual(self.feed_ids(), [by_both.id, by_author.id])
+
+        # Still reachable through the publisher, so only the author-only article goes
+        self.reader.subscriptions_to_journalists.remove(self.journalist)
+        self.assertEqual(self.feed_ids(), [by_both.id])
+
+    def test_decline_withdraws_from_feed(self):
+        article = Article.objects.create(title='A', content='C', author=self.journalist, approved=True)
+        self.reader.subscriptions_to_journalists.add(self.journalist)
+        self.client.force_login(self.editor)
+        self.client.post(f'/articles/approval/{article.id}/decline/', {'reason': 'Sources'})
+        self.assertFalse(FeedEntry.objects.filter(article=article).exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_hot_publisher_is_merged_at_read_time(self):
+        self.reader.subscriptions_to_publishers.add(self.publisher)
+        article = Article.objects.create(
+            title='A', content='C', author=self.journalist, publisher=self.publisher, approved=True,
+        )
+        from .feed import fan_out_article
+        fan_out_article(article)
+        self.assertFalse(FeedEntry.objects.exists())
+        # The follower set of a hot publisher is not loaded into the cache
+        self.assertIsNone(cache.get(subscriptions._key(subscriptions.FOLLOWERS, subscriptions.PUBLISHERS, self.publisher.pk)))
+        self.assertEqual(self.feed_ids(), [article.id])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_hot_journalist_is_merged_at_read_time(self):
+        other = User.objects.create(username='other', role='READER')
+        self.reader.subscriptions_to_journalists.add(self.journalist)
+        other.subscriptions_to_journalists.add(self.journalist)
+        article = Article.objects.create(title='A', content='C', author=self.journalist)
+        publish_article(article, self.editor)
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(self.feed_ids(), [article.id])
+        # Following a hot journalist copies nothing either
+        late = User.objects.create(username='late', role='READER')
+        late.subscriptions_to_journalists.add(self.journalist)
+        self.assertFalse(FeedEntry.objects.filter(reader=late).exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=2)
+    def test_sources_that_cool_down_are_backfilled(self):
+        other, leaving = (User.objects.create(username=name, role='READER') for name in ('other', 'leaving'))
+        for reader in (self.reader, other, leaving):
+            reader.subscriptions_to_journalists.add(self.journalist)
+            reader.subscriptions_to_publishers.add(self.publisher)
+        article = Article.objects.create(
+            title='A', content='C', author=self.journalist, publisher=self.publisher, approved=True,
+        )
+        self.assertFalse(FeedEntry.objects.exists())
+
+        def feeds():
+            return sorted(FeedEntry.objects.values_list('reader_id', 'article_id'))
+
+        # Down to two followers: the others' feeds get the articles they were merging in
+        leaving.delete()
+        self.assertEqual(feeds(), [(self.reader.pk, article.pk), (other.pk, article.pk)])
+        connection.check_constraints()
+
+        late = User.objects.create(username='late', role='READER')
+        self.publisher.subscribers.add(late)
+        only_publisher = Article.objects.create(title='B', content='C', author=self.editor, publisher=self.publisher)
+        publish_article(only_publisher, self.editor)
+        self.assertFalse(FeedEntry.objects.filter(article=only_publisher).exists())
+        self.publisher.subscribers.remove(late)
+        self.assertEqual(feeds(), sorted([
+            (self.reader.pk, article.pk), (other.pk, article.pk),
+            (self.reader.pk, only_publisher.pk), (other.pk, only_publisher.pk),
+        ]))
+        self.assertEqual(self.feed_ids(), [only_publisher.id, article.id])
+
+    def test_rebuild_command(self):
+        article = Article.objects.create(title='A', content='C', author=self.journalist, approved=True)
+        self.reader.subscriptions_to_journalists.add(self.journalist)
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(self.feed_ids(), [article.id])
+
+@override_settings(OUTBOX_MAX_ATTEMPTS=3, OUTBOX_BACKOFF_BASE=10)
+class OutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.reader = User.objects.create(username='reader', role='READER', email='reader@example.com')
+        self.reader.subscriptions_to_journalists.add(self.journalist)
+        self.article = Article.objects.create(title='A', content='C', author=self.journalist, approved=True)
+
+    def test_worker_delivers_queued_email(self):
+        outbox.enqueue('approval.email', article_id=self.article.pk)
+        self.assertEqual(outbox.process_batch(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.Status.DONE)
+
+    def test_failures_back_off_then_dead_letter(self):
+        message = outbox.enqueue('approval.email', article_id=self.article.pk)
+        with patch('articles.services.email_subscribers', side_effect=OSError('SMTP down')), \
+                self.assertLogs('articles.outbox', 'ERROR'):
+            self.assertEqual(outbox.process_batch(), (0, 1))
+            message.refresh_from_db()
+            self.assertEqual(message.status, OutboxMessage.Status.PENDING)
+            self.assertIn('SMTP down', message.last_error)
+            # Not due again until the backoff has passed
+            self.assertEqual(outbox.process_batch(), (0, 0))
+            for _ in range(2):
+                OutboxMessage.objects.update(available_at=message.created_at)
+                outbox.process_batch()
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.Status.DEAD)
+        self.assertEqual(message.attempts, 3)
+
+    def test_declined_article_is_not_announced(self):
+        outbox.enqueue('approval.email', article_id=self.article.pk)
+        Article.objects.filter(pk=self.article.pk).update(approved=False, status=Article.Status.DECLINED)
+        call_command('process_outbox', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+
+@override_settings(EMAIL_CHUNK_SIZE=100)
+class SubscriberEmailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.publisher = Publisher.objects.create(title='Tech News')
+        self.article = Article.objects.create(
+            title='A', content='C', author=self.journalist, publisher=self.publisher, approved=True,
+        )
+        readers = User.objects.bulk_create(
+            User(username=f'r{i}', email=f'r{i}@example.com', role='READER') for i in range(250)
+        )
+        PublisherFollow = User.subscriptions_to_publishers.through
+        JournalistFollow = User.subscriptions_to_journalists.through
+        PublisherFollow.objects.bulk_create(PublisherFollow(user=r, publisher=self.publisher) for r in readers[:200])
+        # Overlaps the publisher's followers; each address must still get one message
+        JournalistFollow.objects.bulk_create(JournalistFollow(from_user=r, to_user=self.journalist) for r in readers[100:])
+
+    def test_one_message_per_subscriber_in_chunks(self):
+        report = email_subscribers(self.article)
+        self.assertEqual((report.sent, report.failed, report.chunks), (250, 0, 3))
+        self.assertEqual(len(mail.outbox), 250)
+        self.assertTrue(all(len(message.to) == 1 for message in mail.outbox))
+        self.assertEqual(len({message.to[0] for message in mail.outbox}), 250)
+
+    def test_reuses_one_connection(self):
+        with patch('articles.mailing.get_connection', wraps=mail.get_connection) as mock_connect:
+            email_subscribers(self.article)
+        mock_connect.assert_called_once()
+
+    def test_total_failure_raises_for_retry(self):
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            with self.assertRaises(RuntimeError), self.assertLogs('articles.mailing', 'WARNING'):
+                email_subscribers(self.article)
+
+
+@tag('slow')
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.filebased.EmailBackend')
+class LargeSubscriberListTests(TestCase):
+    SUBSCRIBERS = 100_000
+
+    def test_emails_a_hundred_thousand_subscribers(self):
+        journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        article = Article.objects.create(title='A', content='C', author=journalist, approved=True)
+        readers = User.objects.bulk_create(
+            (User(username=f'r{i}', email=f'r{i}@example.com', role='READER') for i in range(self.SUBSCRIBERS)),
+            batch_size=5000,
+        )
+        JournalistFollow = User.subscriptions_to_journalists.through
+        JournalistFollow.objects.bulk_create(
+            (JournalistFollow(from_user=r, to_user=journalist) for r in readers), batch_size=5000,
+        )
+        del readers
+
+        outdir = tempfile.TemporaryDirectory()
+        self.addCleanup(outdir.cleanup)
+        with override_settings(EMAIL_FILE_PATH=outdir.name), CaptureQueriesContext(connection) as ctx:
+            report = email_subscribers(article)
+        chunks = -(-self.SUBSCRIBERS // settings.EMAIL_CHUNK_SIZE)
+        self.assertEqual((report.sent, report.failed, report.chunks), (self.SUBSCRIBERS, 0, chunks))
+        # Addresses are streamed by one query, not fetched per chunk or per reader
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+        [path] = [os.path.join(outdir.name, name) for name in os.listdir(outdir.name)]
+        with open(path, encoding='utf-8') as f:
+            recipients = [line for line in f if line.startswith('To: ')]
+        self.assertEqual(len(recipients), self.SUBSCRIBERS)
+        self.assertEqual(len(set(recipients)), self.SUBSCRIBERS)
+
+
+@override_settings(EMAIL_CHUNK_SIZE=100)
+class NewsletterDispatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.other = User.objects.create(username='other', role='JOURNALIST')
+        drafter = User.objects.create(username='drafter', role='JOURNALIST')
+        self.publisher = Publisher.objects.create(title='Tech News')
+        self.newsletter = Newsletter.objects.create(title='Weekly', author=self.journalist)
+        self.newsletter.articles.add(
+            Article.objects.create(title='By publisher', content='C', author=self.other, publisher=self.publisher, approved=True),
+            Article.objects.create(title='By journalist', content='C', author=self.journalist, approved=True),
+            Article.objects.create(title='Unreviewed draft', content='C', author=drafter),
+        )
+        readers = User.objects.bulk_create(
+            User(username=f'r{i}', email=f'r{i:03}@example.com', role='READER') for i in range(250)
+        )
+        PublisherFollow = User.subscriptions_to_publishers.through
+        JournalistFollow = User.subscriptions_to_journalists.through
+        PublisherFollow.objects.bulk_create(PublisherFollow(user=r, publisher=self.publisher) for r in readers[:200])
+        JournalistFollow.objects.bulk_create(JournalistFollow(from_user=r, to_user=self.journalist) for r in readers[100:])
+        # Only follows the author of the draft, which is not sent
+        JournalistFollow.objects.create(
+            from_user=User.objects.create(username='lurker', email='lurker@example.com', role='READER'), to_user=drafter,
+        )
+
+    def test_one_message_per_recipient(self):
+        report = newsletters.dispatch(self.newsletter)
+        self.assertEqual((report.sent, report.failed, report.chunks), (250, 0, 3))
+        self.assertEqual(len({message.to[0] for message in mail.outbox}), 250)
+        self.assertNotIn('lurker@example.com', {message.to[0] for message in mail.outbox})
+        body = mail.outbox[0].body
+        self.assertIn('By publisher', body)
+        self.assertNotIn('Unreviewed draft', body)
+        state = NewsletterDispatch.objects.get(newsletter=self.newsletter)
+        self.assertEqual((state.status, state.sent, state.cursor), ('SENT', 250, 'r249@example.com'))
+
+    def test_recipients_cost_one_query_per_chunk(self):
+        with CaptureQueriesContext(connection) as ctx:
+            newsletters.dispatch(self.newsletter)
+        recipient_queries = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT DISTINCT')]
+        self.assertEqual(len(recipient_queries), 3)
+
+    def test_resumes_after_failed_chunk_without_duplicates(self):
+        send = mail.get_connection().__class__.send_messages
+        calls = count()
+
+        def flaky(backend, messages):
+            if next(calls) == 1:
+                raise OSError('connection reset')
+            return send(backend, messages)
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', flaky):
+            with self.assertRaises(newsletters.DispatchInterrupted), self.assertLogs('articles.mailing', 'WARNING'):
+                newsletters.dispatch(self.newsletter)
+        self.assertEqual(NewsletterDispatch.objects.values_list('cursor', 'status').get(), ('r099@example.com', 'QUEUED'))
+
+        newsletters.dispatch(self.newsletter)
+        addresses = [message.to[0] for message in mail.outbox]
+        self.assertEqual(len(addresses), 250)
+        self.assertEqual(len(set(addresses)), 250)
+        self.assertEqual(NewsletterDispatch.objects.get().status, 'SENT')
+
+    def test_lease_is_renewed_after_every_chunk(self):
+        newsletters.queue_dispatch(self.newsletter)
+        renew, leases = outbox.renew_lease, []
+
+        def renewing():
+            # As if each chunk had taken nearly the whole lease
+            OutboxMessage.objects.update(available_at=timezone.now())
+            renew()
+            leases.append(OutboxMessage.objects.get().available_at)
+
+        with patch('articles.outbox.renew_lease', renewing):
+            call_command('process_outbox', '--once', stdout=StringIO())
+        self.assertEqual(len(leases), 3)
+        self.assertTrue(all(lease > timezone.now() for lease in leases))
+        self.assertEqual(OutboxMessage.objects.get().status, 'DONE')
+
+    def test_refuses_to_start_while_another_run_is_sending(self):
+        NewsletterDispatch.objects.create(newsletter=self.newsletter, status='SENDING', cursor='r099@example.com')
+        with self.assertRaises(newsletters.DispatchInProgress):
+            newsletters.dispatch(self.newsletter)
+        with self.assertRaisesMessage(CommandError, 'being sent by another worker'):
+            call_command('send_newsletter', self.newsletter.pk, '--restart', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+        # A run that stopped checkpointing is presumed dead and resumed
+        NewsletterDispatch.objects.update(updated_at=timezone.now() - timedelta(seconds=settings.OUTBOX_LEASE_SECONDS + 1))
+        report = newsletters.dispatch(self.newsletter)
+        self.assertEqual(report.sent, 150)
+        self.assertEqual(NewsletterDispatch.objects.get().status, 'SENT')
+
+    def test_send_action_queues_once(self):
+        url = f'/api/newsletters/{self.newsletter.pk}/send/'
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.journalist)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('process_outbox', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 250)
+        self.assertEqual(OutboxMessage.objects.get(topic='newsletter.dispatch').status, 'DONE')
+
+    def test_command_does_not_resend(self):
+        call_command('send_newsletter', self.newsletter.pk, stdout=StringIO())
+        out = StringIO()
+        call_command('send_newsletter', self.newsletter.pk, stdout=out)
+        self.assertIn('Already sent', out.getvalue())
+        self.assertEqual(len(mail.outbox), 250)
+
+class SearchTestsMixin:
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.other = User.objects.create(username='other', role='JOURNALIST')
+        self.in_title = Article.objects.create(
+            title='Demogorgon sighted', content='Residents report strange lights.', author=self.journalist, approved=True,
+        )
+        self.in_body = Article.objects.create(
+            title='Town meeting', content='The mayor dismissed talk of a <b>demogorgon</b>.', author=self.other, approved=True,
+        )
+        self.draft = Article.objects.create(
+            title='Demogorgon draft', content='Unreviewed.', author=self.journalist,
+        )
+
+    def search_ids(self, query, user=None, extra=''):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(f'/api/articles/search/?q={query}{extra}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']], response
+
+    def test_title_matches_rank_first(self):
+        ids, _ = self.search_ids('demogorgon')
+        self.assertEqual(ids, [self.in_title.id, self.in_body.id])
+
+    def test_visibility_matches_article_api(self):
+        self.assertNotIn(self.draft.id, self.search_ids('demogorgon')[0])
+        self.assertIn(self.draft.id, self.search_ids('demogorgon', self.journalist)[0])
+        self.assertNotIn(self.draft.id, self.search_ids('demogorgon', self.other)[0])
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        _, response = self.search_ids('mayor')
+        snippet = response.data['results'][0]['snippet']
+        self.assertIn('<mark>mayor</mark>', snippet)
+        self.assertIn('&lt;b&gt;', snippet)
+
+    def test_index_follows_edits_and_deletes(self):
+        self.in_body.title = 'Upside down'
+        self.in_body.save()
+        self.assertEqual(self.search_ids('upside')[0], [self.in_body.id])
+        self.in_body.delete()
+        self.assertEqual(self.search_ids('upside')[0], [])
+
+    def test_cursor_pagination(self):
+        first, response = self.search_ids('demogorgon', extra='&page_size=1')
+        second = self.client.get(response.data['next']).data
+        self.assertEqual(first + [item['id'] for item in second['results']], [self.in_title.id, self.in_body.id])
+        self.assertIsNone(second['next'])
+
+    def test_web_search_page(self):
+        response = self.client.get('/articles/search/?q=demogorgon')
+        self.assertContains(response, '<mark>Demogorgon</mark> sighted', html=False)
+
+@override_settings(SEARCH_BACKEND='articles.search.FTS5Backend')
+class FTS5SearchTests(SearchTestsMixin, TestCase):
+    pass
+
+@override_settings(SEARCH_BACKEND='articles.search.InvertedIndexBackend')
+class InvertedIndexSearchTests(SearchTestsMixin, TestCase):
+    def test_ranks_and_pages_in_the_database(self):
+        matches = [
+            Article.objects.create(title=f'Beacon {i}', content='Gadget ' * i, author=self.other, approved=True)
+            for i in range(1, 13)
+        ]
+        Article.objects.create(title='Beacon only', content='Nothing else.', author=self.other, approved=True)
+        backend, visibility, seen, cursor = search.get_backend(), search.Visibility(), [], None
+        while True:
+            with CaptureQueriesContext(connection) as ctx:
+                hits, cursor = backend.search('beacon gadget', visibility, cursor, page_size=5)
+            seen += [hit.article_id for hit in hits]
+            # Only the page (and one row to tell if there is another) leaves the database
+            ranked = [q['sql'] for q in ctx.captured_queries if 'GROUP BY' in q['sql'] and 'ORDER BY' in q['sql']]
+            self.assertEqual(len(ranked), 1)
+            self.assertIn('LIMIT 6', ranked[0])
+            if cursor is None:
+                break
+        # Both terms required; more occurrences rank higher
+        self.assertEqual(seen, [article.pk for article in reversed(matches)])
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.editor = User.objects.create(username='editor', role='EDITOR')
+        self.article = Article.objects.create(title='Cached story', content='C', author=self.journalist, approved=True)
+
+    def get_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        return response, len(ctx.captured_queries)
+
+    def test_second_anonymous_request_is_served_from_cache(self):
+        self.get_queries('/articles/')
+        hits = page_cache.stats().get('hits', 0)
+        response, queries = self.get_queries('/articles/')
+        self.assertContains(response, 'Cached story')
+        self.assertEqual(queries, 0)
+        self.assertEqual(page_cache.stats()['hits'], hits + 1)
+
+    def test_approval_and_edit_invalidate(self):
+        self.client.get('/articles/')
+        self.client.get(f'/articles/article/{self.article.id}/')
+        draft = Article.objects.create(title='Fresh story', content='C', author=self.journalist)
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_article(draft, self.editor)
+        self.assertContains(self.client.get('/articles/'), 'Fresh story')
+
+        self.article.title = 'Renamed story'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.save()
+        self.assertContains(self.client.get(f'/articles/article/{self.article.id}/'), 'Renamed story')
+        self.assertContains(self.client.get('/articles/'), 'Renamed story')
+
+    def test_draft_edits_leave_feeds_cached(self):
+        draft = Article.objects.create(title='Draft', content='C', author=self.journalist)
+        before = page_cache.generations(('feed', 'home'))
+        draft.content = 'Still a draft'
+        draft.save()
+        self.assertEqual(page_cache.generations(('feed', 'home')), before)
+
+    def test_logged_in_users_bypass_cache(self):
+        self.client.force_login(self.editor)
+        self.client.get('/articles/')
+        _, queries = self.get_queries('/articles/')
+        self.assertGreater(queries, 0)
+
+    def test_cached_pages_keep_their_headers_and_cookies_are_not_cached(self):
+        calls = []
+
+        @page_cache.cached_page(feed='home')
+        def page(request):
+            calls.append(1)
+            response = HttpResponse('{}', content_type='application/json')
+            response['Cache-Control'] = 'max-age=60'
+            response['Vary'] = 'Accept-Language'
+            return response
+
+        @page_cache.cached_page(feed='independent')
+        def personal(request):
+            calls.append(1)
+            response = HttpResponse('hello')
+            response.set_cookie('seen', '1')
+            return response
+
+        request = RequestFactory().get('/cached/')
+        request.user = AnonymousUser()
+        for _ in range(2):
+            response = page(request)
+            self.assertEqual((response.content, response['Content-Type']), (b'{}', 'application/json'))
+            self.assertEqual((response['Cache-Control'], response['Vary']), ('max-age=60', 'Accept-Language'))
+        self.assertEqual(len(calls), 1)
+        for _ in range(2):
+            self.assertEqual(personal(request).cookies['seen'].value, '1')
+        self.assertEqual(len(calls), 3)
+
+    def test_generations_move_when_the_change_commits(self):
+        before = page_cache.generations(('article', self.article.pk))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.article.title = 'Edited'
+            self.article.save()
+            # A request served before the commit must not cache the old page under a new generation
+            self.assertEqual(page_cache.generations(('article', self.article.pk)), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(page_cache.generations(('article', self.article.pk)), before)
+
+    def test_cards_show_renamed_publisher_and_author(self):
+        publisher = Publisher.objects.create(title='Old Times')
+        self.article.publisher = publisher
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.save()
+        self.assertContains(self.client.get('/articles/'), 'Old Times')
+        publisher.title = 'New Times'
+        with self.captureOnCommitCallbacks(execute=True):
+            publisher.save()
+        self.assertContains(self.client.get('/articles/'), 'New Times')
+        self.journalist.username = 'renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.journalist.save()
+        self.assertContains(self.client.get('/articles/'), 'By renamed')
+        # Logins only save last_login
+        before = page_cache.generations(('author', self.journalist.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.journalist.save(update_fields=['last_login'])
+        self.assertEqual(page_cache.generations(('author', self.journalist.pk)), before)
+
+    @override_settings(PAGE_CACHE_LOCK_WAIT=0.1)
+    def test_waits_for_concurrent_render_then_falls_back(self):
+        cache.add('k:lock', 1)
+        renders = []
+        content = page_cache.get_or_render('k', lambda: (renders.append(1) or 'page', True))
+        self.assertEqual((content, renders), ('page', [1]))
+        # The fallback render is not cached; the lock holder will store its own
+        self.assertIsNone(cache.get('k'))
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.editor = User.objects.create(username='editor', role='EDITOR')
+        self.reader = User.objects.create(username='reader', role='READER')
+        self.article = Article.objects.create(title='Story', content='C', author=self.journalist, approved=True)
+
+    def test_list_returns_304_until_an_article_is_approved(self):
+        etag = self.client.get('/api/articles/')['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/articles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        draft = Article.objects.create(title='Draft', content='C', author=self.journalist)
+        self.assertEqual(self.client.get('/api/articles/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_article(draft, self.editor)
+        response = self.client.get('/api/articles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_role(self):
+        public = self.client.get('/api/articles/')['ETag']
+        self.client.force_authenticate(self.editor)
+        self.assertEqual(self.client.get('/api/articles/', HTTP_IF_NONE_MATCH=public).status_code, 200)
+
+    def test_retrieve_honours_if_modified_since(self):
+        response = self.client.get(f'/api/articles/{self.article.id}/')
+        last_modified = response['Last-Modified']
+        self.assertEqual(
+            self.client.get(f'/api/articles/{self.article.id}/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304,
+        )
+        self.article.title = 'Edited'
+        self.article.save()
+        self.assertEqual(
+            self.client.get(f'/api/articles/{self.article.id}/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200,
+        )
+
+    def test_article_validators_change_when_the_author_or_publisher_is_renamed(self):
+        publisher = Publisher.objects.create(title='Old Times')
+        self.article.publisher = publisher
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.save()
+        for url in (f'/articles/article/{self.article.pk}/', f'/api/articles/{self.article.pk}/'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            publisher.title = f'New Times {url}'
+            with self.captureOnCommitCallbacks(execute=True):
+                publisher.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertContains(response, f'New Times {url}')
+            etag = response['ETag']
+            self.journalist.username = f'renamed{len(url)}'
+            with self.captureOnCommitCallbacks(execute=True):
+                self.journalist.save()
+            self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=etag), f'renamed{len(url)}')
+
+    def test_subscribed_feed_changes_when_following(self):
+        self.client.force_authenticate(self.reader)
+        etag = self.client.get('/api/articles/subscribed/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.subscriptions_to_journalists.add(self.journalist)
+        response = self.client.get('/api/articles/subscribed/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_html_feed_returns_304(self):
+        etag = self.client.get('/articles/')['ETag']
+        self.assertEqual(self.client.get('/articles/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.article.title = 'Edited'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.save()
+        self.assertEqual(self.client.get('/articles/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_newsletter_etag_changes_when_articles_are_added(self):
+        newsletter = Newsletter.objects.create(title='Weekly', description='D', author=self.editor)
+        etag = self.client.get('/api/newsletters/')['ETag']
+        self.assertEqual(self.client.get('/api/newsletters/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            newsletter.articles.add(self.article)
+        self.assertEqual(self.client.get('/api/newsletters/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ImportArticlesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.journalist = User.objects.create(username='archivist', role='JOURNALIST')
+        self.reader = User.objects.create(username='reader', role='READER')
+        self.reader.subscriptions_to_journalists.add(self.journalist)
+        self.publisher = Publisher.objects.create(title='Old Times')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def jsonl(self):
+        rows = [
+            {'title': f'Archive {i}', 'content': f'Zeppelin story {i}', 'author': 'archivist',
+             'publisher': 'Old Times' if i % 2 else '', 'approved': True, 'created_at': f'1999-01-0{i}T12:00:00'}
+            for i in range(1, 5)
+        ]
+        rows.insert(2, {'title': 'Orphan', 'content': 'C', 'author': 'nobody'})
+        return self.write('archive.jsonl', '\n'.join(json.dumps(row) for row in rows))
+
+    def test_import_jsonl_and_refresh(self):
+        out, err = StringIO(), StringIO()
+        call_command('import_articles', self.jsonl(), '--chunk-size', '2', stdout=out, stderr=err)
+        self.assertIn('Imported 4 articles (1 rejected)', out.getvalue())
+        self.assertIn("Row 3: unknown author 'nobody'", err.getvalue())
+
+        article = Article.objects.get(title='Archive 1')
+        self.assertEqual(article.created_at.year, 1999)
+        self.assertEqual(article.publisher, self.publisher)
+        self.assertEqual(FeedEntry.objects.filter(reader=self.reader).count(), 4)
+        response = self.client.get('/api/articles/search/', {'q': 'zeppelin'})
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_resumes_after_checkpoint(self):
+        path = self.jsonl()
+        ImportCheckpoint.objects.create(source=os.path.abspath(path), position=3)
+        out = StringIO()
+        call_command('import_articles', path, '--skip-refresh', stdout=out)
+        self.assertIn('Resumed after row 3', out.getvalue())
+        self.assertEqual(sorted(Article.objects.values_list('title', flat=True)), ['Archive 3', 'Archive 4'])
+        self.assertEqual(ImportCheckpoint.objects.get().position, 5)
+
+        call_command('import_articles', path, '--skip-refresh', stdout=StringIO())
+        self.assertEqual(Article.objects.count(), 2)
+
+    def test_unfinished_refresh_is_finished_by_the_next_run(self):
+        path = self.jsonl()
+        other = Article.objects.create(title='Zeppelin elsewhere', content='Zeppelin', author=self.reader, approved=True)
+        search.remove_articles([other.pk])
+        # As if the run had crashed after its last chunk but before refreshing
+        call_command('import_articles', path, '--chunk-size', '2', '--skip-refresh', stdout=StringIO(), stderr=StringIO())
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertTrue(checkpoint.refresh_pending)
+        self.assertEqual(checkpoint.author_ids, [self.journalist.pk])
+        self.assertEqual(checkpoint.publisher_ids, [self.publisher.pk])
+        self.assertFalse(FeedEntry.objects.filter(reader=self.reader).exists())
+
+        out = StringIO()
+        call_command('import_articles', path, stdout=out, stderr=StringIO())
+        self.assertIn('Imported 0 articles', out.getvalue())
+        self.assertIn('Refreshed search index and 1 feed(s)', out.getvalue())
+        self.assertEqual(FeedEntry.objects.filter(reader=self.reader).count(), 4)
+        self.journalist.refresh_from_db()
+        self.assertEqual(self.journalist.article_count, 4)
+        # Only the imported articles were indexed
+        response = self.client.get('/api/articles/search/', {'q': 'zeppelin'})
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertFalse(ImportCheckpoint.objects.get().refresh_pending)
+
+        out = StringIO()
+        call_command('import_articles', path, stdout=out, stderr=StringIO())
+        self.assertNotIn('Refreshed', out.getvalue())
+
+    def test_import_csv(self):
+        path = self.write('archive.csv', 'title,content,author,approved\nOne,Body,archivist,yes\nTwo,Body,archivist,0\n')
+        call_command('import_articles', path, stdout=StringIO())
+        self.assertEqual(dict(Article.objects.values_list('title', 'approved')), {'One': True, 'Two': False})
+
+
+class ScaleBenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_scale_skews_followers(self):
+        out = StringIO()
+        call_command('seed_scale', '--publishers', '3', '--journalists', '10', '--readers', '60',
+                     '--articles', '80', '--follows-per-reader', '4', stdout=out)
+        self.assertIn('Seeded 3 publishers, 10 journalists, 60 readers, 80 articles', out.getvalue())
+        followers = sorted(
+            User.objects.filter(role='JOURNALIST').annotate(n=Count('journalist_subscribers')).values_list('n', flat=True),
+            reverse=True,
+        )
+        self.assertGreater(followers[0], 3 * followers[-1])
+        self.assertTrue(FeedEntry.objects.exists())
+        with self.assertRaises(CommandError):
+            call_command('seed_scale', stdout=StringIO())
+
+    def test_bench_feeds_writes_comparable_json(self):
+        call_command('seed_scale', '--publishers', '2', '--journalists', '3', '--readers', '5',
+                     '--articles', '10', stdout=StringIO())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.json')
+            call_command('bench_feeds', '--iterations', '2', '--warmup', '0', '--output', path, stdout=StringIO())
+            with open(path) as f:
+                results = json.load(f)
+            out = StringIO()
+            call_command('bench_feeds', '--iterations', '2', '--warmup', '0', '--only', 'api_articles',
+                         '--output', os.path.join(tmp, 'again.json'), '--compare', path, stdout=out)
+        self.assertEqual(results['meta']['dataset']['articles'], 10)
+        approve = results['scenarios']['api_approve']
+        self.assertLessEqual(approve['p50_ms'], approve['p99_ms'])
+        self.assertGreater(approve['queries_max'], 0)
+        self.assertLessEqual({'api_subscribed', 'html_home', 'api_publishers'}, set(results['scenarios']))
+        self.assertIn('api_articles       p50_ms', out.getvalue())
+        # Drafts created by the approve scenario are rolled back
+        self.assertEqual(Article.objects.count(), 10)
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0, METRICS_ALLOWED_IPS=[])
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        Article.objects.create(title='Measured', content='C', author=self.journalist, approved=True)
+        self.staff = User.objects.create(username='ops', role='EDITOR', is_staff=True)
+
+    def scrape(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/metrics/')
+        self.client.logout()
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_records_viewset_actions_and_url_names(self):
+        self.client.get('/api/articles/')
+        self.client.get('/articles/')
+        self.client.get('/articles/')
+        text = self.scrape()
+        self.assertIn('http_requests_total{view="ArticleViewSet.list",method="GET",status="200"} 1', text)
+        self.assertIn('http_request_duration_seconds_count{view="home",method="GET"} 2', text)
+        self.assertIn('http_request_db_queries_bucket{view="ArticleViewSet.list",method="GET",le="+Inf"} 1', text)
+        self.assertRegex(text, r'http_response_size_bytes_sum\{view="home",method="GET"\} [1-9]')
+        self.assertIn('page_cache_hits_total', text)
+
+    async def test_async_views_are_measured(self):
+        response = await AsyncClient().get('/articles/')
+        self.assertEqual(response.status_code, 200)
+        text = await sync_to_async(self.scrape)()
+        self.assertIn('http_request_duration_seconds_count{view="home",method="GET"} 1', text)
+        # The async ORM's queries are counted too
+        self.assertRegex(text, r'http_request_db_queries_sum\{view="home",method="GET"\} [1-9]')
+
+    def test_sampling_off_records_nothing(self):
+        with override_settings(METRICS_SAMPLE_RATE=0):
+            self.client.get('/api/articles/')
+        self.assertNotIn('ArticleViewSet.list', self.scrape())
+
+    def test_endpoint_is_restricted(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        with override_settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.media = media.name
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+
+    def upload(self, name='photo.png', color='red'):
+        out = BytesIO()
+        Image.new('RGB', (800, 600), color).save(out, 'PNG')
+        return SimpleUploadedFile(name, out.getvalue(), content_type='image/png')
+
+    def create(self, title, **image):
+        return Article.objects.create(
+            title=title, content='C', author=self.journalist, approved=True, image=self.upload(**image),
+        )
+
+    def test_variants_are_built_off_the_request_path(self):
+        article = self.create('Pictured')
+        self.assertEqual(article.card_image['width'], None)
+        self.assertTrue(OutboxMessage.objects.filter(topic='image.derivatives').exists())
+        self.assertEqual(outbox.process_batch(), (1, 0))
+
+        article.refresh_from_db()
+        card = article.card_image
+        self.assertEqual((card['width'], card['height']), (400, 225))
+        self.assertTrue(card['url'].endswith('.webp'))
+        with Image.open(os.path.join(self.media, article.image_variants['card']['name'])) as f:
+            self.assertEqual((f.format, f.size), ('WEBP', (400, 225)))
+        self.assertEqual(article.detail_image['width'], 800)
+        self.assertContains(self.client.get('/articles/'), card['url'])
+        data = APIClient().get(f'/api/articles/{article.id}/').data
+        self.assertEqual(data['image_variants']['card']['width'], 400)
+
+    def test_duplicate_uploads_share_storage(self):
+        first, second = self.create('One'), self.create('Two', name='copy.png')
+        outbox.process_batch()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_variants, second.image_variants)
+        self.assertEqual(os.listdir(os.path.join(self.media, 'images', 'originals')), [os.path.basename(first.image.name)])
+        # The uploaded copies were replaced by the shared original
+        self.assertEqual(os.listdir(os.path.join(self.media, 'articles')), [])
+
+    def test_replaced_image_falls_back_until_processed(self):
+        article = self.create('Pictured')
+        outbox.process_batch()
+        article = Article.objects.get(pk=article.pk)
+        article.image = self.upload(color='blue')
+        article.save()
+        self.assertEqual(article.card_image['width'], None)
+        outbox.process_batch()
+        article.refresh_from_db()
+        self.assertEqual(article.card_image['width'], 400)
+
+
+class FeedPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.journalist = User.objects.create_user(username='journalist', password='password', role='JOURNALIST')
+        self.articles = [
+            Article.objects.create(title=f'A{i}', content='C', author=self.journalist, approved=True)
+            for i in range(5)
+        ]
+        # Give two articles the same timestamp so the id tie-breaker is exercised
+        Article.objects.filter(pk=self.articles[2].pk).update(created_at=self.articles[1].created_at)
+
+    def _walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_api_cursor_walks_every_article_once(self):
+        seen = self._walk('/api/articles/?page_size=2')
+        expected = list(Article.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_api_rejects_garbage_cursor(self):
+        response = self.client.get('/api/articles/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_web_feed_links_to_next_page(self):
+        response = self.client.get('/articles/?page_size=3')
+        self.assertEqual(len(response.context['articles']), 3)
+        next_url = response.context['next_page_url']
+        self.assertIsNotNone(next_url)
+        response = self.client.get(next_url)
+        self.assertEqual(len(response.context['articles']), 2)
+        self.assertIsNone(response.context['next_page_url'])
+
 class NewsletterAPITests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.journalist = User.objects.create_user(username='journalist', password='password', role='JOURNALIST')
         self.article = Article.objects.create(title='A1', content='C1', author=self.journalist, approved=True)
@@ -121,3 +1041,881 @@ class NewsletterAPITests(TestCase):
         response = self.client.get('/api/newsletters/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.journalist = User.objects.create(username='journalist', email='j@example.com', role='JOURNALIST')
+        self.editor = User.objects.create(username='editor', role='EDITOR')
+        self.publisher = Publisher.objects.create(title='Tech News')
+        self.publisher.editors.add(self.editor)
+        self.article = Article.objects.create(
+            title='Title', content='Body text', author=self.journalist, publisher=self.publisher, approved=True,
+        )
+        self.newsletter = Newsletter.objects.create(title='Weekly', author=self.journalist)
+        self.newsletter.articles.add(self.article)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json(), ' '.join(q['sql'] for q in ctx.captured_queries)
+
+    def test_list_defaults_to_summary(self):
+        data, sql = self.get('/api/articles/')
+        item = data['results'][0]
+        self.assertNotIn('content', item)
+        self.assertNotIn('publisher_detail', item)
+        self.assertEqual((item['author'], item['publisher']), (self.journalist.pk, self.publisher.pk))
+        self.assertNotIn('"content"', sql)
+        self.assertNotIn('users_user', sql)
+
+    def test_detail_stays_full(self):
+        data, _ = self.get(f'/api/articles/{self.article.pk}/')
+        self.assertEqual(data['content'], 'Body text')
+        self.assertEqual(data['author']['email'], 'j@example.com')
+        self.assertEqual(data['publisher_detail']['editors'][0]['username'], 'editor')
+
+    def test_expand(self):
+        data, _ = self.get('/api/articles/?expand=author,publisher_detail.editors')
+        item = data['results'][0]
+        self.assertEqual(item['author'], {
+            'id': self.journalist.pk, 'username': 'journalist', 'role': 'JOURNALIST',
+            'subscriber_count': 0, 'article_count': 1,
+        })
+        self.assertEqual([u['username'] for u in item['publisher_detail']['editors']], ['editor'])
+        self.assertNotIn('journalists', item['publisher_detail'])
+
+    def test_fields_select_columns(self):
+        data, sql = self.get('/api/articles/?fields=id,author.username')
+        self.assertEqual(data['results'], [{'id': self.article.pk, 'author': {'username': 'journalist'}}])
+        self.assertNotIn('"title"', sql)
+        self.assertNotIn('"email"', sql)
+        data, sql = self.get(f'/api/articles/{self.article.pk}/?fields=content')
+        self.assertEqual(data, {'content': 'Body text'})
+        self.assertNotIn('publications_publisher', sql)
+
+    def test_newsletter_summary_lists_article_ids(self):
+        data, _ = self.get('/api/newsletters/')
+        self.assertEqual(data[0]['articles'], [self.article.pk])
+        data, _ = self.get('/api/newsletters/?expand=articles&fields=articles.title')
+        self.assertEqual(data[0], {'articles': [{'title': 'Title'}]})
+
+    def test_writes_ignore_field_selection(self):
+        self.client.force_authenticate(user=self.journalist)
+        response = self.client.post('/api/articles/?fields=id', {'title': 'New', 'content': 'Text'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['content'], 'Text')
+
+@override_settings(STREAM_CHUNK_SIZE=2)
+class StreamingListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.publisher = Publisher.objects.create(title='Tech News')
+        self.publisher.editors.add(User.objects.create(username='editor', role='EDITOR'))
+        self.articles = [
+            Article.objects.create(title=f'A{i}', content='C', author=self.journalist, publisher=self.publisher, approved=True)
+            for i in range(5)
+        ]
+        Article.objects.create(title='Draft', content='C', author=self.journalist)
+
+    def stream(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, [chunk.decode() for chunk in response.streaming_content]
+
+    def test_json_array_of_every_visible_row(self):
+        response, chunks = self.stream('/api/articles/?stream=json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        # '[', three chunks of at most two rows, ']'
+        self.assertEqual(len(chunks), 5)
+        items = json.loads(''.join(chunks))
+        self.assertEqual([item['title'] for item in items], ['A4', 'A3', 'A2', 'A1', 'A0'])
+        self.assertNotIn('content', items[0])
+
+    def test_ndjson(self):
+        response, chunks = self.stream('/api/articles/?fields=id,title', Accept='application/x-ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = ''.join(chunks).splitlines()
+        self.assertEqual(json.loads(lines[0]), {'id': self.articles[-1].pk, 'title': 'A4'})
+        self.assertEqual(len(lines), 5)
+
+    def test_reads_rows_in_chunks(self):
+        with CaptureQueriesContext(connection) as ctx:
+            _, chunks = self.stream('/api/articles/?stream=ndjson&expand=publisher_detail.editors')
+        # One article query, plus the editors prefetch for each chunk of rows
+        self.assertEqual(len(ctx.captured_queries), 1 + 3)
+        self.assertEqual(json.loads(chunks[0].splitlines()[0])['publisher_detail']['editors'][0]['username'], 'editor')
+
+    def test_empty_collection(self):
+        Article.objects.all().delete()
+        _, chunks = self.stream('/api/articles/?stream=json')
+        self.assertEqual(json.loads(''.join(chunks)), [])
+
+    def test_other_collections(self):
+        _, chunks = self.stream('/api/publishers/?stream=json')
+        self.assertEqual(json.loads(''.join(chunks))[0]['title'], 'Tech News')
+        Newsletter.objects.create(title='Weekly', author=self.journalist).articles.add(self.articles[0])
+        _, chunks = self.stream('/api/newsletters/?stream=ndjson')
+        self.assertEqual(json.loads(chunks[0])['articles'], [self.articles[0].pk])
+
+    def test_paginated_without_stream(self):
+        response = self.client.get('/api/articles/')
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.data['results']), 5)
+
+@override_settings(REVIEW_CLAIM_BATCH=2, REVIEW_BATCH_LIMIT=10)
+class ReviewQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.editor = User.objects.create(username='editor', role='EDITOR')
+        self.other_editor = User.objects.create(username='other_editor', role='EDITOR')
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.publisher = Publisher.objects.create(title='Tech News')
+        self.pending = [
+            Article.objects.create(
+                title=f'P{i}', content='C', author=self.journalist, publisher=self.publisher if i % 2 else None,
+            )
+            for i in range(5)
+        ]
+        Article.objects.create(title='Live', content='C', author=self.journalist, approved=True)
+
+    def ids(self, articles):
+        return [article.pk for article in articles]
+
+    def test_queue_is_oldest_first_paginated_and_filterable(self):
+        self.client.force_authenticate(user=self.editor)
+        response = self.client.get('/api/articles/queue/?page_size=3')
+        self.assertEqual([item['title'] for item in response.data['results']], ['P0', 'P1', 'P2'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([item['title'] for item in response.data['results']], ['P3', 'P4'])
+        response = self.client.get(f'/api/articles/queue/?publisher={self.publisher.pk}')
+        self.assertEqual([item['title'] for item in response.data['results']], ['P1', 'P3'])
+        response = self.client.get('/api/articles/queue/?publisher=independent')
+        self.assertEqual([item['title'] for item in response.data['results']], ['P0', 'P2', 'P4'])
+
+    def test_queue_is_for_editors(self):
+        self.client.force_authenticate(user=self.journalist)
+        self.assertEqual(self.client.get('/api/articles/queue/').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.post('/api/articles/claim/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_claims_do_not_overlap(self):
+        mine = review.claim_batch(self.editor)
+        theirs = review.claim_batch(self.other_editor)
+        self.assertEqual(self.ids(mine), self.ids(self.pending[:2]))
+        self.assertEqual(self.ids(theirs), self.ids(self.pending[2:4]))
+        # Claiming again renews the editor's own claims rather than taking more
+        self.assertEqual(self.ids(review.claim_batch(self.editor)), self.ids(self.pending[:2]))
+
+    def test_claims_expire(self):
+        review.claim_batch(self.editor)
+        Article.objects.filter(claimed_by=self.editor).update(claimed_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.ids(review.claim_batch(self.other_editor)), self.ids(self.pending[:2]))
+
+    def test_claim_api(self):
+        self.client.force_authenticate(user=self.editor)
+        response = self.client.post('/api/articles/claim/', {'size': 3, 'publisher': self.publisher.pk}, format='json')
+        self.assertEqual([item['title'] for item in response.data], ['P1', 'P3'])
+        self.assertEqual(response.data[0]['claimed_by'], self.editor.pk)
+        response = self.client.post('/api/articles/release/', {}, format='json')
+        self.assertEqual(response.data, {'released': 2})
+
+    def test_bulk_approve_queues_one_notification_batch(self):
+        review.claim_batch(self.other_editor, size=1)
+        reader = User.objects.create(username='reader', email='reader@example.com', role='READER')
+        with self.captureOnCommitCallbacks(execute=True):
+            reader.subscriptions_to_journalists.add(self.journalist)
+        self.client.force_authenticate(user=self.editor)
+        live = Article.objects.get(title='Live')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/articles/bulk_approve/', {'ids': self.ids(self.pending) + [live.pk]}, format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['approved'], self.ids(self.pending[1:]))
+        self.assertEqual(response.data['skipped'], {
+            str(self.pending[0].pk): 'claimed by another editor', str(live.pk): 'already approved',
+        })
+        self.assertEqual(Article.objects.filter(approved=True, approved_by=self.editor).count(), 4)
+        self.assertEqual(FeedEntry.objects.filter(reader=reader).count(), 5)
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.topic, message.payload), ('approval.batch', {'article_ids': self.ids(self.pending[1:])}))
+
+        call_command('process_outbox', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_failed_batch_announcement_is_retried_alone(self):
+        review.approve(self.editor, self.ids(self.pending[:2]))
+        reader = User.objects.create(username='reader', email='reader@example.com', role='READER')
+        reader.subscriptions_to_journalists.add(self.journalist)
+        real = email_subscribers
+        failures = iter([True])
+
+        def flaky(article):
+            if article.pk == self.pending[1].pk and next(failures, False):
+                raise OSError('smtp down')
+            return real(article)
+
+        with patch('articles.services.email_subscribers', flaky), self.assertLogs('articles.services', 'ERROR'):
+            call_command('process_outbox', '--once', stdout=StringIO())
+        self.assertEqual(OutboxMessage.objects.get(topic='approval.batch').status, 'DONE')
+        retry = OutboxMessage.objects.get(topic='approval.email')
+        self.assertEqual((retry.payload, retry.status), ({'article_id': self.pending[1].pk}, 'DONE'))
+        # Each article announced exactly once
+        self.assertEqual(sorted(m.subject for m in mail.outbox), ['New Article: P0', 'New Article: P1'])
+
+    def test_bulk_decline_from_dashboard(self):
+        self.client.force_login(self.editor)
+        response = self.client.post('/articles/approval/bulk/', {
+            'action': 'decline', 'reason': 'Needs sources', 'article_ids': self.ids(self.pending[:2]),
+        })
+        self.assertRedirects(response, '/articles/approval/')
+        declined = Article.objects.filter(declined_by=self.editor)
+        self.assertEqual(set(declined.values_list('declined_reason', flat=True)), {'Needs sources'})
+        self.assertEqual(declined.count(), 2)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_dashboard_claim_and_single_approve_respect_claims(self):
+        self.client.force_login(self.other_editor)
+        self.client.post('/articles/approval/claim/')
+        self.client.force_login(self.editor)
+        response = self.client.get('/articles/approval/')
+        self.assertContains(response, 'Claimed by', count=2)
+        self.client.post(f'/articles/approval/{self.pending[0].pk}/approve/')
+        self.assertFalse(Article.objects.get(pk=self.pending[0].pk).approved)
+        self.client.force_authenticate(user=self.editor)
+        response = self.client.post(f'/api/articles/{self.pending[1].pk}/approve/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_single_review_rechecks_the_locked_row(self):
+        # Instances loaded before another editor acted on the article
+        stale, twice = Article.objects.get(pk=self.pending[0].pk), Article.objects.get(pk=self.pending[1].pk)
+        review.claim_batch(self.other_editor, size=1)
+        with self.assertRaises(ClaimedByOther):
+            publish_article(stale, self.editor)
+        with self.assertRaises(ClaimedByOther):
+            record_decline(stale, self.editor, 'Sources')
+        publish_article(Article.objects.get(pk=twice.pk), self.editor)
+        with self.assertRaises(InvalidTransition):
+            publish_article(twice, self.editor)
+        self.assertEqual(OutboxMessage.objects.filter(payload__article_id=twice.pk).count(), 2)
+        self.assertFalse(OutboxMessage.objects.filter(payload__article_id=stale.pk).exists())
+
+    def test_malformed_publisher_filter(self):
+        self.client.force_authenticate(user=self.editor)
+        response = self.client.get('/api/articles/queue/?publisher=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/articles/claim/', {'publisher': 'abc'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Article.objects.filter(claimed_by__isnull=False).exists())
+        # The dashboard shows the whole queue instead
+        self.client.force_login(self.editor)
+        response = self.client.get('/articles/approval/?publisher=abc')
+        self.assertEqual([a.title for a in response.context['articles']], ['P0', 'P1', 'P2', 'P3', 'P4'])
+        self.assertRedirects(self.client.post('/articles/approval/claim/', {'publisher': 'abc'}), '/articles/approval/')
+
+    def test_bulk_limit(self):
+        self.client.force_authenticate(user=self.editor)
+        response = self.client.post('/api/articles/bulk_approve/', {'ids': list(range(1, 12))}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/articles/bulk_approve/', {'ids': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ArticleStatusTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.editor = User.objects.create(username='editor', role='EDITOR')
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.article = Article.objects.create(title='A', content='C', author=self.journalist)
+
+    def test_status_and_approved_agree(self):
+        self.assertEqual(self.article.status, Article.Status.PENDING)
+        live = Article.objects.create(title='Live', content='C', author=self.journalist, approved=True)
+        self.assertEqual(live.status, Article.Status.APPROVED)
+        live.status = Article.Status.ARCHIVED
+        live.save(update_fields=['status'])
+        live.refresh_from_db()
+        self.assertEqual((live.status, live.approved), (Article.Status.ARCHIVED, False))
+
+    def test_backfill(self):
+        backfill = import_module('articles.migrations.0012_article_status').backfill_status
+        declined = Article.objects.create(title='D', content='C', author=self.journalist, declined_at=timezone.now())
+        live = Article.objects.create(title='L', content='C', author=self.journalist, approved=True)
+        Article.objects.update(status=Article.Status.PENDING)
+        backfill(django_apps, SimpleNamespace(connection=connection))
+        self.assertEqual(
+            dict(Article.objects.values_list('pk', 'status')),
+            {self.article.pk: 'PENDING', declined.pk: 'DECLINED', live.pk: 'APPROVED'},
+        )
+
+    def test_transitions_are_enforced(self):
+        self.article.transition(Article.Status.ARCHIVED)
+        self.article.save()
+        with self.assertRaises(InvalidTransition):
+            publish_article(self.article, self.editor)
+        self.client.force_authenticate(user=self.editor)
+        response = self.client.post(f'/api/articles/{self.article.pk}/approve/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(OutboxMessage.objects.exists())
+        result = review.approve(self.editor, [self.article.pk])
+        self.assertEqual(result.skipped, {self.article.pk: 'cannot be reviewed while archived'})
+
+    def test_declined_articles_leave_the_queue_until_resubmitted(self):
+        review.decline(self.editor, [self.article.pk], 'Needs sources')
+        self.assertFalse(review.queue().exists())
+        self.client.force_login(self.editor)
+        self.assertContains(self.client.get('/articles/approval/'), 'No articles pending approval.')
+
+        self.client.force_authenticate(user=self.journalist)
+        response = self.client.patch(f'/api/articles/{self.article.pk}/', {'content': 'With sources'}, format='json')
+        self.assertEqual(response.data['status'], Article.Status.PENDING)
+        self.assertEqual(list(review.queue()), [self.article])
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN output is SQLite-specific')
+    def test_queue_and_feed_are_index_range_scans(self):
+        # Either the partial or the composite status index will do; neither needs a sort
+        for plan in (
+            review.queue(queryset=Article.objects.all()).order_by('created_at', 'id')[:20].explain(),
+            Article.objects.filter(status=Article.Status.APPROVED).order_by('-created_at', '-id')[:20].explain(),
+        ):
+            self.assertRegex(plan, r'USING INDEX article_(status|queue|feed)_idx')
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], DB_PRIMARY_PIN_SECONDS=10)
+class ReplicaRouterTests(SimpleTestCase):
+    # Not TestCase: its transaction would keep every read on the primary
+    databases = {'default'}
+
+    def tearDown(self):
+        # The middleware leaves its routing in this thread's context
+        db._routing.set(None)
+
+    def route(self, request, write=False):
+        """Run ``request`` through the middleware; return where reads went before and after any write."""
+        reads = []
+
+        def view(request):
+            reads.append(router.db_for_read(Article))
+            if write:
+                router.db_for_write(Article)
+            reads.append(router.db_for_read(Article))
+            return HttpResponse()
+
+        response = db.PrimaryPinMiddleware(view)(request)
+        return reads, response
+
+    def test_reads_in_get_requests_use_a_replica(self):
+        reads, response = self.route(RequestFactory().get('/'))
+        self.assertEqual(reads, ['replica1', 'replica1'])
+        self.assertNotIn(db.PIN_COOKIE, response.cookies)
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.route(RequestFactory().get('/'))[0], ['default', 'default'])
+
+    def test_writes_pin_reads_to_the_primary(self):
+        reads, response = self.route(RequestFactory().get('/'), write=True)
+        self.assertEqual(reads, ['replica1', 'default'])
+        self.assertEqual(response.cookies[db.PIN_COOKIE]['max-age'], 10)
+        reads, response = self.route(RequestFactory().post('/'), write=True)
+        self.assertEqual(reads, ['default', 'default'])
+        self.assertIn(db.PIN_COOKIE, response.cookies)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[db.PIN_COOKIE] = '1'
+        self.assertEqual(self.route(request)[0], ['default', 'default'])
+
+    def test_writes_pin_api_credentials_without_cookies(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        credentials = 'Basic ' + base64.b64encode(b'reader:secret').decode()
+        self.route(RequestFactory().post('/', HTTP_AUTHORIZATION=credentials), write=True)
+        # The client ignores the cookie; its credentials stay pinned
+        self.assertEqual(self.route(RequestFactory().get('/', HTTP_AUTHORIZATION=credentials))[0], ['default', 'default'])
+        other = 'Basic ' + base64.b64encode(b'other:secret').decode()
+        self.assertEqual(self.route(RequestFactory().get('/', HTTP_AUTHORIZATION=other))[0], ['replica1', 'replica1'])
+
+    def test_async_requests_honour_the_credentials_pin(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        credentials = 'Basic ' + base64.b64encode(b'reader:secret').decode()
+        reads = []
+
+        async def view(request):
+            reads.append(router.db_for_read(Article))
+            if request.method == 'POST':
+                router.db_for_write(Article)
+            return HttpResponse()
+
+        middleware = db.PrimaryPinMiddleware(view)
+        async_to_sync(middleware)(RequestFactory().get('/', HTTP_AUTHORIZATION=credentials))
+        async_to_sync(middleware)(RequestFactory().post('/', HTTP_AUTHORIZATION=credentials))
+        async_to_sync(middleware)(RequestFactory().get('/', HTTP_AUTHORIZATION=credentials))
+        self.assertEqual(reads, ['replica1', 'default', 'default'])
+
+    def test_transactions_read_the_primary(self):
+        def view(request):
+            with transaction.atomic():
+                return HttpResponse(router.db_for_read(Article))
+
+        response = db.PrimaryPinMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'default')
+
+    def test_replica_settings(self):
+        sqlite = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'primary.sqlite3'}
+        self.assertEqual(db.replica_databases(sqlite, ['replica.sqlite3']), {
+            'replica1': {**sqlite, 'NAME': 'replica.sqlite3', 'TEST': {'MIRROR': 'default'}},
+        })
+        # Replicas are read-only: no BEGIN IMMEDIATE
+        concurrent = {**sqlite, 'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 5}}
+        self.assertEqual(db.replica_databases(concurrent, ['replica.sqlite3'])['replica1']['OPTIONS'], {'timeout': 5})
+        self.assertEqual(concurrent['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        mysql = {'ENGINE': 'django.db.backends.mysql', 'NAME': 'news', 'HOST': 'db', 'PORT': '3306'}
+        replicas = db.replica_databases(mysql, ['replica-a', 'replica-b:3307'])
+        self.assertEqual([(r['HOST'], r['PORT']) for r in replicas.values()], [('replica-a', '3306'), ('replica-b', '3307')])
+        self.assertFalse(router.allow_migrate('replica1', 'articles'))
+        self.assertTrue(router.allow_migrate('default', 'articles'))
+
+
+@override_settings(SQLITE_RETRY_BACKOFF=0, SQLITE_WRITE_RETRIES=2)
+class SQLiteProfileTests(SimpleTestCase):
+    # Not TestCase: write_transaction only retries outermost transactions
+    databases = {'default'}
+
+    def test_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            pragmas = {
+                name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('busy_timeout', 'synchronous', 'cache_size')
+            }
+        self.assertEqual(pragmas, {'busy_timeout': 5000, 'synchronous': 1, 'cache_size': -20000})
+        self.assertEqual(connection.settings_dict['OPTIONS'], {'transaction_mode': 'IMMEDIATE'})
+
+    def test_locked_writes_are_retried(self):
+        errors = [OperationalError('database is locked')] * 2
+
+        @db.write_transaction
+        def write():
+            self.assertTrue(connection.in_atomic_block)
+            if errors:
+                raise errors.pop()
+            return 'written'
+
+        with self.assertLogs('news_app.db', 'INFO') as logs:
+            self.assertEqual(write(), 'written')
+        self.assertEqual(len(logs.records), 2)
+
+        errors = [OperationalError('database is locked')] * 3
+        with self.assertRaises(OperationalError), self.assertLogs('news_app.db', 'INFO'):
+            write()
+
+    def test_other_errors_are_not_retried(self):
+        calls = []
+
+        @db.write_transaction
+        def write():
+            calls.append(1)
+            raise OperationalError('no such table: missing')
+
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+
+class ReviewRetryTests(TransactionTestCase):
+    # Not TestCase: write_transaction only retries outermost transactions
+
+    def test_review_is_retried_after_a_locked_save(self):
+        editor = User.objects.create(username='editor', role='EDITOR')
+        journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        approved = Article.objects.create(title='A', content='C', author=journalist)
+        declined = Article.objects.create(title='D', content='C', author=journalist)
+        save, errors = Article.save, []
+
+        def locked_save(article, *args, **kwargs):
+            # Fails after the row was written, as a locked COMMIT-time write would
+            save(article, *args, **kwargs)
+            if errors:
+                raise errors.pop()
+
+        with patch.object(Article, 'save', locked_save), self.assertLogs('news_app.db', 'INFO') as logs:
+            errors.append(OperationalError('database is locked'))
+            publish_article(approved, editor)
+            errors.append(OperationalError('database is locked'))
+            record_decline(declined, editor, 'Needs sources')
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(
+            dict(Article.objects.values_list('pk', 'status')),
+            {approved.pk: Article.Status.APPROVED, declined.pk: Article.Status.DECLINED},
+        )
+        self.assertEqual(OutboxMessage.objects.filter(topic__startswith='approval.').count(), 2)
+        self.assertEqual((approved.status, declined.status), (Article.Status.APPROVED, Article.Status.DECLINED))
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = AsyncClient()
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.reader = User.objects.create(username='reader', role='READER')
+        self.articles = [
+            Article.objects.create(title=f'Story {i}', content='C', author=self.journalist, approved=True)
+            for i in range(3)
+        ]
+        self.draft = Article.objects.create(title='Draft', content='C', author=self.journalist)
+        self.reader.subscriptions_to_journalists.add(self.journalist)
+
+    async def test_feed_matches_sync_client_and_answers_304(self):
+        response = await self.client.get('/articles/?page_size=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([a.pk for a in response.context['articles']], [a.pk for a in self.articles[:0:-1]])
+        self.assertEqual(response.content, (await sync_to_async(APIClient().get)('/articles/?page_size=2')).content)
+        response = await self.client.get('/articles/?page_size=2', headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_detail_hides_unapproved_articles(self):
+        self.assertEqual((await self.client.get(f'/articles/article/{self.articles[0].pk}/')).status_code, 200)
+        self.assertEqual((await self.client.get(f'/articles/article/{self.draft.pk}/')).status_code, 404)
+
+    async def test_subscribed_feed(self):
+        # As from any API view: session authentication sends no challenge, so 403 rather than 401
+        self.assertEqual((await self.client.get('/api/articles/subscribed/')).status_code, 403)
+        bad_password = 'Basic ' + base64.b64encode(b'reader:wrong').decode()
+        response = await self.client.get('/api/articles/subscribed/', headers={'authorization': bad_password})
+        self.assertEqual(response.json(), {'detail': 'Invalid username/password.'})
+        await self.client.aforce_login(self.reader)
+        response = await self.client.get('/api/articles/subscribed/?page_size=2&fields=id,title')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first = response.json()
+        self.assertEqual(first['results'], [{'id': a.pk, 'title': a.title} for a in self.articles[:0:-1]])
+        second = (await self.client.get(first['next'])).json()
+        self.assertEqual([item['id'] for item in second['results']], [self.articles[0].pk])
+        self.assertIsNone(second['next'])
+        response = await self.client.get('/api/articles/subscribed/?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.client.post('/api/articles/subscribed/')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_subscribed_feed_is_throttled(self):
+        class OnePerMinute(UserRateThrottle):
+            rate = '1/min'
+
+        await self.client.aforce_login(self.reader)
+        with patch.object(SubscribedFeedPolicy, 'throttle_classes', [OnePerMinute]):
+            self.assertEqual((await self.client.get('/api/articles/subscribed/')).status_code, 200)
+            response = await self.client.get('/api/articles/subscribed/')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    async def test_apaginate_matches_paginate(self):
+        queryset = Article.objects.filter(status=Article.Status.APPROVED)
+        page = await apaginate(queryset, None, 2)
+        expected = await sync_to_async(paginate)(queryset, None, 2)
+        self.assertEqual(page, expected)
+        self.assertEqual(await apaginate(queryset, page.next_cursor, 2), await sync_to_async(paginate)(queryset, page.next_cursor, 2))
+
+
+class PopularityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        popularity._buffer.clear()
+        self.addCleanup(popularity._buffer.clear)
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.hot, self.cold, self.draft = (
+            Article.objects.create(title=title, content='C', author=self.journalist, approved=approved)
+            for title, approved in (('Hot', True), ('Cold', True), ('Draft', False))
+        )
+        self.hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+
+    def views(self, article):
+        return sum(ArticleViewCount.objects.filter(article=article).values_list('views', flat=True))
+
+    def test_views_are_buffered_and_flushed_as_increments(self):
+        url = f'/articles/article/{self.hot.pk}/'
+        etag = self.client.get(url)['ETag']
+        # Served from the page cache, then as a 304: both still count
+        self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.get(f'/articles/article/{self.cold.pk}/')
+        self.client.get(f'/articles/article/{self.draft.pk}/')
+        self.assertFalse(ArticleViewCount.objects.exists())
+
+        self.assertEqual(popularity.flush(), 4)
+        self.assertEqual((self.views(self.hot), self.views(self.cold), self.views(self.draft)), (3, 1, 0))
+        # A second flush adds to the hour's row rather than replacing it
+        popularity.record_view(self.hot.pk)
+        popularity.record_view(self.hot.pk, now=self.hour - timedelta(hours=1))
+        with CaptureQueriesContext(connection) as ctx:
+            popularity.flush()
+        self.assertEqual(ArticleViewCount.objects.get(article=self.hot, hour=self.hour).views, 4)
+        self.assertEqual(self.views(self.hot), 5)
+        self.assertEqual(popularity.flush(), 0)
+        # Existence check, insert, and one UPDATE per (hour, increment)
+        self.assertLessEqual(len([q for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]), 4)
+
+    @override_settings(VIEW_BUFFER_SIZE=2, VIEW_FLUSH_SECONDS=60)
+    @patch.object(popularity, '_ensure_flusher')
+    @patch.object(popularity, '_background', True)
+    def test_requests_only_buffer_and_a_full_buffer_is_flushed_at_once(self, ensure_flusher):
+        self.addCleanup(popularity._full.clear)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(f'/articles/article/{self.hot.pk}/')
+            self.client.get(f'/articles/article/{self.cold.pk}/')
+        self.assertNotIn('articleviewcount', ' '.join(q['sql'] for q in ctx.captured_queries))
+        # What the background thread does: no waiting for VIEW_FLUSH_SECONDS once full
+        started = timezone.now()
+        self.assertEqual(popularity.flush_when_due(), 2)
+        self.assertLess(timezone.now() - started, timedelta(seconds=5))
+        self.assertEqual((self.views(self.hot), self.views(self.cold)), (1, 1))
+        self.assertEqual(popularity.flush_when_due(timeout=0), 0)
+
+    @override_settings(VIEW_BUFFER_SIZE=2)
+    def test_without_a_flusher_the_request_that_fills_the_buffer_flushes_it(self):
+        self.client.get(f'/articles/article/{self.hot.pk}/')
+        self.assertFalse(ArticleViewCount.objects.exists())
+        self.client.get(f'/articles/article/{self.cold.pk}/')
+        self.assertEqual((self.views(self.hot), self.views(self.cold)), (1, 1))
+        self.assertFalse(popularity._buffer)
+        popularity.record_view(self.hot.pk)
+        popularity.record_view(self.hot.pk, now=self.hour - timedelta(hours=1))
+        self.assertEqual(self.views(self.hot), 3)
+
+    def test_views_of_deleted_articles_are_dropped(self):
+        popularity.record_view(self.cold.pk)
+        popularity.record_view(self.hot.pk)
+        self.cold.delete()
+        self.assertEqual(popularity.flush(), 2)
+        self.assertEqual(list(ArticleViewCount.objects.values_list('article_id', flat=True)), [self.hot.pk])
+
+    @override_settings(TRENDING_HALF_LIFE_HOURS=6, TRENDING_WINDOW_HOURS=48)
+    def test_ranking_decays_with_age_and_is_served_precomputed(self):
+        ArticleViewCount.objects.bulk_create([
+            ArticleViewCount(article=self.cold, hour=self.hour - timedelta(hours=30), views=10),
+            ArticleViewCount(article=self.cold, hour=self.hour - timedelta(hours=60), views=1000),
+            ArticleViewCount(article=self.hot, hour=self.hour, views=4),
+            ArticleViewCount(article=self.draft, hour=self.hour, views=50),
+        ])
+        api = APIClient()
+        response = api.get('/api/articles/trending/')
+        self.assertEqual(response.data['results'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(popularity.refresh_trending(), 2)
+        self.assertEqual(api.get('/api/articles/trending/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            response = api.get('/api/articles/trending/')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.hot.pk, self.cold.pk])
+        self.assertNotIn('articleviewcount', ' '.join(q['sql'] for q in ctx.captured_queries))
+        response = self.client.get('/articles/trending/?page_size=1')
+        self.assertEqual(list(response.context['articles']), [self.hot])
+
+        # An article taken down drops out before the next refresh
+        self.hot.transition(Article.Status.ARCHIVED)
+        self.hot.save()
+        self.assertEqual([item['id'] for item in api.get('/api/articles/trending/').data['results']], [self.cold.pk])
+
+    def test_refresh_command(self):
+        ArticleViewCount.objects.create(article=self.hot, hour=self.hour, views=1)
+        out = StringIO()
+        call_command('refresh_trending', '--once', stdout=out)
+        self.assertIn('Ranked 1 trending article(s)', out.getvalue())
+        self.assertEqual(TrendingArticle.objects.get().article, self.hot)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.publisher = Publisher.objects.create(title='Daily')
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.editor = User.objects.create(username='editor', role='EDITOR')
+        self.readers = [User.objects.create(username=f'reader{i}', role='READER') for i in range(3)]
+
+    def counts(self, obj):
+        obj.refresh_from_db()
+        return obj.subscriber_count, obj.article_count, obj.pending_count
+
+    def test_subscriptions(self):
+        a, b, c = self.readers
+        a.subscriptions_to_publishers.add(self.publisher)
+        self.publisher.subscribers.add(b, c)
+        self.assertEqual(self.counts(self.publisher), (3, 0, 0))
+        # Only edges that existed are uncounted
+        c.subscriptions_to_journalists.remove(self.journalist)
+        self.publisher.subscribers.remove(a, self.editor)
+        self.assertEqual(self.counts(self.publisher)[0], 2)
+        self.publisher.subscribers.clear()
+        self.assertEqual(self.counts(self.publisher)[0], 0)
+
+        subscriptions.set_subscriptions(a, journalists=[self.journalist])
+        self.assertTrue(subscriptions.toggle_journalist(b, self.journalist))
+        self.assertEqual(self.counts(self.journalist)[0], 2)
+        self.assertFalse(subscriptions.toggle_journalist(b, self.journalist))
+        # A reader who becomes a journalist drops their subscriptions
+        a.role = User.Roles.JOURNALIST
+        a.save()
+        self.assertEqual(self.counts(self.journalist)[0], 0)
+
+    def test_saving_a_stale_instance_keeps_the_counts(self):
+        journalist = User.objects.get(pk=self.journalist.pk)
+        publisher = Publisher.objects.get(pk=self.publisher.pk)
+        self.readers[0].subscriptions_to_journalists.add(self.journalist)
+        self.readers[0].subscriptions_to_publishers.add(self.publisher)
+        journalist.bio = 'Edited'
+        journalist.save()
+        publisher.title = 'Renamed'
+        publisher.save()
+        self.assertEqual(self.counts(self.journalist)[0], 1)
+        self.assertEqual(self.journalist.bio, 'Edited')
+        self.assertEqual(self.counts(self.publisher)[0], 1)
+        self.assertEqual(self.publisher.title, 'Renamed')
+
+    def test_counters_are_left_out_of_the_update_only(self):
+        saves = []
+
+        def receiver(sender, update_fields=None, **kwargs):
+            saves.append(update_fields)
+
+        post_save.connect(receiver, sender=Publisher)
+        self.addCleanup(post_save.disconnect, receiver, sender=Publisher)
+        publisher = Publisher.objects.only('title').get(pk=self.publisher.pk)
+        publisher.description = 'Set after loading'
+        publisher.save()
+        self.publisher.refresh_from_db()
+        self.assertEqual(self.publisher.description, 'Set after loading')
+        # An ordinary save, as far as receivers and a deleted row are concerned
+        gone = Publisher.objects.get(pk=self.publisher.pk)
+        Publisher.objects.filter(pk=gone.pk).delete()
+        gone.save()
+        self.assertTrue(Publisher.objects.filter(pk=gone.pk).exists())
+        self.assertEqual(saves[-1], None)
+
+    def test_deleting_a_follower(self):
+        reader = self.readers[0]
+        reader.subscriptions_to_publishers.add(self.publisher)
+        reader.subscriptions_to_journalists.add(self.journalist)
+        reader.delete()
+        self.assertEqual(self.counts(self.publisher)[0], 0)
+        self.assertEqual(self.counts(self.journalist)[0], 0)
+
+    def test_article_lifecycle(self):
+        article = Article.objects.create(title='T', content='C', author=self.journalist, publisher=self.publisher)
+        self.assertEqual(self.counts(self.journalist), (0, 0, 1))
+        self.assertEqual(self.counts(self.publisher), (0, 0, 1))
+        publish_article(article, self.editor)
+        self.assertEqual(self.counts(self.journalist), (0, 1, 0))
+        self.assertEqual(self.counts(self.publisher), (0, 1, 0))
+        # Edits that keep the status leave the counts alone
+        article.title = 'Edited'
+        article.save()
+        article.publisher = None
+        article.save()
+        self.assertEqual(self.counts(self.publisher), (0, 0, 0))
+        self.assertEqual(self.counts(self.journalist), (0, 1, 0))
+
+        other = Article.objects.create(title='U', content='C', author=self.journalist, publisher=self.publisher)
+        review.decline(self.editor, [other.pk], 'No')
+        self.assertEqual(self.counts(self.publisher), (0, 0, 0))
+        client = APIClient()
+        client.force_authenticate(self.journalist)
+        client.patch(f'/api/articles/{other.pk}/', {'title': 'Revised'})
+        self.assertEqual(self.counts(self.publisher), (0, 0, 1))
+        Article.objects.get(pk=article.pk).delete()
+        other.delete()
+        self.assertEqual(self.counts(self.journalist), (0, 0, 0))
+        self.assertEqual(self.counts(self.publisher), (0, 0, 0))
+
+    def test_reconcile_repairs_drift(self):
+        self.readers[0].subscriptions_to_publishers.add(self.publisher)
+        Article.objects.create(title='T', content='C', author=self.journalist, approved=True)
+        Publisher.objects.update(subscriber_count=7)
+        User.objects.filter(pk=self.journalist.pk).update(article_count=0, pending_count=-1)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('publications.Publisher: 1 row(s) repaired', out.getvalue())
+        self.assertIn('users.User: 1 row(s) repaired', out.getvalue())
+        self.assertEqual(self.counts(self.publisher), (1, 0, 0))
+        self.assertEqual(self.counts(self.journalist), (0, 1, 0))
+        self.assertEqual(counters.reconcile(), {'publications.Publisher': 0, 'users.User': 0})
+
+    def test_serializers_expose_counts(self):
+        self.readers[0].subscriptions_to_publishers.add(self.publisher)
+        self.readers[0].subscriptions_to_journalists.add(self.journalist)
+        client = APIClient()
+        with CaptureQueriesContext(connection) as ctx:
+            item = client.get('/api/publishers/').data[0]
+        self.assertEqual(item['subscriber_count'], 1)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.publisher.journalists.add(self.journalist)
+        item = client.get('/api/publishers/?expand=journalists').data[0]
+        self.assertEqual(item['journalists'][0]['subscriber_count'], 1)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """List endpoints must cost a fixed number of queries however many rows they return."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.reader = User.objects.create(username='reader', role='READER')
+        self.seq = count()
+
+    def _user(self, role):
+        return User.objects.create(username=f'{role.lower()}{next(self.seq)}', role=role)
+
+    def add_rows(self):
+        publisher = Publisher.objects.create(title=f'Pub {next(self.seq)}')
+        publisher.editors.add(self._user('EDITOR'))
+        journalist = self._user('JOURNALIST')
+        publisher.journalists.add(journalist, self._user('JOURNALIST'))
+        newsletter = Newsletter.objects.create(title='Weekly', author=journalist)
+        for with_publisher in (True, False):
+            article = Article.objects.create(
+                title='T', content='C', author=journalist, approved=True,
+                publisher=publisher if with_publisher else None,
+            )
+            newsletter.articles.add(article)
+        # Run the subscription graph's write-through as a real commit would
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.subscriptions_to_publishers.add(publisher)
+            self.reader.subscriptions_to_journalists.add(journalist)
+
+    def test_article_list(self):
+        # The summary needs no relations
+        self.assertQueryBudget('/api/articles/?page_size=100', self.add_rows, max_queries=1)
+
+    def test_expanded_article_list(self):
+        url = '/api/articles/?page_size=100&expand=author,publisher_detail.editors,publisher_detail.journalists'
+        self.assertQueryBudget(url, self.add_rows, max_queries=3)
+
+    def test_subscribed_feed(self):
+        self.client.force_authenticate(user=self.reader)
+        # Feed rows, hot journalist and publisher checks, then the articles with their relations
+        self.assertQueryBudget('/api/articles/subscribed/?page_size=100', self.add_rows, max_queries=5)
+
+    def test_newsletter_list(self):
+        self.assertQueryBudget('/api/newsletters/', self.add_rows, max_queries=2)
+        self.assertQueryBudget('/api/newsletters/?expand=author,articles.author', self.add_rows, max_queries=2)
+
+    def test_publisher_list(self):
+        self.assertQueryBudget('/api/publishers/', self.add_rows, max_queries=1)
+        self.assertQueryBudget('/api/publishers/?expand=editors,journalists', self.add_rows, max_queries=3)
+
+    def test_web_feed(self):
+        self.assertQueryBudget('/articles/?page_size=100', self.add_rows, max_queries=1)
+
+    def test_web_feed_for_reader(self):
+        self.client.force_login(self.reader)
+        # Session, user and the page of articles; followed IDs come from the cached graph
+        self.assertQueryBudget('/articles/?page_size=100', self.add_rows, max_queries=3)
+
+    def test_web_feed_cost_does_not_depend_on_page_size(self):
+        for _ in range(5):
+            self.add_rows()
+        self.client.force_login(self.reader)
+        small, large = (self.count_queries(f'/articles/?page_size={n}') for n in (1, 10))
+        self.assertEqual(small, large)
+        self.assertContains(self.client.get('/articles/'), 'Unsubscribe', count=10)
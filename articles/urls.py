@@ -6,10 +6,15 @@ urlpatterns = [
     path('', web_views.home, name='home'),
     path('independent/', web_views.independent_feed, name='independent_feed'),
     path('publishers/', web_views.publisher_feed, name='publisher_feed'),
+    path('trending/', web_views.trending_feed, name='trending_feed'),
     path('article/<int:pk>/', web_views.article_detail, name='article_detail'),
+    path('search/', web_views.search, name='search'),
+    path('cache-stats/', web_views.cache_stats, name='cache_stats'),
 
     # Editor Approval URLs
     path('approval/', web_views.approval_list, name='approval_list'),
+    path('approval/claim/', web_views.claim_articles, name='claim_articles'),
+    path('approval/bulk/', web_views.bulk_review, name='bulk_review'),
     path('approval/<int:pk>/', web_views.approval_detail, name='approval_detail'),
     path('approval/<int:pk>/approve/', web_views.approve_article, name='approve_article'),
     path('approval/<int:pk>/decline/', web_views.decline_article, name='decline_article'),
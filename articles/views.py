@@ -1,13 +1,37 @@
+from asgiref.sync import sync_to_async
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Article, Newsletter
-from .serializers import ArticleSerializer, NewsletterSerializer
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+from .models import Article, ClaimedByOther, InvalidTransition, Newsletter
+from .newsletters import queue_dispatch
+from .serializers import ArticleSerializer, ArticleSearchResultSerializer, NewsletterSerializer, ReviewQueueSerializer
 from users.permissions import IsJournalist, IsEditor, IsAuthorOrReadOnly
 from django.db.models import Q
-from .services import send_approval_notifications
+from .services import publish_article
+from .feed import areader_feed
+from .search import search_articles
+from .conditional import ConditionalGetMixin, article_scope, compute_validators, set_validators
+from .pagination import ArticleCursorPagination, InvalidCursor, paginate, parse_page_size
+from . import page_cache, popularity, review
+from news_app.db import write_transaction
+from news_app.fieldsets import Fieldset
+from news_app.streaming import StreamingListMixin
 
-class ArticleViewSet(viewsets.ModelViewSet):
+def visible_articles(user, queryset):
+    """Restrict ``queryset`` to the articles ``user`` may read through the API."""
+    if user.is_authenticated:
+        if user.is_editor():
+            return queryset
+        elif user.is_journalist():
+            return queryset.filter(Q(author=user) | Q(status=Article.Status.APPROVED))
+    return queryset.filter(status=Article.Status.APPROVED)
+
+
+class ArticleViewSet(ConditionalGetMixin, StreamingListMixin, viewsets.ModelViewSet):
     """
     API ViewSet for viewing and editing articles.
     
@@ -16,18 +40,49 @@ class ArticleViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ArticleSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = ArticleCursorPagination
+    # Served as compact summaries unless ?fields= / ?expand= ask for more
+    summary_actions = ('list', 'search', 'trending', 'queue', 'claim')
+    stream_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
-        user = self.request.user
-        if user.is_authenticated:
-            if user.is_editor():
-                return Article.objects.all()
-            elif user.is_journalist():
-                return Article.objects.filter(Q(author=user) | Q(approved=True))
-        return Article.objects.filter(approved=True)
+        return visible_articles(self.request.user, self.get_serializer().prepare_queryset(Article.objects.all()))
+
+    def list(self, request, *args, **kwargs):
+        keys, scope = article_scope(request.user)
+        return (
+            self.not_modified(request, keys, scope)
+            or self.streaming_list(request)
+            or super().list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        # One indexed lookup decides 304 before the full object is loaded
+        row = (
+            self.get_queryset().prefetch_related(None).filter(pk=kwargs['pk'])
+            .values_list('updated_at', 'author_id', 'publisher_id').first()
+        )
+        if row is not None:
+            updated_at, *sources = row
+            # The article is shown with its author's and publisher's names
+            sources = page_cache.source_keys(*sources)
+            not_modified = self.not_modified(
+                request, [('article', kwargs['pk']), *sources], updated_at.isoformat(), article_scope(request.user)[1],
+                last_modified=max(int(updated_at.timestamp()), page_cache.last_modified(*sources)),
+            )
+            if not_modified:
+                return not_modified
+        return super().retrieve(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        write_transaction(serializer.save)(author=self.request.user)
+
+    def perform_update(self, serializer):
+        article = serializer.instance
+        # A declined article the author revises goes back into the review queue
+        if article.author_id == self.request.user.pk and article.status == Article.Status.DECLINED:
+            article.transition(Article.Status.PENDING)
+        serializer.save()
 
     def get_permissions(self):
         if self.action == 'create':
@@ -41,61 +96,210 @@ class ArticleViewSet(viewsets.ModelViewSet):
             if self.request.user.is_authenticated and self.request.user.is_editor():
                  return [permissions.IsAuthenticated()]
             return [IsAuthorOrReadOnly()]
-        if self.action == 'approve':
+        if self.action in ['approve', 'queue', 'claim', 'release', 'bulk_approve', 'bulk_decline']:
             return [IsEditor()]
         return super().get_permissions()
 
     @action(detail=False, methods=['get'])
-    def subscribed(self, request):
+    def trending(self, request):
+        """
+        Approved articles ranked by recent views, most popular first.
+
+        Read from the ranking ``refresh_trending`` precomputes (see
+        ``articles.popularity``): a single page of up to ``TRENDING_SIZE``.
+        """
+        not_modified = self.not_modified(request, [('feed', 'trending')])
+        if not_modified:
+            return not_modified
+
+        page = self.paginator.paginate_page(
+            lambda cursor, page_size: popularity.trending_page(self.get_queryset(), page_size), request,
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], serializer_class=ArticleSearchResultSerializer)
+    def search(self, request):
         """
-        Return articles from publishers/journalists the user is subscribed to.
-        Only accessible by authenticated users.
+        Full-text search over articles visible to the caller, best match first.
+        Takes the query in ``?q=``.
         """
-        user = request.user
-        if not user.is_authenticated:
-            return Response({'detail': 'Authentication required.'}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        # Get subscribed publishers and journalists
-        # Use getattr with default empty queryset to avoid errors if fields don't exist yet or are None
-        subscribed_publishers = getattr(user, 'subscriptions_to_publishers', None)
-        subscribed_journalists = getattr(user, 'subscriptions_to_journalists', None)
-        
-        query = Q(approved=True) # Always filter by approved for readers
-        
-        conditions = Q()
-        if subscribed_publishers:
-            conditions |= Q(publisher__in=subscribed_publishers.all())
-        if subscribed_journalists:
-            conditions |= Q(author__in=subscribed_journalists.all())
-            
-        # If no subscriptions, return empty list or all? Requirement says "subscribed content".
-        # If no conditions added (no subscriptions), this returns empty.
-        if not conditions:
-             return Response([])
-
-        articles = Article.objects.filter(query & conditions)
-        serializer = self.get_serializer(articles, many=True)
-        return Response(serializer.data)
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'detail': 'A search query (?q=) is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = self.paginator.paginate_page(
+            lambda cursor, page_size: search_articles(query, request.user, cursor, page_size, self.get_queryset()), request,
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         article = self.get_object()
-        article.approved = True
-        article.approved_by = request.user
-        article.save()
-        
-        send_approval_notifications(article)
-        
+        try:
+            publish_article(article, request.user)
+        except (ClaimedByOther, InvalidTransition) as e:
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
         return Response({'status': 'article approved'})
 
-class NewsletterViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], serializer_class=ReviewQueueSerializer)
+    def queue(self, request):
+        """
+        Pending articles, oldest first. ``?publisher=<id>`` (or ``independent``) filters by publisher.
+        """
+        try:
+            publisher = review.parse_publisher(request.query_params.get('publisher'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = review.queue(publisher, self.get_queryset())
+        page = self.paginator.paginate_page(
+            lambda cursor, page_size: paginate(queryset, cursor, page_size, newest_first=False), request,
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'], serializer_class=ReviewQueueSerializer)
+    def claim(self, request):
+        """
+        Claim the next ``size`` pending articles (optionally for ``publisher``) for review.
+        Concurrent claims never return the same article; claims lapse after REVIEW_CLAIM_SECONDS.
+        """
+        try:
+            size = int(request.data.get('size') or 0)
+        except (TypeError, ValueError):
+            return Response({'detail': 'size must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            publisher = review.parse_publisher(request.data.get('publisher'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        claimed = review.claim_batch(request.user, size, publisher)
+        return Response(self.get_serializer(claimed, many=True).data)
+
+    @action(detail=False, methods=['post'])
+    def release(self, request):
+        """Give back the caller's claims on ``ids`` (or all of them)."""
+        ids = request.data.get('ids')
+        if ids is not None:
+            try:
+                ids = review.parse_ids(ids)
+            except ValueError as e:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'released': review.release(request.user, ids)})
+
+    @action(detail=False, methods=['post'])
+    def bulk_approve(self, request):
+        """Approve the articles in ``ids`` in one transaction, with one notification batch."""
+        return self._bulk_review(request, lambda ids: review.approve(request.user, ids), 'approved')
+
+    @action(detail=False, methods=['post'])
+    def bulk_decline(self, request):
+        """Decline the articles in ``ids`` in one transaction, with the given ``reason``."""
+        reason = str(request.data.get('reason') or '').strip()
+        return self._bulk_review(request, lambda ids: review.decline(request.user, ids, reason), 'declined')
+
+    def _bulk_review(self, request, act, done_key):
+        # A JSON list, or repeated ``ids`` form fields
+        ids = request.data.getlist('ids') if hasattr(request.data, 'getlist') else request.data.get('ids')
+        try:
+            ids = review.parse_ids(ids)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        result = act(ids)
+        return Response({done_key: result.done, 'skipped': {str(pk): why for pk, why in result.skipped.items()}})
+
+class NewsletterViewSet(ConditionalGetMixin, StreamingListMixin, viewsets.ModelViewSet):
     """
     API ViewSet for viewing and managing newsletters.
     Allows creation and retrieval of newsletters.
     """
     serializer_class = NewsletterSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    queryset = Newsletter.objects.all()
+    # Newsletters nest full articles, so article changes count too
+    validator_keys = [('collection', 'newsletters'), ('collection', 'articles')]
+
+    def get_queryset(self):
+        return self.get_serializer().prepare_queryset(Newsletter.objects.all())
+
+    def list(self, request, *args, **kwargs):
+        return (
+            self.not_modified(request, self.validator_keys)
+            or self.streaming_list(request)
+            or super().list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.not_modified(request, self.validator_keys) or super().retrieve(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def send(self, request, pk=None):
+        """
+        Queue the newsletter for emailing to its subscribers.
+        Only its author or an editor may send it, and only once.
+        """
+        newsletter = self.get_object()
+        if newsletter.author_id != request.user.pk and not request.user.is_editor():
+            return Response({'detail': 'Only the author or an editor can send this newsletter.'},
+                            status=status.HTTP_403_FORBIDDEN)
+        if queue_dispatch(newsletter) is None:
+            return Response({'detail': 'This newsletter has already been sent.'}, status=status.HTTP_409_CONFLICT)
+        return Response({'status': 'newsletter queued'}, status=status.HTTP_202_ACCEPTED)
+
+
+class SubscribedFeedPolicy(APIView):
+    """
+    The DRF policies :func:`subscribed_feed` applies: authentication,
+    permissions, throttling and content negotiation, as for any API view.
+    """
+    name = 'Subscribed articles'
+    permission_classes = [permissions.IsAuthenticated]
+
+
+@require_safe
+async def subscribed_feed(request):
+    """
+    Return articles from publishers/journalists the user is subscribed to.
+    Only accessible by authenticated users.
+
+    Served from the reader's materialized feed (see ``articles.feed``). DRF
+    views are sync only, so this is a plain async view that runs
+    ``SubscribedFeedPolicy``'s checks and renders its responses; the feed is
+    read through the async ORM, and only those checks, the validators and
+    serialization run in a worker thread. It takes the same ``cursor``,
+    ``page_size``, ``fields`` and ``expand`` parameters as the other lists.
+    """
+    policy = SubscribedFeedPolicy()
+    policy.args, policy.kwargs, policy.headers = (), {}, {}
+    api_request = policy.request = policy.initialize_request(request)
+    try:
+        await sync_to_async(policy.initial)(api_request)
+    except Exception as e:
+        return policy.finalize_response(api_request, policy.handle_exception(e))
+    user = api_request.user
+
+    # Any approval can reach the feed, and following or unfollowing changes it
+    validators = await sync_to_async(compute_validators)(
+        request, [('feed', 'home'), ('reader', user.pk)], f'reader:{user.pk}',
+    )
+    not_modified = get_conditional_response(request, etag=validators[0], last_modified=validators[1])
+    if not_modified:
+        return set_validators(not_modified, *validators)
+
+    fieldset = Fieldset.from_request(api_request, summary=True)
+    queryset = visible_articles(user, ArticleSerializer(fieldset=fieldset).prepare_queryset(Article.objects.all()))
+    try:
+        page = await areader_feed(
+            user, request.GET.get('cursor'), parse_page_size(request.GET.get('page_size')), queryset,
+        )
+    except InvalidCursor:
+        response = Response({'detail': 'Invalid cursor.'}, status=status.HTTP_404_NOT_FOUND)
+        return policy.finalize_response(api_request, response)
+    serializer = ArticleSerializer(page.items, many=True, fieldset=fieldset, context={'request': api_request})
+    next_url = None
+    if page.next_cursor is not None:
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', page.next_cursor)
+    data = {'next': next_url, 'results': await sync_to_async(lambda: serializer.data)()}
+    return set_validators(policy.finalize_response(api_request, Response(data)), *validators)
@@ -1,63 +1,174 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.exceptions import PermissionDenied
 from django.contrib import messages
-from .models import Article
+from .models import Article, ClaimedByOther, InvalidTransition
 from .forms import ArticleForm
-from .services import send_approval_notifications
+from .services import publish_article, record_decline
+from .pagination import afeed_page_context, page_context, paginate, parse_page_size
+from . import popularity, review
+from publications.models import Publisher
+from django.views.decorators.http import require_POST
+from django.urls import reverse
+from django.utils.http import urlencode
+from .search import search_articles
+from .page_cache import cached_page, attach_cached_cards, stats as page_cache_stats
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.conf import settings
+from django.utils import timezone
+from .conditional import conditional_page
+from news_app.db import write_transaction
 
 # Public Views
 def site_home(request):
     return render(request, 'index.html')
 
-def home(request):
-    articles = Article.objects.filter(approved=True).order_by('-created_at')
-    return render(request, 'articles/home.html', {'articles': articles, 'title': 'All News'})
+# The public feeds and article page are async views: under ASGI they read
+# the database through the async ORM instead of holding a worker thread.
+# Templates still render synchronously, since context processors load the
+# session and user.
 
-def independent_feed(request):
-    articles = Article.objects.filter(approved=True, publisher__isnull=True).order_by('-created_at')
-    return render(request, 'articles/home.html', {'articles': articles, 'title': 'Independent Journalism'})
+def _render_feed(request, context, title):
+    attach_cached_cards(request, context['articles'])
+    return render(request, 'articles/home.html', {**context, 'title': title})
 
-def publisher_feed(request):
-    articles = Article.objects.filter(approved=True, publisher__isnull=False).order_by('-created_at')
-    return render(request, 'articles/home.html', {'articles': articles, 'title': 'Publisher News'})
+@conditional_page(feed='home')
+@cached_page(feed='home')
+async def home(request):
+    articles = Article.objects.select_related('author', 'publisher').filter(status=Article.Status.APPROVED)
+    context = await afeed_page_context(request, articles)
+    return await sync_to_async(_render_feed)(request, context, 'All News')
 
-def article_detail(request, pk):
-    article = get_object_or_404(Article, pk=pk, approved=True)
-    return render(request, 'articles/article_detail.html', {'article': article})
+@conditional_page(feed='independent')
+@cached_page(feed='independent')
+async def independent_feed(request):
+    articles = Article.objects.select_related('author', 'publisher').filter(status=Article.Status.APPROVED, publisher__isnull=True)
+    context = await afeed_page_context(request, articles)
+    return await sync_to_async(_render_feed)(request, context, 'Independent Journalism')
+
+@conditional_page(feed='publishers')
+@cached_page(feed='publishers')
+async def publisher_feed(request):
+    articles = Article.objects.select_related('author', 'publisher').filter(status=Article.Status.APPROVED, publisher__isnull=False)
+    context = await afeed_page_context(request, articles)
+    return await sync_to_async(_render_feed)(request, context, 'Publisher News')
+
+@conditional_page(feed='trending')
+@cached_page(feed='trending')
+async def trending_feed(request):
+    # Read from the ranking refresh_trending precomputes
+    articles = Article.objects.select_related('author', 'publisher')
+    page = await popularity.atrending_page(articles, parse_page_size(request.GET.get('page_size')))
+    return await sync_to_async(_render_feed)(request, {'articles': page.items}, 'Trending')
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    context = {'articles': [], 'query': query}
+    if query:
+        context.update(page_context(
+            request, lambda cursor, page_size: search_articles(query, request.user, cursor, page_size),
+        ))
+    return render(request, 'articles/search.html', context)
+
+@popularity.counts_views('pk')
+@conditional_page(article_kwarg='pk')
+@cached_page(article_kwarg='pk')
+async def article_detail(request, pk):
+    article = await aget_object_or_404(
+        Article.objects.select_related('author', 'publisher', 'declined_by'), pk=pk, status=Article.Status.APPROVED,
+    )
+    return await sync_to_async(render)(request, 'articles/article_detail.html', {'article': article})
+
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse(page_cache_stats())
 
 # Editor Views
 def is_editor(user):
     return user.is_authenticated and user.is_editor()
 
+def _publisher_filter(value):
+    # A malformed filter shows the whole queue rather than failing
+    try:
+        return review.parse_publisher(value)
+    except ValueError:
+        return None
+
+def _queue_url(publisher):
+    url = reverse('approval_list')
+    return f'{url}?{urlencode({"publisher": publisher})}' if publisher else url
+
 @login_required
 @user_passes_test(is_editor)
 def approval_list(request):
-    articles = Article.objects.filter(approved=False)
-    return render(request, 'articles/approval_list.html', {'articles': articles})
+    """The review queue: pending articles oldest first, optionally for one publisher."""
+    publisher = _publisher_filter(request.GET.get('publisher'))
+    context = page_context(request, lambda cursor, page_size: paginate(
+        review.queue(publisher), cursor, page_size, newest_first=False,
+    ))
+    return render(request, 'articles/approval_list.html', {
+        **context,
+        'publisher': '' if publisher is None else str(publisher),
+        'publishers': Publisher.objects.order_by('title').only('pk', 'title'),
+        'now': timezone.now(),
+        'batch_limit': settings.REVIEW_BATCH_LIMIT,
+    })
+
+@login_required
+@user_passes_test(is_editor)
+@require_POST
+def claim_articles(request):
+    publisher = _publisher_filter(request.POST.get('publisher'))
+    claimed = review.claim_batch(request.user, publisher=publisher)
+    if claimed:
+        messages.success(request, f'Claimed {len(claimed)} article(s) for {settings.REVIEW_CLAIM_SECONDS // 60} minutes.')
+    else:
+        messages.info(request, 'Nothing left to claim.')
+    return redirect(_queue_url(publisher))
+
+@login_required
+@user_passes_test(is_editor)
+@require_POST
+def bulk_review(request):
+    publisher = _publisher_filter(request.POST.get('publisher'))
+    try:
+        ids = review.parse_ids(request.POST.getlist('article_ids'))
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect(_queue_url(publisher))
+
+    if request.POST.get('action') == 'decline':
+        result = review.decline(request.user, ids, request.POST.get('reason', '').strip())
+        messages.warning(request, f'Declined {len(result.done)} article(s).')
+    else:
+        result = review.approve(request.user, ids)
+        messages.success(request, f'Approved {len(result.done)} article(s); subscribers will be notified shortly.')
+    if result.skipped:
+        messages.info(request, f'Skipped {len(result.skipped)} article(s) already reviewed or claimed by another editor.')
+    return redirect(_queue_url(publisher))
 
 @login_required
 @user_passes_test(is_editor)
 def approval_detail(request, pk):
-    article = get_object_or_404(Article, pk=pk)
-    return render(request, 'articles/approval_detail.html', {'article': article})
+    article = get_object_or_404(Article.objects.select_related('author', 'publisher', 'claimed_by'), pk=pk)
+    return render(request, 'articles/approval_detail.html', {
+        'article': article, 'claimed_by_other': article.is_claimed_by_other(request.user),
+    })
 
 @login_required
 @user_passes_test(is_editor)
 def approve_article(request, pk):
     if request.method == 'POST':
         article = get_object_or_404(Article, pk=pk)
-        article.approved = True
-        article.approved_by = request.user
-        article.save()
-        
-        # Approval logic: Email + Twitter integration
+        # Subscriber email and Twitter post are queued and sent by process_outbox
         try:
-            send_approval_notifications(article)
-            messages.success(request, f'Article "{article.title}" approved and notifications sent.')
-        except Exception as e:
-            messages.warning(request, f'Article approved but notification failed: {str(e)}')
-            
+            publish_article(article, request.user)
+        except (ClaimedByOther, InvalidTransition) as e:
+            messages.error(request, str(e))
+            return redirect('approval_detail', pk=pk)
+        messages.success(request, f'Article "{article.title}" approved; subscribers will be notified shortly.')
         return redirect('approval_list')
     return redirect('approval_detail', pk=pk)
 
@@ -67,16 +178,15 @@ def decline_article(request, pk):
     article = get_object_or_404(Article, pk=pk)
     if request.method == 'POST':
         reason = request.POST.get('reason', '').strip()
-        article.approved = False
-        article.approved_by = None
-        article.declined_reason = reason
-        article.declined_by = request.user
-        from django.utils import timezone
-        article.declined_at = timezone.now()
-        article.save()
+        try:
+            record_decline(article, request.user, reason)
+        except (ClaimedByOther, InvalidTransition) as e:
+            messages.error(request, str(e))
+            return redirect('approval_detail', pk=pk)
         messages.warning(request, f'Article "{article.title}" declined.')
         return redirect('approval_list')
     return redirect('approval_detail', pk=pk)
+
 @login_required
 def create_article(request):
     if not request.user.is_journalist():
@@ -88,7 +198,7 @@ def create_article(request):
             article = form.save(commit=False)
             article.author = request.user
             # New articles might need approval, defaulting to False in model usually
-            article.save()
+            write_transaction(article.save)()
             messages.success(request, 'Article created successfully and submitted for approval.')
             # Redirect to home or maybe a "My Articles" page if we had one. 
             # For now, redirect to detail page (it might be visible if author or not approved?)
@@ -120,6 +230,9 @@ def edit_article(request, pk):
             # Assuming editors edits maintain approval, journalist edits might reset.
             # Let's keep it simple: if journalist edits, it might need re-approval if policy says so.
             # For now, we won't change approval status automatically unless requested.
+            # A declined article the author revises goes back into the review queue.
+            if article.author == request.user and article.status == Article.Status.DECLINED:
+                article.transition(Article.Status.PENDING)
             article.save()
             messages.success(request, 'Article updated successfully.')
             return redirect('article_detail', pk=article.pk)
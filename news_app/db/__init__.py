@@ -0,0 +1,235 @@
+"""
+Database routing and SQLite tuning.
+
+Read replicas with read-your-writes stickiness
+----------------------------------------------
+
+``DB_REPLICAS`` adds replicas of the ``default`` (primary) database as
+``replica1``, ``replica2``, ... and installs :class:`ReplicaRouter`:
+
+* writes always go to the primary;
+* reads go to a replica only in a GET/HEAD/OPTIONS request (feeds, article
+  pages, API reads), through one replica picked at random for the whole
+  request. Management commands, the outbox worker and other code outside a
+  request read from the primary;
+* inside a transaction on the primary (approvals, claims, the outbox),
+  and for the rest of a request after it has written, reads go to the
+  primary too;
+* a request that wrote pins its client to the primary for
+  ``DB_PRIMARY_PIN_SECONDS``, so it sees its own change even if the
+  replicas lag. Browsers get the ``db_primary`` cookie. API clients often
+  keep no cookies, so a request that sent an ``Authorization`` header also
+  pins those credentials server-side, in the cache. (The user is not known
+  yet when the middleware picks a replica, because DRF authenticates in
+  the view, so the credentials are used as the key.)
+
+Replicas are only read, so they do not inherit the primary's SQLite
+``transaction_mode``: ``BEGIN IMMEDIATE`` would take the write lock.
+
+With no replicas configured, everything uses ``default`` as before.
+
+SQLite under concurrent writes
+------------------------------
+SQLite allows one writer at a time. With its defaults, a writer also blocks
+readers, and a transaction that reads before it writes can fail at once
+with "database is locked" rather than wait. The ``concurrent`` profile
+(``SQLITE_PROFILE``) avoids both:
+
+* :func:`configure_sqlite` runs ``SQLITE_PRAGMAS`` on every new SQLite
+  connection: WAL journaling (readers no longer block on the writer),
+  ``synchronous=NORMAL`` (safe with WAL, one fsync per checkpoint instead
+  of per commit), a larger page cache and memory map, and a
+  ``busy_timeout`` so a writer waits for the lock;
+* transactions start with ``BEGIN IMMEDIATE`` (``transaction_mode``), so
+  the write lock is taken up front and waited for under ``busy_timeout``,
+  not requested half-way through;
+* :func:`write_transaction` retries a write that still finds the database
+  locked, after a jittered exponential backoff.
+
+``bench_sqlite`` measures throughput with and without the profile.
+"""
+import functools
+import hashlib
+import logging
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'db_primary'
+PIN_CACHE_PREFIX = 'db-pin'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+@dataclass
+class Routing:
+    """
+    Per-request routing state.
+
+    Attributes:
+        replica (str): Alias reads may use, or None for the primary only.
+        wrote (bool): The request has written to the primary.
+    """
+    replica: str | None = None
+    wrote: bool = False
+
+
+_routing = ContextVar('db_routing', default=None)
+
+
+def replica_databases(primary, locations):
+    """
+    ``DATABASES`` entries for replicas of ``primary``.
+
+    Each location is a file path for SQLite or ``host[:port]`` otherwise.
+    Test runs point the replicas at the test primary.
+    """
+    databases = {}
+    for i, location in enumerate(locations, 1):
+        if primary['ENGINE'].endswith('sqlite3'):
+            override = {'NAME': location}
+        else:
+            host, _, port = location.partition(':')
+            override = {'HOST': host, 'PORT': port or primary.get('PORT', '')}
+        if 'OPTIONS' in primary:
+            # Read-only: BEGIN IMMEDIATE would take SQLite's write lock
+            override['OPTIONS'] = {k: v for k, v in primary['OPTIONS'].items() if k != 'transaction_mode'}
+        databases[f'replica{i}'] = {**primary, **override, 'TEST': {'MIRROR': DEFAULT_DB_ALIAS}}
+    return databases
+
+
+class ReplicaRouter:
+    """Send reads to the request's replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or routing.replica is None or routing.wrote:
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction must see (and lock) the primary's rows
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db in settings.DATABASE_REPLICAS else None
+
+
+class PrimaryPinMiddleware:
+    """Choose where each request reads from, and pin clients that wrote to the primary."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        key = self.pin_key(request)
+        routing = self.start(request, key is not None and cache.get(key) is not None)
+        response = self.get_response(request)
+        if self.finish(routing, response) and key is not None:
+            cache.set(key, 1, settings.DB_PRIMARY_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        key = self.pin_key(request)
+        # The async ORM's worker threads inherit this context, and with it the routing
+        routing = self.start(request, key is not None and await cache.aget(key) is not None)
+        response = await self.get_response(request)
+        if self.finish(routing, response) and key is not None:
+            await cache.aset(key, 1, settings.DB_PRIMARY_PIN_SECONDS)
+        return response
+
+    @staticmethod
+    def pin_key(request):
+        # Cache key pinning the request's credentials, or None if it sent none
+        credentials = request.META.get('HTTP_AUTHORIZATION')
+        if not credentials or not settings.DATABASE_REPLICAS:
+            return None
+        return f'{PIN_CACHE_PREFIX}:{hashlib.sha256(credentials.encode()).hexdigest()}'
+
+    def start(self, request, pinned=False):
+        replicas = settings.DATABASE_REPLICAS
+        routing = Routing()
+        if replicas and request.method in READ_METHODS and not pinned and PIN_COOKIE not in request.COOKIES:
+            routing.replica = random.choice(replicas)
+        # Not reset afterwards: a streaming body is read after this returns
+        _routing.set(routing)
+        return routing
+
+    def finish(self, routing, response):
+        """Set the pin cookie if the request wrote; returns whether it did."""
+        if not (settings.DATABASE_REPLICAS and routing.wrote):
+            return False
+        response.set_cookie(
+            PIN_COOKIE, '1', max_age=settings.DB_PRIMARY_PIN_SECONDS, httponly=True, samesite='Lax',
+        )
+        return True
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply ``SQLITE_PRAGMAS`` to each new SQLite connection in the ``concurrent`` profile."""
+    if connection.vendor != 'sqlite' or settings.SQLITE_PROFILE != 'concurrent':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    """True for SQLite's "database is locked" / "database table is locked" errors."""
+    return isinstance(error, OperationalError) and 'locked' in str(error)
+
+
+def write_transaction(func=None, *, using=None):
+    """
+    Run the decorated function in a transaction on ``using`` and retry it,
+    up to ``SQLITE_WRITE_RETRIES`` times, if the database is locked.
+
+    The n-th retry waits a random time of up to ``SQLITE_RETRY_BACKOFF * 2**n``
+    seconds, so writers that collided do not collide again. Inside an
+    existing transaction the function just runs: only the outermost
+    transaction can be retried.
+    """
+    if func is None:
+        return functools.partial(write_transaction, using=using)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if connections[using or DEFAULT_DB_ALIAS].in_atomic_block:
+            return func(*args, **kwargs)
+        for attempt in range(settings.SQLITE_WRITE_RETRIES + 1):
+            try:
+                with transaction.atomic(using=using):
+                    return func(*args, **kwargs)
+            except OperationalError as e:
+                if not is_locked(e) or attempt == settings.SQLITE_WRITE_RETRIES:
+                    raise
+                delay = random.uniform(0, settings.SQLITE_RETRY_BACKOFF * 2 ** attempt)
+                logger.info('%s: database locked, retry %s in %.3fs', func.__qualname__, attempt + 1, delay)
+                time.sleep(delay)
+    return wrapper
@@ -0,0 +1,190 @@
+"""
+Sparse fieldsets for API serializers.
+
+Clients choose what each object contains with two query parameters:
+
+* ``?fields=id,title,author.username`` keeps only the named fields; a
+  dotted name selects inside a nested object, expanding it;
+* ``?expand=author,publisher_detail.editors`` renders the named relations
+  as nested objects.
+
+List actions default to each serializer's compact ``Meta.summary_fields``,
+where relations are plain primary keys. Other actions default to the full
+representation, with every relation nested. The selection also shapes the
+query: :meth:`SparseFieldsetMixin.prepare_queryset` loads only the selected
+columns, and joins or prefetches only the relations that are rendered.
+"""
+from dataclasses import dataclass, field
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _names(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+@dataclass
+class Fieldset:
+    """
+    What one serializer (and, through ``expand``, its nested ones) renders.
+
+    Attributes:
+        fields (set): Field names to keep, or None for the default set.
+        expand (dict): Relation name -> the nested object's :class:`Fieldset`.
+        summary (bool): Default to ``Meta.summary_fields`` rather than every field.
+    """
+    fields: set | None = None
+    expand: dict = field(default_factory=dict)
+    summary: bool = False
+
+    @classmethod
+    def parse(cls, fields='', expand='', summary=False):
+        root = cls(summary=summary)
+        for path in _names(fields):
+            *parents, leaf = path.split('.')
+            node = root
+            for name in parents:
+                node.fields = (node.fields or set()) | {name}
+                node = node.expand.setdefault(name, cls(summary=summary))
+            node.fields = (node.fields or set()) | {leaf}
+        for path in _names(expand):
+            node = root
+            for name in path.split('.'):
+                node = node.expand.setdefault(name, cls(summary=summary))
+        return root
+
+    @classmethod
+    def from_request(cls, request, summary=False):
+        # Writes always validate and echo the full representation
+        if request is None or request.method not in SAFE_METHODS:
+            return cls()
+        params = request.query_params
+        return cls.parse(params.get('fields'), params.get('expand'), summary)
+
+    def child(self, name):
+        return self.expand.get(name) or type(self)(summary=self.summary)
+
+
+class SparseFieldsetMixin:
+    """
+    ``ModelSerializer`` mixin applying a :class:`Fieldset`.
+
+    The fieldset is passed as ``fieldset=`` or read from the request in the
+    serializer context, in summary mode for the view's ``summary_actions``
+    (default ``('list',)``). ``Meta`` options:
+
+    * ``summary_fields``: the compact representation;
+    * ``expandable``: ``{name: serializer class}`` of relations that are
+      nested only when expanded (or in the full representation); otherwise
+      they render as primary keys if listed in ``summary_fields``;
+    * ``field_sources``: ``{name: [model fields]}`` for fields whose columns
+      cannot be told from their ``source``, such as method fields.
+    """
+
+    def __init__(self, *args, fieldset=None, **kwargs):
+        self._fieldset = fieldset
+        super().__init__(*args, **kwargs)
+
+    @property
+    def fieldset(self):
+        if self._fieldset is None:
+            view = self.context.get('view')
+            summary = getattr(view, 'action', None) in getattr(view, 'summary_actions', ('list',))
+            self._fieldset = Fieldset.from_request(self.context.get('request'), summary)
+        return self._fieldset
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.fieldset
+        summary_fields = getattr(self.Meta, 'summary_fields', None)
+        expandable = getattr(self.Meta, 'expandable', {})
+        if fieldset.fields is not None:
+            names = [name for name in fields if name in fieldset.fields]
+        elif fieldset.summary and summary_fields is not None:
+            names = [name for name in fields if name in summary_fields or name in fieldset.expand]
+        else:
+            names = list(fields)
+
+        selected = {}
+        for name in names:
+            if name not in expandable:
+                selected[name] = fields[name]
+            elif name in fieldset.expand or not fieldset.summary:
+                selected[name] = self._nested(name, fields[name], expandable[name], fieldset.child(name))
+            else:
+                selected[name] = self._primary_keys(name, fields[name])
+        return selected
+
+    @staticmethod
+    def _nested(name, declared, serializer_class, fieldset):
+        kwargs = {'read_only': True, 'fieldset': fieldset}
+        if isinstance(declared, serializers.ListSerializer):
+            kwargs['many'] = True
+        if declared.source and declared.source != name:
+            kwargs['source'] = declared.source
+        if not issubclass(serializer_class, SparseFieldsetMixin):
+            del kwargs['fieldset']
+        return serializer_class(**kwargs)
+
+    @staticmethod
+    def _primary_keys(name, declared):
+        kwargs = {'read_only': True}
+        if isinstance(declared, serializers.ListSerializer):
+            kwargs['many'] = True
+        if declared.source and declared.source != name:
+            kwargs['source'] = declared.source
+        return serializers.PrimaryKeyRelatedField(**kwargs)
+
+    def prepare_queryset(self, queryset):
+        """``queryset`` loading just what this serializer renders."""
+        return prepare_queryset(self, queryset)
+
+
+def prepare_queryset(serializer, queryset):
+    """
+    Restrict ``queryset`` to the columns ``serializer`` reads, joining its
+    nested objects and prefetching its nested lists (in turn restricted).
+    """
+    only, related, prefetches = _plan(serializer, '')
+    queryset = queryset.only(*only).prefetch_related(*prefetches)
+    # select_related() without arguments would follow every foreign key
+    return queryset.select_related(*related) if related else queryset
+
+
+def _plan(serializer, prefix):
+    model = serializer.Meta.model
+    field_sources = getattr(serializer.Meta, 'field_sources', {})
+    only, related, prefetches = {prefix + model._meta.pk.name}, [], []
+    for name, serializer_field in serializer.fields.items():
+        if name in field_sources:
+            only.update(prefix + source for source in field_sources[name])
+            continue
+        if serializer_field.source == '*' or not serializer_field.source_attrs:
+            continue
+        attr = serializer_field.source_attrs[0]
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            # A property or annotation; whatever it reads must be in field_sources
+            continue
+        nested = getattr(serializer_field, 'child', None) or getattr(serializer_field, 'child_relation', None)
+        nested = nested or serializer_field
+        if model_field.many_to_many or model_field.one_to_many:
+            related_model = model_field.related_model
+            if isinstance(nested, serializers.ModelSerializer):
+                lookup = prepare_queryset(nested, related_model.objects.all())
+            else:
+                lookup = related_model.objects.only(related_model._meta.pk.name)
+            prefetches.append(Prefetch(prefix + attr, queryset=lookup))
+        elif model_field.is_relation and isinstance(nested, serializers.ModelSerializer):
+            related.append(prefix + attr)
+            nested_only, nested_related, nested_prefetches = _plan(nested, f'{prefix}{attr}__')
+            only |= nested_only
+            related += nested_related
+            prefetches += nested_prefetches
+        else:
+            only.add(prefix + attr)
+    return only, related, prefetches
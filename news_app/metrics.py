@@ -0,0 +1,251 @@
+"""
+In-process request metrics in the Prometheus text format.
+
+``MetricsMiddleware`` records, for a sample of requests (``METRICS_SAMPLE_RATE``),
+latency, SQL query count and SQL time (via ``connection.execute_wrapper``)
+and response size, labelled by URL name or, for DRF viewsets, by
+``ViewSet.action``. The page cache's hit/miss counters are exported too.
+``metrics_view`` serves everything at ``/metrics/`` to staff users and to
+the addresses in ``METRICS_ALLOWED_IPS`` (none unless configured).
+
+Metrics live in process memory, so each worker process exposes its own;
+scrape every worker, or aggregate with a sidecar. With sampling off the
+middleware costs one settings lookup per request.
+"""
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from articles import page_cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames):
+        self.name, self.help, self.labelnames = name, help_text, labelnames
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def expose(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in sorted(self.values.items()):
+            yield f'{self.name}{{{_labels(self.labelnames, labels)}}} {value}'
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames, buckets):
+        self.name, self.help, self.labelnames, self.buckets = name, help_text, labelnames, buckets
+        # labels -> [count per bucket..., +Inf count, sum]
+        self.values = {}
+
+    def observe(self, labels, value):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-1] += value
+
+    def expose(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, series in sorted(self.values.items()):
+            label_text = _labels(self.labelnames, labels)
+            cumulative = 0
+            for bound, n in zip((*self.buckets, '+Inf'), series):
+                cumulative += n
+                yield f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}'
+            yield f'{self.name}_sum{{{label_text}}} {series[-1]}'
+            yield f'{self.name}_count{{{label_text}}} {cumulative}'
+
+
+class Registry:
+    """The process's metrics. All updates for one request happen under one lock."""
+    labelnames = ('view', 'method')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._create()
+
+    def _create(self):
+        self.requests = Counter('http_requests_total', 'Sampled requests.', ('view', 'method', 'status'))
+        self.latency = Histogram(
+            'http_request_duration_seconds', 'Request latency.', self.labelnames, LATENCY_BUCKETS,
+        )
+        self.queries = Histogram('http_request_db_queries', 'SQL queries per request.', self.labelnames, QUERY_BUCKETS)
+        self.db_time = Histogram(
+            'http_request_db_duration_seconds', 'Time spent in SQL per request.', self.labelnames, LATENCY_BUCKETS,
+        )
+        self.size = Histogram(
+            'http_response_size_bytes', 'Response body size (non-streaming responses).', self.labelnames, SIZE_BUCKETS,
+        )
+
+    def record(self, view, method, status, elapsed, queries, db_time, size):
+        labels = (view, method)
+        with self.lock:
+            self.requests.inc((view, method, str(status)))
+            self.latency.observe(labels, elapsed)
+            self.queries.observe(labels, queries)
+            self.db_time.observe(labels, db_time)
+            if size is not None:
+                self.size.observe(labels, size)
+
+    def expose(self):
+        with self.lock:
+            lines = [
+                line
+                for metric in (self.requests, self.latency, self.queries, self.db_time, self.size)
+                for line in metric.expose()
+            ]
+        return lines
+
+    def reset(self):
+        with self.lock:
+            self._create()
+
+
+registry = Registry()
+
+
+class QueryTimer:
+    """``execute_wrapper`` that counts queries and the time spent in them."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def install(self):
+        """Wrap this thread's connections. Closing the returned stack removes the wrapper."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+
+
+def view_label(request, view_func):
+    """``ViewSet.action`` for DRF viewsets, else the URL name."""
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{view_func.cls.__name__}.{action}'
+    match = request.resolver_match
+    return (match.view_name if match else None) or getattr(view_func, '__name__', 'unknown')
+
+
+def _sampled():
+    rate = settings.METRICS_SAMPLE_RATE
+    return bool(rate) and (rate >= 1 or random.random() < rate)
+
+
+class MetricsMiddleware:
+    """
+    Record sampled request metrics into :data:`registry`. Should be first in ``MIDDLEWARE``.
+
+    Under ASGI the view is awaited and timed on the event loop. Its async ORM
+    calls run in the request's sync thread, so only installing the query
+    timer on that thread's connections is handed to it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not _sampled():
+            return self.get_response(request)
+        request._metrics_view = 'unresolved'
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with timer.install():
+            response = self.get_response(request)
+        return self.record(request, response, timer, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not _sampled():
+            return await self.get_response(request)
+        request._metrics_view = 'unresolved'
+        timer = QueryTimer()
+        installed = await sync_to_async(timer.install)()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            installed.close()
+        return self.record(request, response, timer, time.perf_counter() - started)
+
+    def record(self, request, response, timer, elapsed):
+        registry.record(
+            request._metrics_view, request.method, response.status_code,
+            elapsed, timer.queries, timer.seconds,
+            None if response.streaming else len(response.content),
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, '_metrics_view'):
+            request._metrics_view = view_label(request, view_func)
+
+
+def _page_cache_lines():
+    stats = page_cache.stats()
+    lines = []
+    for event in ('hits', 'misses', 'coalesced', 'lock_timeouts', 'invalidations'):
+        lines += [
+            f'# HELP page_cache_{event}_total Page cache {event.replace("_", " ")}.',
+            f'# TYPE page_cache_{event}_total counter',
+            f'page_cache_{event}_total {stats.get(event, 0)}',
+        ]
+    lines += [
+        '# HELP page_cache_hit_ratio Page cache hits over lookups since the process started.',
+        '# TYPE page_cache_hit_ratio gauge',
+        f'page_cache_hit_ratio {stats["hit_ratio"]}',
+    ]
+    return lines
+
+
+def metrics_view(request):
+    """Prometheus exposition, for staff users and internal addresses only."""
+    internal = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if not internal and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden('Forbidden')
+    lines = registry.expose() + _page_cache_lines()
+    return HttpResponse('\n'.join(lines) + '\n', content_type=CONTENT_TYPE)
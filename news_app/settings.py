@@ -14,6 +14,8 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from news_app.db import replica_databases
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -52,6 +54,8 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
+    'news_app.metrics.MetricsMiddleware',
+    'news_app.db.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,6 +77,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'users.context_processors.subscriptions',
             ],
         },
     },
@@ -95,6 +100,63 @@ DATABASES = {
     }
 }
 
+# SQLite tuning (see news_app/db)
+# SQLITE_PROFILE=concurrent (the default) gives every SQLite connection WAL
+# journaling, the pragmas below and BEGIN IMMEDIATE transactions, so
+# concurrent writers wait up to SQLITE_BUSY_TIMEOUT_MS for the write lock
+# rather than fail with "database is locked". A write that still finds it
+# locked is retried up to SQLITE_WRITE_RETRIES times, with jittered backoff
+# starting at SQLITE_RETRY_BACKOFF seconds. SQLITE_PROFILE=default keeps
+# SQLite's own settings.
+
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'concurrent')
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    # Negative: KiB rather than pages
+    'cache_size': -int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000')),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    'temp_store': 'MEMORY',
+}
+
+if SQLITE_PROFILE == 'concurrent' and DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    DATABASES['default'].setdefault('OPTIONS', {})['transaction_mode'] = 'IMMEDIATE'
+
+SQLITE_WRITE_RETRIES = int(os.getenv('SQLITE_WRITE_RETRIES', '5'))
+
+SQLITE_RETRY_BACKOFF = float(os.getenv('SQLITE_RETRY_BACKOFF', '0.05'))
+
+# Read replicas (see news_app/db)
+# DB_REPLICAS is a comma-separated list of replicas of the database above:
+# host[:port] for server databases, or file paths for SQLite. GET requests
+# read from one of them. Writes, transactions, and the reads of a client
+# that wrote in the last DB_PRIMARY_PIN_SECONDS go to the primary.
+
+DATABASES.update(replica_databases(
+    DATABASES['default'], [r.strip() for r in os.getenv('DB_REPLICAS', '').split(',') if r.strip()],
+))
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['news_app.db.ReplicaRouter']
+
+DB_PRIMARY_PIN_SECONDS = int(os.getenv('DB_PRIMARY_PIN_SECONDS', '10'))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The in-process default suits a single server; point CACHE_BACKEND and
+# CACHE_LOCATION at a shared cache (e.g. Redis) when running several.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -136,3 +198,127 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Subscription feeds
+# Publishers and journalists with more subscribers than this are merged into
+# readers' feeds at read time instead of being copied into every feed when an
+# article is approved. FEED_BACKFILL_LIMIT caps how many past articles are
+# copied per source when a reader follows it.
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', '5000'))
+
+FEED_BACKFILL_LIMIT = int(os.getenv('FEED_BACKFILL_LIMIT', '200'))
+
+
+# Notification outbox (see articles/outbox.py)
+# A failed delivery is retried after OUTBOX_BACKOFF_BASE * 2**(attempt - 1)
+# seconds, capped at OUTBOX_BACKOFF_MAX, and dead-lettered after
+# OUTBOX_MAX_ATTEMPTS attempts. A claimed message that is neither done nor
+# failed after OUTBOX_LEASE_SECONDS (e.g. the worker crashed) is retried;
+# newsletter dispatches renew the lease after every chunk they send.
+
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+
+OUTBOX_BACKOFF_BASE = int(os.getenv('OUTBOX_BACKOFF_BASE', '30'))
+
+OUTBOX_BACKOFF_MAX = int(os.getenv('OUTBOX_BACKOFF_MAX', '3600'))
+
+OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', '300'))
+
+
+# Email
+# Bulk notifications send one message per recipient, handing them to the
+# mail backend EMAIL_CHUNK_SIZE at a time over a single connection.
+
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'news@example.com')
+
+EMAIL_CHUNK_SIZE = int(os.getenv('EMAIL_CHUNK_SIZE', '500'))
+
+
+# Search
+# 'auto' uses SQLite's FTS5 index on SQLite and the portable inverted index
+# (articles.search.InvertedIndexBackend) on other databases. Set a dotted
+# path to force a specific backend.
+
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+
+
+# Page cache (see articles/page_cache.py)
+# Rendered public pages are kept for PAGE_CACHE_TIMEOUT seconds at most;
+# normally they are replaced sooner, when an article change bumps their
+# generation. A request that finds another one rendering the same page waits
+# up to PAGE_CACHE_LOCK_WAIT seconds for it before rendering on its own.
+
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '600'))
+
+PAGE_CACHE_LOCK_TIMEOUT = int(os.getenv('PAGE_CACHE_LOCK_TIMEOUT', '10'))
+
+PAGE_CACHE_LOCK_WAIT = float(os.getenv('PAGE_CACHE_LOCK_WAIT', '2'))
+
+
+# Subscription graph (see users/subscriptions.py)
+# Followed/follower ID sets are cached for SUBSCRIPTION_CACHE_TIMEOUT seconds;
+# changes are written through, so this only bounds how long unused entries
+# stay in the cache.
+
+SUBSCRIPTION_CACHE_TIMEOUT = int(os.getenv('SUBSCRIPTION_CACHE_TIMEOUT', '86400'))
+
+
+# Metrics (see news_app/metrics.py)
+# Share of requests whose latency, SQL and response size are recorded, from
+# 0 (off) to 1 (every request). /metrics/ is served to staff users and to
+# the comma-separated METRICS_ALLOWED_IPS, which is empty unless set.
+
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '0'))
+
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+
+
+# Streaming API responses (see news_app/streaming.py)
+# ?stream=json / ?stream=ndjson list endpoints read and send STREAM_CHUNK_SIZE
+# rows at a time.
+
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', '500'))
+
+
+# Review queue (see articles/review.py)
+# "Claim next" reserves REVIEW_CLAIM_BATCH pending articles for an editor;
+# the claim lapses after REVIEW_CLAIM_SECONDS, returning them to the queue.
+# Claims and bulk approve/decline handle at most REVIEW_BATCH_LIMIT articles
+# per request.
+
+REVIEW_CLAIM_SECONDS = int(os.getenv('REVIEW_CLAIM_SECONDS', '900'))
+
+REVIEW_CLAIM_BATCH = int(os.getenv('REVIEW_CLAIM_BATCH', '10'))
+
+REVIEW_BATCH_LIMIT = int(os.getenv('REVIEW_BATCH_LIMIT', '100'))
+
+
+# View counts and trending (see articles/popularity.py)
+# Article page views are buffered in each server process and written out by
+# a background thread every VIEW_FLUSH_SECONDS, or sooner once
+# VIEW_BUFFER_SIZE article-hours are pending (without that thread, the
+# request that fills the buffer writes it). refresh_trending ranks articles by their views over the last
+# TRENDING_WINDOW_HOURS, halving an hour's weight every
+# TRENDING_HALF_LIFE_HOURS, keeps the top TRENDING_SIZE and recomputes the
+# ranking every TRENDING_REFRESH_SECONDS.
+
+VIEW_FLUSH_SECONDS = int(os.getenv('VIEW_FLUSH_SECONDS', '30'))
+
+VIEW_BUFFER_SIZE = int(os.getenv('VIEW_BUFFER_SIZE', '1000'))
+
+TRENDING_WINDOW_HOURS = int(os.getenv('TRENDING_WINDOW_HOURS', '48'))
+
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', '6'))
+
+TRENDING_SIZE = int(os.getenv('TRENDING_SIZE', '100'))
+
+TRENDING_REFRESH_SECONDS = int(os.getenv('TRENDING_REFRESH_SECONDS', '300'))
+
+
+# Tests
+# Tests tagged "slow" (e.g. emailing 100,000 subscribers) only run with
+# `manage.py test --tag slow`.
+
+TEST_RUNNER = 'news_app.testing.TestRunner'
@@ -0,0 +1,108 @@
+"""
+Streaming JSON for large API collections.
+
+``?stream=json`` (or ``?stream=ndjson``, or ``Accept: application/x-ndjson``,
+which selects :class:`NDJSONRenderer`) on a list endpoint returns the whole collection unpaginated, as a
+``StreamingHttpResponse``. Rows are read with ``.iterator(chunk_size=STREAM_CHUNK_SIZE)``
+(a server-side cursor where the database has one) and each chunk is
+serialized and sent before the next is fetched. Memory therefore stays flat
+whatever the collection size, and the first bytes go out as soon as the
+first chunk is read.
+
+A JSON stream is a single array, written ``[``, items, ``]``. NDJSON puts one
+object per line. Once streaming has started, the status code can no longer
+change, so an error part-way through cuts the body short. Clients see that
+as invalid JSON, or as a missing final newline in NDJSON.
+"""
+import logging
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from articles.mailing import chunked
+
+logger = logging.getLogger(__name__)
+
+NDJSON = 'application/x-ndjson'
+FORMATS = {'json': 'application/json', 'ndjson': NDJSON}
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON, one object per line.
+
+    Lists stream through :class:`StreamingListMixin`. When this renderer is
+    used for an ordinary response, a page renders its ``results`` and a
+    single object renders as one line.
+    """
+    media_type = NDJSON
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and isinstance(data.get('results'), list):
+            data = data['results']
+        rows = data if isinstance(data, list) else [data]
+        encode = JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        return ''.join(encode(row) + '\n' for row in rows).encode()
+
+
+def stream_format(request):
+    """``'json'``, ``'ndjson'`` or None (not streamed) for ``request``."""
+    requested = request.query_params.get('stream')
+    if requested in ('1', 'true'):
+        return 'json'
+    if requested in FORMATS:
+        return requested
+    if getattr(request, 'accepted_renderer', None) and request.accepted_renderer.format == 'ndjson':
+        return 'ndjson'
+    return None
+
+
+def encode_rows(rows, serializer, fmt, chunk_size):
+    """Yield ``rows`` serialized by ``serializer`` as JSON-array or NDJSON text, one chunk at a time."""
+    encode = JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    try:
+        if fmt == 'ndjson':
+            for chunk in chunked(rows, chunk_size):
+                yield ''.join(encode(serializer.to_representation(row)) + '\n' for row in chunk)
+            return
+        yield '['
+        separator = ''
+        for chunk in chunked(rows, chunk_size):
+            yield separator + ','.join(encode(serializer.to_representation(row)) for row in chunk)
+            separator = ','
+        yield ']'
+    except Exception:
+        logger.exception('Streaming %s response failed part-way', fmt)
+        raise
+
+
+class StreamingListMixin:
+    """
+    ViewSet mixin adding the streaming mode to ``list``.
+
+    ``stream_ordering`` sets the order rows are streamed in; the serializer
+    is the view's own, so ``?fields=`` and ``?expand=`` apply as usual.
+    """
+    stream_ordering = ('pk',)
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+    def streaming_list(self, request):
+        """A streaming response for ``request``, or None if streaming was not asked for."""
+        fmt = stream_format(request)
+        if fmt is None:
+            return None
+        chunk_size = settings.STREAM_CHUNK_SIZE
+        queryset = self.filter_queryset(self.get_queryset()).order_by(*self.stream_ordering)
+        serializer = self.get_serializer()
+        response = StreamingHttpResponse(
+            encode_rows(queryset.iterator(chunk_size=chunk_size), serializer, fmt, chunk_size),
+            content_type=FORMATS[fmt],
+        )
+        # Stop proxies such as nginx from buffering the whole body
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
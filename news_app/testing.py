@@ -0,0 +1,48 @@
+"""
+Shared test helpers.
+"""
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+
+
+class TestRunner(DiscoverRunner):
+    """Leaves out tests tagged ``slow`` unless they are asked for with ``--tag slow``."""
+
+    def __init__(self, *args, tags=None, exclude_tags=None, **kwargs):
+        if 'slow' not in (tags or ()):
+            exclude_tags = {*(exclude_tags or ()), 'slow'}
+        super().__init__(*args, tags=tags, exclude_tags=exclude_tags, **kwargs)
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin that guards endpoints against N+1 regressions.
+
+    ``assertQueryBudget`` requests ``url`` twice, calling ``grow`` in between
+    to add more rows, and fails if the second request ran more queries than
+    the first. The rows count as committed, so caches they invalidate are
+    invalidated. An optional ``max_queries`` also pins the absolute budget so a
+    change that adds a fixed extra query is noticed too.
+    """
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, f'{url} returned {response.status_code}')
+        return len(ctx.captured_queries)
+
+    def assertQueryBudget(self, url, grow, max_queries=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            grow()
+        baseline = self.count_queries(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            grow()
+        grown = self.count_queries(url)
+        self.assertEqual(
+            baseline, grown,
+            f'{url} ran {baseline} queries before and {grown} after adding rows; '
+            'the query count must not depend on the number of rows.',
+        )
+        if max_queries is not None:
+            self.assertLessEqual(grown, max_queries, f'{url} exceeded its budget of {max_queries} queries.')
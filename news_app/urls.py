@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from articles.views import ArticleViewSet, NewsletterViewSet
+from articles.views import ArticleViewSet, NewsletterViewSet, subscribed_feed
 from publications.views import PublisherViewSet
 
 router = DefaultRouter()
@@ -11,13 +11,16 @@ router.register(r'publishers', PublisherViewSet)
 
 from rest_framework.authtoken import views
 from articles import web_views
+from news_app.metrics import metrics_view
 
 urlpatterns = [
     path('', web_views.site_home, name='site_home'),
     path('admin/', admin.site.urls),
     path('accounts/', include('users.urls')),
     path('articles/', include('articles.urls')),
+    path('api/articles/subscribed/', subscribed_feed, name='article-subscribed'),
     path('api/', include(router.urls)),
     path('api-auth/', include('rest_framework.urls')),
     path('api/token/', views.obtain_auth_token),
+    path('metrics/', metrics_view, name='metrics'),
 ]
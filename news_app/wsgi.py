@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'news_app.settings')
 
 application = get_wsgi_application()
+
+# Write the article views counted by this server process in the background
+from articles.popularity import start_background_flush  # noqa: E402
+
+start_background_flush()
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publisher',
+            name='article_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='pending_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='subscriber_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,7 +1,16 @@
 from django.db import models
 from django.conf import settings
 
-class Publisher(models.Model):
+from users.models import StoredCountersMixin
+
+
+class PublisherQuerySet(models.QuerySet):
+    def with_staff(self):
+        """Prefetch the editors and journalists that PublisherSerializer nests."""
+        return self.prefetch_related('editors', 'journalists')
+
+
+class Publisher(StoredCountersMixin, models.Model):
     """
     Represents a media publisher or organization.
     
@@ -10,12 +19,22 @@ class Publisher(models.Model):
         description (str): Description of the publisher.
         editors (ManyToManyField): Editors associated with this publisher.
         journalists (ManyToManyField): Journalists working for this publisher.
+        subscriber_count (int): Readers following the publisher.
+        article_count (int): Approved articles.
+        pending_count (int): Articles waiting for review.
+
+    The counts are kept up to date by ``articles.counters``.
     """
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     editors = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='publisher_editors', blank=True)
     journalists = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='publisher_journalists', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    subscriber_count = models.IntegerField(default=0, editable=False)
+    article_count = models.IntegerField(default=0, editable=False)
+    pending_count = models.IntegerField(default=0, editable=False)
+
+    objects = PublisherQuerySet.as_manager()
 
     def __str__(self):
         return self.title
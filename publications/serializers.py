@@ -1,10 +1,13 @@
 from rest_framework import serializers
 from .models import Publisher
 from users.serializers import UserSerializer
+from news_app.fieldsets import SparseFieldsetMixin
 
-class PublisherSerializer(serializers.ModelSerializer):
+class PublisherSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for the Publisher model.
+    Summaries leave out the staff lists; ``?expand=editors,journalists`` adds them.
+    The counts are stored columns (see ``articles.counters``), so they cost no queries.
     """
     editors = UserSerializer(many=True, read_only=True)
     journalists = UserSerializer(many=True, read_only=True)
@@ -12,3 +15,5 @@ class PublisherSerializer(serializers.ModelSerializer):
     class Meta:
         model = Publisher
         fields = '__all__'
+        summary_fields = ['id', 'title', 'description', 'created_at', 'subscriber_count', 'article_count']
+        expandable = {'editors': UserSerializer, 'journalists': UserSerializer}
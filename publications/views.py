@@ -2,8 +2,9 @@ from rest_framework import viewsets, permissions
 from .models import Publisher
 from .serializers import PublisherSerializer
 from users.permissions import IsEditor
+from news_app.streaming import StreamingListMixin
 
-class PublisherViewSet(viewsets.ModelViewSet):
+class PublisherViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """
     API ViewSet for viewing and managing publishers.
     Editors can create/update publishers; others can read only.
@@ -12,6 +13,13 @@ class PublisherViewSet(viewsets.ModelViewSet):
     serializer_class = PublisherSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        # Staff lists are only prefetched when they are rendered
+        return self.get_serializer().prepare_queryset(super().get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        return self.streaming_list(request) or super().list(request, *args, **kwargs)
+
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsEditor()]
@@ -0,0 +1,31 @@
+"""
+Template context processors for the users app.
+"""
+from django.utils.functional import SimpleLazyObject
+
+from . import subscriptions as subscription_graph
+
+
+def followed_ids(request):
+    """
+    Return ``(journalist_ids, publisher_ids)`` the current user follows.
+
+    Read from the subscription graph once per request and kept on it, so
+    templates can test membership for every card on a page without a query
+    per card. Anonymous users follow nothing.
+    """
+    if not hasattr(request, '_followed_ids'):
+        user = request.user
+        if user.is_authenticated:
+            request._followed_ids = subscription_graph.followed_ids(user.pk)
+        else:
+            request._followed_ids = (subscription_graph.IdSet(), subscription_graph.IdSet())
+    return request._followed_ids
+
+
+def subscriptions(request):
+    """Expose ``followed_journalist_ids`` and ``followed_publisher_ids`` to templates, evaluated lazily."""
+    return {
+        'followed_journalist_ids': SimpleLazyObject(lambda: followed_ids(request)[0]),
+        'followed_publisher_ids': SimpleLazyObject(lambda: followed_ids(request)[1]),
+    }
@@ -2,14 +2,17 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
 from articles.models import Article, Newsletter
+from users import roles
 
 class Command(BaseCommand):
     help = 'Setup user roles and permissions'
 
     def handle(self, *args, **kwargs):
         try:
-            article_ct = ContentType.objects.get_for_model(Article)
-            newsletter_ct = ContentType.objects.get_for_model(Newsletter)
+            content_types = {
+                'articles': ContentType.objects.get_for_model(Article),
+                'newsletters': ContentType.objects.get_for_model(Newsletter),
+            }
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error getting content types: {e}. Make sure migrations are applied.'))
             return
@@ -29,28 +32,29 @@ class Command(BaseCommand):
             }
         }
 
+        # Every permission any role needs, fetched in one query
+        permissions = {
+            (perm.content_type_id, perm.codename): perm
+            for perm in Permission.objects.filter(content_type__in=content_types.values())
+        }
+
         for role_name, perms_map in roles_permissions.items():
             group, created = Group.objects.get_or_create(name=role_name)
             if created:
                 self.stdout.write(self.style.SUCCESS(f'Created group {role_name}'))
-            
-            # Clear existing permissions to ensure exact match
-            group.permissions.clear()
-
-            # Articles permissions
-            for codename in perms_map.get('articles', []):
-                try:
-                    perm = Permission.objects.get(codename=codename, content_type=article_ct)
-                    group.permissions.add(perm)
-                except Permission.DoesNotExist:
-                    self.stdout.write(self.style.ERROR(f'Permission {codename} not found for Article'))
-
-            # Newsletters permissions
-            for codename in perms_map.get('newsletters', []):
-                try:
-                    perm = Permission.objects.get(codename=codename, content_type=newsletter_ct)
-                    group.permissions.add(perm)
-                except Permission.DoesNotExist:
-                    self.stdout.write(self.style.ERROR(f'Permission {codename} not found for Newsletter'))
-            
+
+            wanted = []
+            for kind, codenames in perms_map.items():
+                content_type = content_types[kind]
+                for codename in codenames:
+                    perm = permissions.get((content_type.pk, codename))
+                    if perm is None:
+                        self.stdout.write(self.style.ERROR(f'Permission {codename} not found for {content_type.model.title()}'))
+                    else:
+                        wanted.append(perm)
+
+            # set() applies the difference to match exactly, in bulk
+            group.permissions.set(wanted)
             self.stdout.write(self.style.SUCCESS(f'Updated permissions for {role_name}'))
+
+        roles.refresh_group_ids()
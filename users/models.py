@@ -1,7 +1,62 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.fields.files import FieldFile
 
-class User(AbstractUser):
+COUNTER_FIELDS = ('subscriber_count', 'article_count', 'pending_count')
+
+
+class LoadedValuesMixin:
+    """
+    Remember the stored value of each field, so save signals can tell what changed.
+
+    Values are recorded when an instance is loaded or refreshed; receivers
+    that act on a change call :meth:`mark_loaded` once it has been handled.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None:
+            deferred = self.get_deferred_fields()
+            attnames = [f.attname for f in self._meta.concrete_fields if f.attname not in deferred]
+        else:
+            attnames = [self._meta.get_field(name).attname for name in fields]
+        self.mark_loaded(*attnames)
+
+    def loaded_value(self, attname, default=None):
+        """Value of ``attname`` when this instance was loaded or last saved."""
+        return getattr(self, '_loaded_values', {}).get(attname, default)
+
+    def mark_loaded(self, *attnames):
+        """Record the current values of ``attnames`` as the stored state."""
+        values = {attname: getattr(self, attname) for attname in attnames}
+        # Files are stored, and loaded, as their name
+        values = {attname: v.name if isinstance(v, FieldFile) else v for attname, v in values.items()}
+        self._loaded_values = {**getattr(self, '_loaded_values', {}), **values}
+
+
+class StoredCountersMixin:
+    """
+    Keep ``COUNTER_FIELDS`` out of ordinary saves.
+
+    The counters only change through ``F()`` updates (see
+    ``articles.counters``); a full ``save()`` of an instance loaded earlier
+    would otherwise write its stale copy back over them. They are dropped
+    from the ``UPDATE`` itself, so every other field is saved as usual and
+    receivers still see the caller's ``update_fields``. Inserts write them.
+    """
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        values = [value for value in values if value[0].name not in COUNTER_FIELDS]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+
+class User(LoadedValuesMixin, StoredCountersMixin, AbstractUser):
     """
     Custom User model supporting multiple roles (Reader, Journalist, Editor).
     
@@ -10,6 +65,11 @@ class User(AbstractUser):
         bio (str): Short biography for the user profile.
         subscriptions_to_publishers (ManyToManyField): Publishers the user follows (Reader only).
         subscriptions_to_journalists (ManyToManyField): Journalists the user follows (Reader only).
+        subscriber_count (int): Readers following the user (Journalist only).
+        article_count (int): The user's approved articles.
+        pending_count (int): The user's articles waiting for review.
+
+    The counts are kept up to date by ``articles.counters``.
     """
     class Roles(models.TextChoices):
         READER = 'READER', 'Reader'
@@ -23,6 +83,11 @@ class User(AbstractUser):
     subscriptions_to_publishers = models.ManyToManyField('publications.Publisher', blank=True, related_name='subscribers')
     subscriptions_to_journalists = models.ManyToManyField('self', blank=True, symmetrical=False, related_name='journalist_subscribers')
 
+    # Denormalized counts (see articles.counters)
+    subscriber_count = models.IntegerField(default=0, editable=False)
+    article_count = models.IntegerField(default=0, editable=False)
+    pending_count = models.IntegerField(default=0, editable=False)
+
     def is_editor(self):
         return self.role == self.Roles.EDITOR
 
@@ -0,0 +1,69 @@
+"""
+Role groups.
+
+Every user belongs to exactly one of the role groups below, kept in sync
+with ``User.role`` by ``users.signals.assign_user_group``. Group IDs are
+resolved once per process and cached here; ``setup_roles`` refreshes the
+cache after creating or updating the groups, and saving or deleting a
+``Group`` clears it.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+User = get_user_model()
+
+ROLE_GROUPS = {
+    User.Roles.READER: 'Reader',
+    User.Roles.JOURNALIST: 'Journalist',
+    User.Roles.EDITOR: 'Editor',
+}
+
+_group_ids = None
+
+
+def refresh_group_ids():
+    global _group_ids
+    _group_ids = dict(Group.objects.filter(name__in=ROLE_GROUPS.values()).values_list('name', 'pk'))
+    return _group_ids
+
+
+def clear_group_ids():
+    """Forget the cached IDs; the next lookup reloads them."""
+    global _group_ids
+    _group_ids = None
+
+
+def group_ids():
+    """Map of role group name to its ``Group`` pk, loaded on first use."""
+    if _group_ids is None:
+        return refresh_group_ids()
+    return _group_ids
+
+
+def sync_role_group(user):
+    """
+    Put ``user`` in its role's group and out of the other role groups.
+
+    Reads the current role-group memberships in one query and applies the
+    difference with at most one delete and one insert. Roles whose group
+    has not been created yet (``setup_roles`` not run) are skipped.
+    """
+    name = ROLE_GROUPS.get(user.role)
+    if name is None:
+        return
+    ids = group_ids()
+    if name not in ids:
+        # The group may have been created by setup_roles in another process
+        ids = refresh_group_ids()
+        if name not in ids:
+            return
+    target = ids[name]
+    memberships = User.groups.through.objects
+    current = set(
+        memberships.filter(user_id=user.pk, group_id__in=ids.values()).values_list('group_id', flat=True)
+    )
+    stale = current - {target}
+    if stale:
+        memberships.filter(user_id=user.pk, group_id__in=stale).delete()
+    if target not in current:
+        memberships.create(user_id=user.pk, group_id=target)
@@ -1,13 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from news_app.fieldsets import SparseFieldsetMixin
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for the User model.
+    The counts are stored columns (see ``articles.counters``), so they cost no queries.
     """
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'role', 'bio']
-        read_only_fields = ['role']
+        fields = ['id', 'username', 'email', 'role', 'bio', 'subscriber_count', 'article_count', 'pending_count']
+        summary_fields = ['id', 'username', 'role', 'subscriber_count', 'article_count']
+        read_only_fields = ['role', 'subscriber_count', 'article_count', 'pending_count']
@@ -1,37 +1,67 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 
+from . import roles, subscriptions
+
 User = get_user_model()
+_UNKNOWN = object()
 
 @receiver(post_save, sender=User)
-def assign_user_group(sender, instance, created, **kwargs):
+def assign_user_group(sender, instance, created, update_fields=None, raw=False, **kwargs):
     """
     Assign user to a group based on their role.
     Removes user from other role-based groups.
+
+    Only runs when the role is new or has changed, so logins (which save
+    ``last_login``) and profile edits cost no extra queries.
     """
-    role_map = {
-        User.Roles.READER: 'Reader',
-        User.Roles.JOURNALIST: 'Journalist',
-        User.Roles.EDITOR: 'Editor'
-    }
-    
-    target_group_name = role_map.get(instance.role)
-    if target_group_name:
-        target_group = Group.objects.filter(name=target_group_name).first()
-        if target_group:
-            # Add to the new group
-            instance.groups.add(target_group)
-            
-            # Remove from other role groups
-            for r_key, g_name in role_map.items():
-                if g_name != target_group_name:
-                    g = Group.objects.filter(name=g_name).first()
-                    if g:
-                        instance.groups.remove(g)
+    if raw or (update_fields is not None and 'role' not in update_fields):
+        return
+    if not created and instance.loaded_value('role', _UNKNOWN) == instance.role:
+        return
+
+    roles.sync_role_group(instance)
 
     # Cleanup Reader fields if not a Reader
-    if instance.role != User.Roles.READER:
-        instance.subscriptions_to_publishers.clear()
-        instance.subscriptions_to_journalists.clear()
+    if not created and instance.role != User.Roles.READER:
+        subscriptions.clear_subscriptions(instance)
+
+    instance.mark_loaded('role')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def role_groups_changed(sender, **kwargs):
+    roles.clear_group_ids()
+
+
+def _graph_changed(kind, instance, action, reverse, pk_set):
+    """Pass an M2M subscription change on to the cached graph."""
+    if action == 'pre_clear':
+        # pk_set is not provided for clears, so remember who is affected now.
+        instance._cleared_graph_pks = (
+            subscriptions.followers(kind, instance.pk) if reverse else subscriptions.following(instance.pk, kind)
+        )
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_graph_pks', ())
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if not pk_set:
+        return
+    if reverse:
+        subscriptions.edges_changed(kind, pk_set, [instance.pk])
+    else:
+        subscriptions.edges_changed(kind, [instance.pk], pk_set)
+
+
+@receiver(m2m_changed, sender=User.subscriptions_to_publishers.through)
+def publisher_graph_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _graph_changed(subscriptions.PUBLISHERS, instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=User.subscriptions_to_journalists.through)
+def journalist_graph_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _graph_changed(subscriptions.JOURNALISTS, instance, action, reverse, pk_set)
@@ -0,0 +1,176 @@
+"""
+Cached subscription graph.
+
+Who follows whom is read on nearly every feed request and on every article
+approval, so the graph is kept in the Django cache in both directions:
+
+* forward sets: the journalists / publishers a reader follows;
+* reverse sets: the readers following a journalist / publisher.
+
+Each set is stored as a sorted ``array`` of 64-bit integers (8 bytes per
+edge) and read back as an :class:`IdSet`, which tests membership with a
+binary search. Missing entries are loaded from the M2M tables on demand.
+
+All subscription changes go through the functions at the bottom of this
+module (or any other M2M write, which is caught by the ``m2m_changed``
+receiver in ``users.signals``). Changed entries are dropped at once and,
+once the transaction commits, the affected readers' forward sets are
+written through with their new contents. Reverse sets can be very large
+for popular publishers, so they are only dropped and reloaded on the next
+read.
+"""
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = 'subgraph'
+TYPECODE = 'q'
+JOURNALISTS, PUBLISHERS = 'journalists', 'publishers'
+FOLLOWING, FOLLOWERS = 'following', 'followers'
+
+# kind -> (User M2M field, reader column, followed column) of the through table
+EDGES = {
+    JOURNALISTS: ('subscriptions_to_journalists', 'from_user_id', 'to_user_id'),
+    PUBLISHERS: ('subscriptions_to_publishers', 'user_id', 'publisher_id'),
+}
+
+
+class IdSet:
+    """Immutable sorted set of integer IDs backed by an ``array``."""
+    __slots__ = ('_ids',)
+
+    def __init__(self, ids=()):
+        self._ids = ids if isinstance(ids, array) else array(TYPECODE, sorted(set(ids)))
+
+    @classmethod
+    def from_bytes(cls, data):
+        ids = array(TYPECODE)
+        ids.frombytes(data)
+        return cls(ids)
+
+    def to_bytes(self):
+        return self._ids.tobytes()
+
+    def __contains__(self, pk):
+        i = bisect_left(self._ids, pk)
+        return i < len(self._ids) and self._ids[i] == pk
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return f'IdSet({list(self._ids)!r})'
+
+
+def _through(kind):
+    return getattr(get_user_model(), EDGES[kind][0]).through.objects
+
+
+def _key(direction, kind, pk):
+    return f'{KEY_PREFIX}:{direction}:{kind}:{pk}'
+
+
+def _load(direction, kind, ids):
+    """Read the sets for ``ids`` from the database in one query."""
+    _, reader_col, followed_col = EDGES[kind]
+    by, other = (reader_col, followed_col) if direction == FOLLOWING else (followed_col, reader_col)
+    grouped = defaultdict(list)
+    for pk, other_pk in _through(kind).filter(**{f'{by}__in': ids}).values_list(by, other).iterator():
+        grouped[pk].append(other_pk)
+    return {pk: IdSet(grouped[pk]) for pk in ids}
+
+
+def _store(direction, kind, sets):
+    cache.set_many(
+        {_key(direction, kind, pk): ids.to_bytes() for pk, ids in sets.items()},
+        timeout=settings.SUBSCRIPTION_CACHE_TIMEOUT,
+    )
+
+
+def _get_many(direction, kind, ids):
+    keys = {pk: _key(direction, kind, pk) for pk in ids}
+    found = cache.get_many(list(keys.values()))
+    sets = {pk: IdSet.from_bytes(found[key]) for pk, key in keys.items() if key in found}
+    missing = [pk for pk in keys if pk not in sets]
+    if missing:
+        loaded = _load(direction, kind, missing)
+        _store(direction, kind, loaded)
+        sets.update(loaded)
+    return sets
+
+
+def following(reader_id, kind):
+    """IDs of the journalists or publishers (``kind``) that ``reader_id`` follows."""
+    return _get_many(FOLLOWING, kind, [reader_id])[reader_id]
+
+
+def followers(kind, pk):
+    """IDs of the readers following the journalist or publisher ``pk``."""
+    return _get_many(FOLLOWERS, kind, [pk])[pk]
+
+
+def followed_ids(reader_id):
+    """``(journalist_ids, publisher_ids)`` followed by ``reader_id``, in one cache round trip when warm."""
+    keys = [_key(FOLLOWING, kind, reader_id) for kind in (JOURNALISTS, PUBLISHERS)]
+    found = cache.get_many(keys)
+    return tuple(
+        IdSet.from_bytes(found[key]) if key in found else following(reader_id, kind)
+        for kind, key in zip((JOURNALISTS, PUBLISHERS), keys)
+    )
+
+
+def edges_changed(kind, reader_ids, target_ids):
+    """
+    Record that edges between ``reader_ids`` and ``target_ids`` were added or removed.
+
+    Called after the M2M tables have been written, inside the writer's
+    transaction.
+    """
+    reader_ids, target_ids = list(reader_ids), list(target_ids)
+    cache.delete_many(
+        [_key(FOLLOWING, kind, pk) for pk in reader_ids] + [_key(FOLLOWERS, kind, pk) for pk in target_ids]
+    )
+
+    def write_through():
+        # Another process may have cached the pre-commit state in between
+        cache.delete_many([_key(FOLLOWERS, kind, pk) for pk in target_ids])
+        _store(FOLLOWING, kind, _load(FOLLOWING, kind, reader_ids))
+
+    transaction.on_commit(write_through)
+
+
+def toggle_journalist(reader, journalist):
+    """Follow ``journalist`` if ``reader`` does not yet, otherwise unfollow. Returns True if now following."""
+    if journalist.pk in following(reader.pk, JOURNALISTS):
+        reader.subscriptions_to_journalists.remove(journalist)
+        return False
+    reader.subscriptions_to_journalists.add(journalist)
+    return True
+
+
+def set_subscriptions(reader, publishers=None, journalists=None):
+    """Replace the reader's followed publishers and/or journalists (``None`` leaves a kind alone)."""
+    if publishers is not None:
+        reader.subscriptions_to_publishers.set(publishers)
+    if journalists is not None:
+        reader.subscriptions_to_journalists.set(journalists)
+
+
+def clear_subscriptions(user):
+    """Drop every subscription ``user`` holds; a no-op (and no writes) if there are none."""
+    journalist_ids, publisher_ids = followed_ids(user.pk)
+    if publisher_ids:
+        user.subscriptions_to_publishers.clear()
+    if journalist_ids:
+        user.subscriptions_to_journalists.clear()
@@ -1,3 +1,112 @@
 from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from io import StringIO
 
-# Create your tests here.
+from publications.models import Publisher
+from . import roles, subscriptions
+from .views import RegistrationForm
+
+User = get_user_model()
+
+
+class SubscriptionGraphTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create(username='reader', role='READER')
+        self.journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.publisher = Publisher.objects.create(title='Daily')
+
+    def test_sets_are_sorted_arrays(self):
+        ids = subscriptions.IdSet([5, 1, 3, 3])
+        self.assertEqual(list(ids), [1, 3, 5])
+        self.assertIn(3, ids)
+        self.assertNotIn(4, ids)
+        self.assertEqual(list(subscriptions.IdSet.from_bytes(ids.to_bytes())), [1, 3, 5])
+
+    def test_subscribe_view_writes_through(self):
+        self.client.force_login(self.reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('subscribe_to_author', args=[self.journalist.pk]))
+        with CaptureQueriesContext(connection) as ctx:
+            following = subscriptions.following(self.reader.pk, subscriptions.JOURNALISTS)
+        self.assertEqual(list(following), [self.journalist.pk])
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        self.client.get(reverse('subscribe_to_author', args=[self.journalist.pk]))
+        self.assertEqual(list(subscriptions.following(self.reader.pk, subscriptions.JOURNALISTS)), [])
+
+    def test_reverse_sets_follow_changes_from_either_side(self):
+        self.assertEqual(list(subscriptions.followers(subscriptions.PUBLISHERS, self.publisher.pk)), [])
+        self.publisher.subscribers.add(self.reader)
+        self.assertEqual(list(subscriptions.followers(subscriptions.PUBLISHERS, self.publisher.pk)), [self.reader.pk])
+        self.assertIn(self.publisher.pk, subscriptions.following(self.reader.pk, subscriptions.PUBLISHERS))
+        self.reader.subscriptions_to_publishers.clear()
+        self.assertEqual(list(subscriptions.followers(subscriptions.PUBLISHERS, self.publisher.pk)), [])
+
+    def test_role_change_clears_subscriptions(self):
+        self.reader.subscriptions_to_journalists.add(self.journalist)
+        self.reader.role = User.Roles.JOURNALIST
+        self.reader.save()
+        self.assertFalse(self.reader.subscriptions_to_journalists.exists())
+        self.assertEqual(list(subscriptions.followers(subscriptions.JOURNALISTS, self.journalist.pk)), [])
+
+    def test_registration_populates_graph(self):
+        form = RegistrationForm(data={
+            'username': 'new', 'role': 'READER', 'password1': 'pw-12345', 'password2': 'pw-12345',
+            'subscriptions_to_publishers': [self.publisher.pk],
+            'subscriptions_to_journalists': [self.journalist.pk],
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        user = form.save()
+        journalist_ids, publisher_ids = subscriptions.followed_ids(user.pk)
+        self.assertEqual((list(journalist_ids), list(publisher_ids)), ([self.journalist.pk], [self.publisher.pk]))
+
+
+class RoleSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command('setup_roles', stdout=StringIO())
+        # Group rows are rolled back after each test; don't keep their IDs
+        self.addCleanup(roles.clear_group_ids)
+        self.user = User.objects.create_user(username='reader', password='pw', role='READER')
+
+    def group_names(self, user):
+        return list(user.groups.values_list('name', flat=True))
+
+    def test_new_user_joins_role_group(self):
+        self.assertEqual(self.group_names(self.user), ['Reader'])
+
+    def test_login_and_profile_edits_cost_no_extra_queries(self):
+        user = User.objects.get(pk=self.user.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.login(username='reader', password='pw')
+        self.assertFalse([q for q in ctx.captured_queries if 'auth_group' in q['sql']])
+        with CaptureQueriesContext(connection) as ctx:
+            user.first_name = 'Ada'
+            user.save()
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_role_change_moves_group_and_clears_subscriptions(self):
+        journalist = User.objects.create(username='journalist', role='JOURNALIST')
+        self.user.subscriptions_to_journalists.add(journalist)
+        user = User.objects.get(pk=self.user.pk)
+        user.role = User.Roles.EDITOR
+        user.save()
+        self.assertEqual(self.group_names(user), ['Editor'])
+        self.assertFalse(user.subscriptions_to_journalists.exists())
+
+    def test_setup_roles_assigns_exact_permissions(self):
+        editor = Group.objects.get(name='Editor')
+        editor.permissions.add(Permission.objects.get(codename='add_article'))
+        call_command('setup_roles', stdout=StringIO())
+        self.assertEqual(
+            sorted(editor.permissions.values_list('codename', flat=True)),
+            ['change_article', 'change_newsletter', 'delete_article', 'delete_newsletter',
+             'view_article', 'view_newsletter'],
+        )
@@ -5,6 +5,7 @@ from django.contrib.auth.decorators import login_required
 from django import forms
 from django.contrib import messages
 from publications.models import Publisher
+from . import subscriptions
 
 User = get_user_model()
 
@@ -21,12 +22,10 @@ def subscribe_to_author(request, author_id):
         messages.warning(request, "You cannot subscribe to yourself.")
         return redirect(request.META.get('HTTP_REFERER', 'home'))
 
-    if user.subscriptions_to_journalists.filter(pk=author_id).exists():
-        user.subscriptions_to_journalists.remove(author)
-        messages.success(request, f"Unsubscribed from {author.username}.")
-    else:
-        user.subscriptions_to_journalists.add(author)
+    if subscriptions.toggle_journalist(user, author):
         messages.success(request, f"Subscribed to {author.username}.")
+    else:
+        messages.success(request, f"Unsubscribed from {author.username}.")
     
     return redirect(request.META.get('HTTP_REFERER', 'home'))
 
@@ -106,12 +105,11 @@ class RegistrationForm(forms.ModelForm):
             user.save()
             # Apply Reader subscriptions
             if user.role == User.Roles.READER:
-                pubs = self.cleaned_data.get('subscriptions_to_publishers')
-                journos = self.cleaned_data.get('subscriptions_to_journalists')
-                if pubs:
-                    user.subscriptions_to_publishers.set(pubs)
-                if journos:
-                    user.subscriptions_to_journalists.set(journos)
+                subscriptions.set_subscriptions(
+                    user,
+                    publishers=self.cleaned_data.get('subscriptions_to_publishers') or None,
+                    journalists=self.cleaned_data.get('subscriptions_to_journalists') or None,
+                )
         return user
 
 def register(request):